@@ -3,39 +3,274 @@ Health Survey ML API
 Train models and make predictions on survey data
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context, g
 from flask_cors import CORS
 import os
+import multiprocessing
 from datetime import datetime
-import pandas as pd
-import numpy as np
-import json
-from ml_service import MLService
+from ml_service import DEFAULT_GROWTH_TREES, DEFAULT_QUANTILES, MLService, run_growth_job, run_training_job
+from hyperparameter_search import (
+    DEFAULT_CANDIDATES, DEFAULT_ETA, DEFAULT_MIN_TREES, SEARCH_SPACE, STRATEGIES, run_tuning_job
+)
+from cross_validation import DEFAULT_FOLDS, DEFAULT_SEED, GROUP_COLUMN, HYPERPARAM_NAMES, run_cross_validation_job
+from streaming_metrics import EVAL_GROUP_COLUMNS
+from instrumentation import (
+    BATCH_ROWS, IN_FLIGHT, PROMETHEUS_CONTENT_TYPE, REGISTRY, REQUEST_SECONDS, REQUESTS, STAGE_SECONDS,
+    stage, timed_iter
+)
+from job_runner import JobRunner
+from prediction_cache import content_digest, frame_nbytes
+from serialization import ORIENTS, NumpyJSONProvider, json_response
+from table_io import (
+    CONTENT_TYPES, FILENAMES, MIMETYPES, ArrowStreamSerializer, data_file_exists,
+    detect_format, iter_table_chunks, read_data_file, read_upload, resolve_data_path, write_table
+)
+from warm_up import WarmUp
+from werkzeug.serving import is_running_from_reloader
 import io
+import json
+import time
+import tempfile
 
 app = Flask(__name__)
 CORS(app)
 
 # Initialize ML Service
-ML_MODEL_DIR = os.path.join(os.path.dirname(__file__), 'ml', 'outputs')
-ml_service = MLService(ML_MODEL_DIR)
-
-# Custom JSON encoder for numpy types
-class NumpyJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if isinstance(obj, np.floating):
-            return float(obj)
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if pd.isna(obj):
-            return None
-        return super(NumpyJSONEncoder, self).default(obj)
-
-app.json_encoder = NumpyJSONEncoder
+ML_MODEL_DIR = os.getenv('ML_MODEL_DIR', os.path.join(os.path.dirname(__file__), 'ml', 'outputs'))
+
+# Micro-batching: concurrent prediction requests are coalesced for up to
+# ML_BATCH_WINDOW_MS (0 disables) into batches of at most ML_MAX_BATCH_ROWS rows;
+# a lone request is scored without waiting, and a request whose batch takes
+# longer than ML_BATCH_WAIT_TIMEOUT_S is scored on its own
+ML_BATCH_WINDOW_MS = float(os.getenv('ML_BATCH_WINDOW_MS', 2))
+ML_MAX_BATCH_ROWS = int(os.getenv('ML_MAX_BATCH_ROWS', 4096))
+ML_BATCH_WAIT_TIMEOUT_S = float(os.getenv('ML_BATCH_WAIT_TIMEOUT_S', 5))
+
+# How often each worker checks whether another process published a new model
+# version (training jobs, /activate on another worker) and switches to it
+ML_MODEL_SYNC_S = float(os.getenv('ML_MODEL_SYNC_S', 1))
+
+# Memory budget for model versions kept loaded (active + pinned via ?model_version=)
+ML_MODEL_CACHE_MB = int(os.getenv('ML_MODEL_CACHE_MB', 512))
+
+# Batches up to this many rows are scored by the memory-mapped engine; larger ones
+# load the sklearn pickle into the worker on first use (a large value avoids that)
+ML_ENGINE_MAX_ROWS = int(os.getenv('ML_ENGINE_MAX_ROWS', 256))
+
+# Memory budget for cached predictions (repeated rows and re-uploaded files; 0 disables)
+ML_PREDICTION_CACHE_MB = int(os.getenv('ML_PREDICTION_CACHE_MB', 64))
+
+ml_service = MLService(
+    ML_MODEL_DIR,
+    batch_window_ms=ML_BATCH_WINDOW_MS,
+    max_batch_rows=ML_MAX_BATCH_ROWS,
+    model_cache_bytes=ML_MODEL_CACHE_MB * 1024 * 1024,
+    engine_max_rows=ML_ENGINE_MAX_ROWS,
+    prediction_cache_bytes=ML_PREDICTION_CACHE_MB * 1024 * 1024,
+    batch_wait_timeout_s=ML_BATCH_WAIT_TIMEOUT_S,
+    model_sync_seconds=ML_MODEL_SYNC_S
+)
+
+# Background jobs (training, tuning) run in a process pool; status files live here
+ML_JOBS_DIR = os.path.join(ML_MODEL_DIR, 'jobs')
+job_runner = JobRunner(ML_JOBS_DIR)
+
+# Rows per chunk when streaming predictions back to the client
+STREAM_CHUNK_SIZE = 50000
+
+# JSON for numpy / pandas types (Flask 3 ignores app.json_encoder, so install a provider)
+app.json = NumpyJSONProvider(app)
+
+# /api/ml/* requests that arrive while the worker is still warming up wait this
+# long for it before getting a 503 (0 answers 503 right away)
+ML_WARM_UP_WAIT_S = float(os.getenv('ML_WARM_UP_WAIT_S', 30))
+
+# ML_WARM_UP=0 doesn't warm up at import; the first request starts it instead
+ML_WARM_UP = os.getenv('ML_WARM_UP', '1') != '0'
+
+
+def _import_ml_stack():
+    """Import what the first request would otherwise wait for (pandas parses every upload)"""
+    import pandas  # noqa: F401
+
+
+def _load_model():
+    """Load the published model version, if there is one"""
+    if ml_service.load_model():
+        print("[SUCCESS] Model loaded from disk")
+    else:
+        print("[INFO] No model found - train a new model via /api/ml/train")
+
+
+# Heavy imports and model loading run in the background, so a fresh worker
+# answers /api/health/live immediately and reports 'warming' until it is ready
+warm_up = WarmUp([
+    ('imports', _import_ml_stack),
+    ('model', _load_model)
+])
+
+
+# Registered before the warm-up hook so requests held (or rejected) there are counted too
+@app.before_request
+def _start_request_metrics():
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def _record_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def _finish_request_metrics(error=None):
+    """Latency and status per route (runs after a streamed body is fully sent)"""
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+
+    IN_FLIGHT.dec()
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+    REQUESTS.inc(endpoint, str(g.get('response_status', 500)))
+
+
+# Scrape-time gauges, read from the service whenever /api/ml/metrics is called
+def _model_load_seconds():
+    bundle = ml_service.registry.active
+    if bundle is None:
+        return {}
+    return {('bundle',): bundle.load_seconds, ('sklearn',): bundle.model_load_seconds}
+
+
+def _scoring_rows_per_second():
+    rows, _ = BATCH_ROWS.totals()
+    seconds, _ = STAGE_SECONDS.totals('predict')
+    return rows / seconds if seconds else None
+
+
+REGISTRY.gauge('ml_model_info', 'Model version served by default', ['version'],
+               function=lambda: {(ml_service.model_version,): 1} if ml_service.is_loaded else {})
+REGISTRY.gauge('ml_model_load_seconds', 'Load time of the served version (bundle: engine and metadata, sklearn: pickle)',
+               ['part'], function=_model_load_seconds)
+REGISTRY.gauge('ml_predict_rows_per_second', 'Rows scored per second spent in the predict stage since start',
+               function=_scoring_rows_per_second)
+REGISTRY.gauge('ml_process_resident_memory_bytes', 'Resident set size of this worker',
+               function=lambda: ml_service.get_memory_info().get('rss_bytes'))
+REGISTRY.gauge('ml_worker_ready', '1 once the warm-up has finished successfully',
+               function=lambda: int(warm_up.ready))
+
+# Endpoints that must answer while the worker is still warming up
+WARM_UP_EXEMPT_PATHS = {'/api/ml/metrics'}
+
+
+@app.before_request
+def _wait_for_warm_up():
+    """Hold ML requests until this worker has warmed up"""
+    # No-op once started; restarts the warm-up in workers forked after import
+    warm_up.start()
+
+    if (warm_up.state == 'warming' and request.path.startswith('/api/ml/')
+            and request.path not in WARM_UP_EXEMPT_PATHS):
+        if not warm_up.wait(ML_WARM_UP_WAIT_S):
+            response = jsonify({
+                "error": "Service is warming up, retry shortly",
+                "warm_up": warm_up.status()
+            })
+            response.headers['Retry-After'] = '5'
+            return response, 503
+
+    if warm_up.ready:
+        ml_service.sync_published_version()
+
+
+# Start warming up as soon as the module is imported (by a WSGI server or the
+# debug reloader's child); the reloader's watcher process never serves requests,
+# and neither do job workers, which re-import `python app.py` as __mp_main__
+if (ML_WARM_UP and (__name__ != '__main__' or is_running_from_reloader())
+        and multiprocessing.current_process().name == 'MainProcess'):
+    warm_up.start()
+
+
+def _resolve_model_version():
+    """
+    Resolve the model version for this request
+
+    Clients can pin a version with ?model_version= (query or form field);
+    otherwise the active version is used. Resolving once up front keeps
+    predict and inverse transform on the same model for the whole request.
+
+    Returns:
+        (version, None) or (None, error response)
+    """
+    requested = request.values.get('model_version') or None
+    if requested and requested not in ml_service.registry.list_versions():
+        return None, (jsonify({"error": f"Model version '{requested}' not found"}), 404)
+    return ml_service.resolve_version(requested), None
+
+
+def _requested_orient():
+    """
+    JSON table layout for this request (?orient=records|columns)
+
+    Returns:
+        (orient, None) or (None, error response)
+    """
+    orient = request.values.get('orient', 'records').lower()
+    if orient not in ORIENTS:
+        return None, (jsonify({"error": f"orient must be one of: {', '.join(ORIENTS)}"}), 400)
+    return orient, None
+
+
+def _anytime_params():
+    """
+    Anytime prediction options for this request (?budget_ms= and/or ?tolerance=)
+
+    Returns:
+        ((budget_ms, tolerance), None) or (None, error response); both None
+        means the full forest
+    """
+    values = []
+    for name in ('budget_ms', 'tolerance'):
+        raw = request.values.get(name)
+        if raw in (None, ''):
+            values.append(None)
+            continue
+        try:
+            value = float(raw)
+        except ValueError:
+            value = float('nan')
+        if not value > 0:
+            return None, (jsonify({"error": f"{name} must be a positive number"}), 400)
+        values.append(value)
+    return tuple(values), None
+
+
+def _requested_intervals():
+    """
+    Prediction interval quantiles for this request
+
+    intervals=true turns intervals on (DEFAULT_QUANTILES unless quantiles=
+    lists others, e.g. quantiles=0.025,0.5,0.975).
+
+    Returns:
+        (quantiles or None, None) or (None, error response)
+    """
+    if request.values.get('intervals', 'false').lower() != 'true':
+        return None, None
+
+    raw = request.values.get('quantiles')
+    if not raw:
+        return DEFAULT_QUANTILES, None
+
+    try:
+        quantiles = tuple(float(q) for q in raw.split(','))
+    except ValueError:
+        quantiles = ()
+    if not quantiles or not all(0 < q < 1 for q in quantiles):
+        return None, (jsonify({"error": "quantiles must be a comma-separated list of numbers between 0 and 1"}), 400)
+    return quantiles, None
 
 
 # ============================================================
@@ -44,16 +279,43 @@ app.json_encoder = NumpyJSONEncoder
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """API health check"""
+    """API health check (summary of liveness, readiness and the worker)"""
     return jsonify({
         "status": "OK",
         "message": "Survey Analytics ML API",
+        "state": warm_up.state,
         "model_loaded": ml_service.is_loaded,
+        "model_version": ml_service.model_version,
+        "warm_up": warm_up.status(),
+        "worker": ml_service.get_memory_info(),
         "port": 5001,
         "timestamp": datetime.now().isoformat()
     })
 
 
+@app.route('/api/health/live', methods=['GET'])
+def health_live():
+    """Liveness: the process is up and serving HTTP (never waits for the warm-up)"""
+    return jsonify({
+        "status": "alive",
+        "pid": os.getpid(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness: 200 once the warm-up finished, 503 while warming or if it failed"""
+    ready = warm_up.ready
+    return jsonify({
+        "status": "ready" if ready else warm_up.state,
+        "model_loaded": ml_service.is_loaded,
+        "model_version": ml_service.model_version,
+        "warm_up": warm_up.status(),
+        "timestamp": datetime.now().isoformat()
+    }), 200 if ready else 503
+
+
 # ============================================================
 # MODEL MANAGEMENT
 # ============================================================
@@ -68,7 +330,11 @@ def ml_model_info():
                 "message": "No model loaded. Train or load a model first."
             }), 404
 
-        info = ml_service.get_model_info()
+        model_version, error = _resolve_model_version()
+        if error:
+            return error
+
+        info = ml_service.get_model_info(model_version)
         return jsonify(info)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -91,9 +357,73 @@ def ml_feature_importance():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/ml/batching-stats', methods=['GET'])
+def ml_batching_stats():
+    """Get micro-batching scheduler queue depth and batch-size stats"""
+    try:
+        return jsonify(ml_service.get_batching_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/ml/metrics', methods=['GET'])
+def ml_metrics():
+    """
+    Metrics in the Prometheus text format
+
+    Stage timings (parse, copy, encode, dedup, cache_lookup, predict,
+    inverse_transform, serialize, ...), request latency and status per route,
+    rows predicted / scored, in-flight requests, model load time and RSS of
+    this worker process.
+    """
+    try:
+        return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/ml/cache-stats', methods=['GET'])
+def ml_cache_stats():
+    """Get prediction cache hit / miss counters and memory use"""
+    try:
+        return jsonify(ml_service.get_cache_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/ml/models', methods=['GET'])
+def ml_models():
+    """List registered model versions and the model cache"""
+    try:
+        return jsonify({
+            "active_version": ml_service.model_version,
+            "models": ml_service.list_models(),
+            "cache": ml_service.registry.cache_info()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/ml/models/<version>/activate', methods=['POST'])
+def ml_activate_model(version):
+    """Serve a registered version by default (promote or roll back)"""
+    try:
+        if version not in ml_service.registry.list_versions():
+            return jsonify({"error": f"Model version '{version}' not found"}), 404
+
+        ml_service.activate_version(version)
+        return jsonify({
+            "success": True,
+            "message": f"Model version {version} activated",
+            "model_info": ml_service.get_model_info()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/ml/reload', methods=['POST'])
 def ml_reload():
-    """Reload model from disk (after training via script)"""
+    """Reload the published model version from disk (after training via script)"""
     try:
         if ml_service.load_model():
             return jsonify({
@@ -117,41 +447,150 @@ def ml_reload():
 @app.route('/api/ml/train', methods=['POST'])
 def ml_train():
     """
-    Train model using local training data
+    Start a background training job using local training data
     Uses 02_Project/Data/04_Split/train_data.csv
+    Returns a job id immediately - poll /api/ml/jobs/<job_id> for progress
+
+    Optional: training_metrics=true also re-predicts the training set
+    (metrics are out-of-bag by default)
+
+    Optional: mode=incremental adds add_trees trees to base_version (default:
+    the active model) with warm_start instead of retraining every tree; the
+    new trees are fitted on an uploaded file of fresh rows when one is sent,
+    else on train_data.csv
     """
     try:
+        training_metrics = request.values.get('training_metrics', 'false').lower() == 'true'
+
+        mode = request.values.get('mode', 'full')
+        if mode not in ('full', 'incremental'):
+            return jsonify({"error": "mode must be 'full' or 'incremental'"}), 400
+
         # Path to local training data
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         train_path = os.path.join(base_dir, 'Data', '04_Split', 'train_data.csv')
 
-        if not os.path.exists(train_path):
-            return jsonify({"error": f"Training data not found at {train_path}"}), 404
+        if mode == 'incremental':
+            return _submit_growth_job(train_path, os.path.join(base_dir, 'Data', '04_Split', 'val_data.csv'))
 
-        # Read training data
-        df_train = pd.read_csv(train_path)
+        if not data_file_exists(train_path):
+            return jsonify({"error": f"Training data not found at {train_path}"}), 404
 
-        # Train model
-        result = ml_service.train_model(df_train)
+        job_id = job_runner.submit(
+            'train',
+            run_training_job,
+            {'model_dir': ML_MODEL_DIR, 'train_path': train_path, 'training_metrics': training_metrics},
+            on_complete=_install_trained_model
+        )
 
         return jsonify({
             "success": True,
-            "message": "Model trained successfully",
-            "metrics": result['metrics'],
-            "n_features": result['n_features'],
-            "n_samples": result['n_samples'],
+            "message": "Training job submitted",
+            "job_id": job_id,
+            "status_url": f"/api/ml/jobs/{job_id}",
             "timestamp": datetime.now().isoformat()
-        })
+        }), 202
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _submit_growth_job(train_path, val_path):
+    """
+    Submit an incremental training job for /api/ml/train?mode=incremental
+
+    An uploaded file is saved under the jobs directory for the worker process
+    (which deletes it when done); the parent and the grown model are compared
+    on val_data.csv when it exists.
+    """
+    if not ml_service.is_loaded:
+        return jsonify({"error": "No model loaded. Train a model first."}), 404
+
+    add_trees = request.values.get('add_trees', DEFAULT_GROWTH_TREES, type=int)
+    if add_trees is None or add_trees < 1:
+        return jsonify({"error": "add_trees must be a positive integer"}), 400
+
+    requested = request.values.get('base_version') or None
+    if requested and requested not in ml_service.registry.list_versions():
+        return jsonify({"error": f"Model version '{requested}' not found"}), 404
+    base_version = ml_service.resolve_version(requested)
+
+    kwargs = {
+        'model_dir': ML_MODEL_DIR,
+        'n_new_trees': add_trees,
+        'base_version': base_version,
+        'val_path': val_path if data_file_exists(val_path) else None
+    }
+
+    if 'file' in request.files:
+        file = request.files['file']
+        extension = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}[detect_format(file)]
+        os.makedirs(ML_JOBS_DIR, exist_ok=True)
+        fd, upload_path = tempfile.mkstemp(prefix='grow_', suffix=extension, dir=ML_JOBS_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            file.save(f)
+        kwargs.update(data_path=upload_path, data_source='upload', remove_data=True)
+    elif data_file_exists(train_path):
+        kwargs.update(data_path=train_path, data_source='train_data')
+    else:
+        return jsonify({"error": f"Training data not found at {train_path}"}), 404
+
+    job_id = job_runner.submit('train', run_growth_job, kwargs, on_complete=_install_trained_model)
+
+    return jsonify({
+        "success": True,
+        "message": f"Incremental training job submitted ({add_trees} trees on top of {base_version})",
+        "job_id": job_id,
+        "mode": "incremental",
+        "base_version": base_version,
+        "status_url": f"/api/ml/jobs/{job_id}",
+        "timestamp": datetime.now().isoformat()
+    }), 202
+
+
+def _install_trained_model(result):
+    """Job completion callback: publish the freshly trained version"""
+    ml_service.activate_version(result['version'])
+
+
+@app.route('/api/ml/jobs/<job_id>', methods=['GET'])
+def ml_job_status(job_id):
+    """Get background job status, progress, elapsed time and ETA"""
+    try:
+        status = job_runner.get(job_id)
+        if status is None:
+            return jsonify({"error": f"Job {job_id} not found"}), 404
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/ml/jobs/<job_id>/cancel', methods=['POST'])
+def ml_job_cancel(job_id):
+    """Cancel a queued or running background job"""
+    try:
+        if not job_runner.cancel(job_id):
+            return jsonify({"error": f"Job {job_id} not found or already finished"}), 404
+        return jsonify({
+            "success": True,
+            "message": "Cancellation requested",
+            "job_id": job_id
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/ml/evaluate', methods=['POST'])
 def ml_evaluate():
     """
     Evaluate model on test/validation data
     Expects test_data.csv or val_data.csv in the request
+
+    The upload is read and scored chunk_size rows at a time, so holdout
+    files of any size are evaluated in constant memory.
+
+    Optional: baseline_version scores a second version on the same chunks
+    and adds its metrics and the difference (e.g. before / after growing)
     """
     try:
         if not ml_service.is_loaded:
@@ -163,18 +602,228 @@ def ml_evaluate():
         file = request.files['file']
         dataset_name = request.form.get('dataset_name', 'Test')
 
-        # Read test data
-        df_test = pd.read_csv(file)
+        model_version, error = _resolve_model_version()
+        if error:
+            return error
 
-        # Evaluate
-        result = ml_service.evaluate_model(df_test, dataset_name)
+        baseline_version = request.form.get('baseline_version') or None
+        if baseline_version and baseline_version not in ml_service.registry.list_versions():
+            return jsonify({"error": f"Model version '{baseline_version}' not found"}), 404
 
-        return jsonify({
+        chunk_size = request.form.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+        if chunk_size <= 0:
+            return jsonify({"error": "chunk_size must be a positive integer"}), 400
+
+        group_by = request.form.get('group_by')
+        group_by = EVAL_GROUP_COLUMNS if group_by is None else [col.strip() for col in group_by.split(',') if col.strip()]
+
+        # Read test data (CSV, Parquet or Arrow IPC) in chunks and evaluate as it is read
+        chunks = timed_iter(iter_table_chunks(file.stream, detect_format(file), chunk_size), 'parse')
+        try:
+            result = ml_service.evaluate_chunks(chunks, dataset_name, model_version, group_by, baseline_version)
+        finally:
+            chunks.close()
+
+        response = {
             "success": True,
             "dataset": dataset_name,
+            "model_version": model_version,
             "metrics": result['metrics'],
-            "n_samples": result['n_samples']
-        })
+            "groups": result['groups'],
+            "n_samples": result['n_samples'],
+            "n_chunks": result['n_chunks'],
+            "unknown_categories": result['unknown_categories']
+        }
+        if baseline_version:
+            response['baseline'] = result['baseline']
+            response['delta'] = result['delta']
+
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ============================================================
+# HYPERPARAMETER SEARCH
+# ============================================================
+
+@app.route('/api/ml/tune', methods=['POST'])
+def ml_tune():
+    """
+    Start a background hyperparameter search over n_estimators, max_features
+    and min_samples_leaf, ranked on Data/04_Split/val_data.csv
+    Returns a job id immediately - poll /api/ml/jobs/<job_id> for progress
+
+    Optional form fields:
+        strategy: 'halving' (default; losing candidates stop early) or 'random'
+        n_candidates, eta, min_trees, seed, workers: Search settings
+        space: JSON {name: [values]} replacing parts of the default search space
+        promote: true trains the winner and activates it when the job completes
+            (or later via /api/ml/tune/<job_id>/promote)
+    """
+    try:
+        options, error = _tuning_options()
+        if error:
+            return error
+
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        split_dir = os.path.join(base_dir, 'Data', '04_Split')
+        train_path = os.path.join(split_dir, 'train_data.csv')
+        val_path = os.path.join(split_dir, 'val_data.csv')
+
+        for path in (train_path, val_path):
+            if not data_file_exists(path):
+                return jsonify({"error": f"Data not found at {path}"}), 404
+
+        job_id = job_runner.submit(
+            'tune',
+            run_tuning_job,
+            dict(options, model_dir=ML_MODEL_DIR, train_path=train_path, val_path=val_path),
+            on_complete=_install_tuned_model
+        )
+
+        return jsonify({
+            "success": True,
+            "message": "Tuning job submitted",
+            "job_id": job_id,
+            "status_url": f"/api/ml/jobs/{job_id}",
+            "timestamp": datetime.now().isoformat()
+        }), 202
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/ml/tune/<job_id>/promote', methods=['POST'])
+def ml_tune_promote(job_id):
+    """Train the best configuration of a finished tuning job and activate it"""
+    try:
+        status = job_runner.get(job_id)
+        if status is None or status.get('kind') != 'tune':
+            return jsonify({"error": f"Tuning job {job_id} not found"}), 404
+        if status['status'] != 'completed':
+            return jsonify({"error": f"Tuning job {job_id} is {status['status']}"}), 409
+
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        train_path = os.path.join(base_dir, 'Data', '04_Split', 'train_data.csv')
+        hyperparams = status['result']['best']['hyperparams']
+
+        train_job_id = job_runner.submit(
+            'train',
+            run_training_job,
+            {'model_dir': ML_MODEL_DIR, 'train_path': train_path, 'hyperparams': hyperparams},
+            on_complete=_install_trained_model
+        )
+
+        return jsonify({
+            "success": True,
+            "message": "Training job for the best configuration submitted",
+            "job_id": train_job_id,
+            "hyperparams": hyperparams,
+            "status_url": f"/api/ml/jobs/{train_job_id}",
+            "timestamp": datetime.now().isoformat()
+        }), 202
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _install_tuned_model(result):
+    """Job completion callback: activate the winner if the job trained one"""
+    if result.get('version'):
+        ml_service.activate_version(result['version'])
+
+
+def _tuning_options():
+    """
+    Parse the search settings of a /api/ml/tune request
+
+    Returns:
+        (kwargs for run_tuning_job, None) or (None, error response)
+    """
+    strategy = request.values.get('strategy', 'halving')
+    if strategy not in STRATEGIES:
+        return None, (jsonify({"error": f"strategy must be one of: {', '.join(STRATEGIES)}"}), 400)
+
+    options = {'strategy': strategy,
+               'promote': request.values.get('promote', 'false').lower() == 'true'}
+    for name, default, minimum in (('n_candidates', DEFAULT_CANDIDATES, 1), ('eta', DEFAULT_ETA, 2),
+                                   ('min_trees', DEFAULT_MIN_TREES, 1), ('seed', 0, 0), ('workers', None, 1)):
+        value = request.values.get(name, default, type=int)
+        if value is not None and value < minimum:
+            return None, (jsonify({"error": f"{name} must be an integer >= {minimum}"}), 400)
+        options[name] = value
+
+    space = request.values.get('space')
+    if space:
+        try:
+            space = json.loads(space)
+        except ValueError:
+            space = None
+        if (not isinstance(space, dict) or not set(space) <= set(SEARCH_SPACE)
+                or not all(isinstance(values, list) and values for values in space.values())):
+            return None, (jsonify({
+                "error": f"space must be a JSON object mapping {', '.join(SEARCH_SPACE)} to non-empty lists"
+            }), 400)
+        options['space'] = dict(SEARCH_SPACE, **space)
+
+    return options, None
+
+
+# ============================================================
+# CROSS-VALIDATION
+# ============================================================
+
+@app.route('/api/ml/cross-validate', methods=['POST'])
+def ml_cross_validate():
+    """
+    Start a background k-fold cross-validation on Data/04_Split/train_data.csv
+    Returns a job id immediately - poll /api/ml/jobs/<job_id> for per-fold
+    and aggregate metrics
+
+    Optional form fields:
+        n_folds: Number of folds (default 5)
+        grouped: true keeps all rows of an indicator (indicator_encoded) in one fold
+        hyperparams: JSON object overriding n_estimators, max_features,
+            min_samples_leaf, max_depth or random_state
+        seed, workers: Fold shuffle seed and process pool size
+    """
+    try:
+        options = {'grouped': request.values.get('grouped', 'false').lower() == 'true'}
+        for name, default, minimum in (('n_folds', DEFAULT_FOLDS, 2), ('seed', DEFAULT_SEED, 0), ('workers', None, 1)):
+            value = request.values.get(name, default, type=int)
+            if value is not None and value < minimum:
+                return jsonify({"error": f"{name} must be an integer >= {minimum}"}), 400
+            options[name] = value
+
+        hyperparams = request.values.get('hyperparams')
+        if hyperparams:
+            try:
+                hyperparams = json.loads(hyperparams)
+            except ValueError:
+                hyperparams = None
+            if not isinstance(hyperparams, dict) or not set(hyperparams) <= set(HYPERPARAM_NAMES):
+                return jsonify({
+                    "error": f"hyperparams must be a JSON object with any of: {', '.join(HYPERPARAM_NAMES)}"
+                }), 400
+            options['hyperparams'] = hyperparams
+
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        train_path = os.path.join(base_dir, 'Data', '04_Split', 'train_data.csv')
+        if not data_file_exists(train_path):
+            return jsonify({"error": f"Training data not found at {train_path}"}), 404
+
+        job_id = job_runner.submit('cross_validate', run_cross_validation_job, dict(options, train_path=train_path))
+
+        return jsonify({
+            "success": True,
+            "message": f"{options['n_folds']}-fold cross-validation job submitted"
+                       + (f" (grouped by {GROUP_COLUMN})" if options['grouped'] else ""),
+            "job_id": job_id,
+            "status_url": f"/api/ml/jobs/{job_id}",
+            "timestamp": datetime.now().isoformat()
+        }), 202
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -189,6 +838,10 @@ def ml_predict_csv():
     """
     Upload survey CSV and get predictions for all entries
     Handles preprocessing automatically
+    Accepts CSV, Parquet or Arrow IPC uploads (detected from the content type)
+    and returns json, csv, ndjson, parquet or arrow
+    Set stream=true to score the upload chunk by chunk (csv, ndjson or arrow output)
+    Set intervals=true to add per-row std / quantile columns from the individual trees
     """
     try:
         if not ml_service.is_loaded:
@@ -202,48 +855,208 @@ def ml_predict_csv():
             return jsonify({"error": "No file selected"}), 400
 
         # Get return format preference
-        return_format = request.form.get('format', 'json')  # 'json' or 'csv'
-
-        # Read CSV
-        df = pd.read_csv(file)
-        original_df = df.copy()
-
-        # Predict (ml_service handles preprocessing internally)
-        predictions_scaled = ml_service.predict_from_dataframe(df)
-
-        # Inverse transform to get original values
-        predictions_original = ml_service.inverse_transform_predictions(predictions_scaled)
-
-        # Add both predictions to original dataframe
-        original_df['predicted_value_log_scaled'] = predictions_scaled
-        original_df['predicted_value'] = predictions_original
+        return_format = _requested_format()  # 'json', 'csv', 'ndjson', 'parquet' or 'arrow'
+
+        model_version, error = _resolve_model_version()
+        if error:
+            return error
+
+        orient, error = _requested_orient()
+        if error:
+            return error
+
+        quantiles, error = _requested_intervals()
+        if error:
+            return error
+
+        # Streaming mode: constant memory, first rows reach the client early
+        if request.form.get('stream', 'false').lower() == 'true' or return_format == 'ndjson':
+            chunk_size = request.form.get('chunk_size', STREAM_CHUNK_SIZE, type=int)
+            if chunk_size <= 0:
+                return jsonify({"error": "chunk_size must be a positive integer"}), 400
+            if return_format == 'parquet':
+                return jsonify({"error": "Parquet output can't be streamed, use format=arrow"}), 400
+            return _stream_predictions(file, return_format, chunk_size, model_version, quantiles)
+
+        # Re-uploads of the same file are answered from the whole-file cache
+        with stage('digest'):
+            digest = content_digest(file.stream, 'predict-csv', quantiles)
+        cached = ml_service.prediction_cache.get_file(model_version, digest)
+        cache_status = 'hit' if cached is not None else 'miss'
+
+        if cached is None:
+            # Read upload (CSV, Parquet or Arrow IPC)
+            with stage('parse'):
+                df = read_upload(file)
+
+            # Predict (ml_service handles preprocessing internally) and add the
+            # scaled and original-value predictions (plus intervals) to a copy
+            with stage('copy'):
+                scored_df = df.copy()
+            cached = _predict_chunk(scored_df, model_version, quantiles)
+            ml_service.prediction_cache.put_file(model_version, digest, cached, frame_nbytes(cached[0]))
+        original_df, dedup = cached
 
         # Return in requested format
-        if return_format == 'csv':
-            # Convert to CSV and return as file
-            output = io.StringIO()
-            original_df.to_csv(output, index=False)
-            output.seek(0)
-
-            return send_file(
-                io.BytesIO(output.getvalue().encode()),
-                mimetype='text/csv',
+        if return_format in MIMETYPES:
+            # Serialize as CSV / Parquet / Arrow IPC and return as file
+            with stage('serialize'):
+                body = write_table(original_df, return_format)
+            response = send_file(
+                io.BytesIO(body),
+                mimetype=MIMETYPES[return_format],
                 as_attachment=True,
-                download_name='predictions.csv'
+                download_name=FILENAMES[return_format]
             )
+            response.headers['X-Model-Version'] = model_version
+            response.headers['X-Unique-Rows'] = str(dedup['unique_rows'])
+            response.headers['X-Dedup-Ratio'] = str(dedup['dedup_ratio'])
         else:
-            # Return as JSON
-            return jsonify({
-                "success": True,
-                "row_count": len(original_df),
-                "predictions": original_df.to_dict('records'),
-                "timestamp": datetime.now().isoformat()
-            })
+            # Return as JSON, encoded straight from the columns
+            with stage('serialize'):
+                response = json_response({
+                    "success": True,
+                    "model_version": model_version,
+                    "row_count": len(original_df),
+                    "dedup": dedup,
+                    "timestamp": datetime.now().isoformat()
+                }, {"predictions": original_df}, orient)
+
+        response.headers['X-Prediction-Cache'] = cache_status
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _requested_format():
+    """
+    Output format from the `format` field, else from the Accept header
+
+    A client sending e.g. `Accept: application/vnd.apache.arrow.stream`
+    gets Arrow IPC without setting `format`; anything else defaults to json.
+    """
+    fmt = request.values.get('format')
+    if fmt:
+        return fmt.lower()
+    return CONTENT_TYPES.get(request.accept_mimetypes.best, 'json')
+
+
+def _predict_chunk(chunk, model_version, quantiles=None):
+    """
+    Score one chunk in place and append both prediction columns (plus interval columns)
+
+    Returns:
+        (chunk, dedup) where dedup has rows, unique_rows and dedup_ratio
+    """
+    if quantiles:
+        columns, info = ml_service.predict_intervals(chunk, model_version, quantiles, return_info=True)
+        for column, values in columns.items():
+            chunk[column] = values
+        return chunk, info['dedup']
+
+    predictions_scaled, info = ml_service.predict_from_dataframe(chunk, model_version, return_info=True)
+    chunk['predicted_value_log_scaled'] = predictions_scaled
+    chunk['predicted_value'] = ml_service.inverse_transform_predictions(predictions_scaled, model_version)
+    return chunk, info['dedup']
+
+
+def _serialize_chunk(chunk, return_format, header):
+    """Serialize a scored chunk as CSV or newline-delimited JSON"""
+    if return_format == 'ndjson':
+        text = chunk.to_json(orient='records', lines=True, double_precision=15)
+        return text if text.endswith('\n') else text + '\n'
+    return chunk.to_csv(index=False, header=header)
+
+
+def _stream_predictions(file, return_format, chunk_size, model_version, quantiles=None):
+    """
+    Stream predictions for an uploaded file as a chunked HTTP response
+
+    The upload (CSV, Parquet or Arrow IPC) is read chunk_size rows at a time,
+    so memory stays flat no matter how large the file is. The first chunk is
+    scored before the response starts so bad input still gets a normal JSON
+    error.
+
+    Args:
+        file: Uploaded file object
+        return_format: 'ndjson' for newline-delimited JSON, 'arrow' for an
+            Arrow IPC stream, anything else for CSV
+        chunk_size: Number of rows scored per chunk
+        model_version: Model version every chunk is scored with
+        quantiles: Optional interval quantiles (see _requested_intervals)
+
+    Returns:
+        Flask streaming Response
+    """
+    if return_format not in ('ndjson', 'arrow'):
+        return_format = 'csv'
+    input_format = detect_format(file)
+
+    # One IPC stream across all chunks (fails here, before streaming, without pyarrow)
+    arrow_stream = ArrowStreamSerializer() if return_format == 'arrow' else None
+
+    # Flask closes request files once the view returns, so spool the upload
+    # to a private temp file that lives as long as the response body
+    spool = tempfile.TemporaryFile()
+    file.save(spool)
+    spool.seek(0)
+
+    chunks = timed_iter(iter_table_chunks(spool, input_format, chunk_size), 'parse')
+    try:
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            raise ValueError("Uploaded file has no rows")
+        first_chunk, first_dedup = _predict_chunk(first_chunk, model_version, quantiles)
+    except Exception:
+        chunks.close()
+        spool.close()
+        raise
+
+    def serialize(chunk, header):
+        with stage('serialize'):
+            if arrow_stream is not None:
+                return arrow_stream.write(chunk)
+            return _serialize_chunk(chunk, return_format, header)
+
+    def generate():
+        # Duplicates are collapsed per chunk; totals are only known at the end
+        rows, unique = first_dedup['rows'], first_dedup['unique_rows']
+        yield serialize(first_chunk, header=True)
+        try:
+            for chunk in chunks:
+                chunk, dedup = _predict_chunk(chunk, model_version, quantiles)
+                rows += dedup['rows']
+                unique += dedup['unique_rows']
+                yield serialize(chunk, header=False)
+            if arrow_stream is not None:
+                yield arrow_stream.close()
+            print(f"[API] Streamed {rows} predictions ({unique} unique rows scored)")
+        except Exception as e:
+            # Headers are already sent, so the status code can't change anymore
+            print(f"[API ERROR] Streaming prediction aborted: {e}")
+            raise
+        finally:
+            chunks.close()
+            spool.close()
+
+    if return_format == 'ndjson':
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers={'X-Model-Version': model_version}
+        )
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=MIMETYPES[return_format],
+        headers={
+            'Content-Disposition': f'attachment; filename={FILENAMES[return_format]}',
+            'X-Model-Version': model_version
+        }
+    )
+
+
 @app.route('/api/ml/predict-sample', methods=['POST'])
 def ml_predict_sample():
     """
@@ -257,25 +1070,76 @@ def ml_predict_sample():
         if 'file' not in request.files:
             return jsonify({"error": "No file provided"}), 400
 
+        model_version, error = _resolve_model_version()
+        if error:
+            return error
+
+        orient, error = _requested_orient()
+        if error:
+            return error
+
+        anytime, error = _anytime_params()
+        if error:
+            return error
+        budget_ms, tolerance = anytime
+
         file = request.files['file']
-        df = pd.read_csv(file)
 
-        # Predict on first 10 rows
-        sample_df = df.head(10)
-        predictions_scaled = ml_service.predict_from_dataframe(sample_df)
+        # Full-forest previews of an unchanged upload come from the whole-file cache
+        digest = None
+        if budget_ms is None and tolerance is None:
+            with stage('digest'):
+                digest = content_digest(file.stream, 'predict-sample')
+        cached = ml_service.prediction_cache.get_file(model_version, digest) if digest else None
+        cache_status = 'hit' if cached is not None else 'miss'
+
+        if cached is None:
+            with stage('parse'):
+                df = read_upload(file)
+
+            # Predict on first 10 rows (with a subset of the trees when a budget / tolerance is given);
+            # a copy, so the prediction columns aren't written into a slice of df
+            sample_df = df.head(10).copy()
+            predictions_scaled, info = ml_service.predict_from_dataframe(
+                sample_df, model_version, budget_ms=budget_ms, tolerance=tolerance, return_info=True
+            )
 
-        # Inverse transform to get original values
-        predictions_original = ml_service.inverse_transform_predictions(predictions_scaled)
+            # Inverse transform to get original values
+            predictions_original = ml_service.inverse_transform_predictions(predictions_scaled, model_version)
 
-        sample_df['predicted_value_log_scaled'] = predictions_scaled
-        sample_df['predicted_value'] = predictions_original
+            sample_df['predicted_value_log_scaled'] = predictions_scaled
+            sample_df['predicted_value'] = predictions_original
 
-        return jsonify({
+            cached = (sample_df, len(df))
+            if digest:
+                ml_service.prediction_cache.put_file(model_version, digest, cached, frame_nbytes(sample_df))
+        sample_df, total_rows = cached
+
+        payload = {
             "success": True,
+            "model_version": model_version,
             "sample_size": len(sample_df),
-            "total_rows": len(df),
-            "sample": sample_df.to_dict('records')
-        })
+            "total_rows": total_rows
+        }
+
+        if budget_ms is not None or tolerance is not None:
+            std_error = info['std_error']
+            sample_df['prediction_std_error'] = std_error
+            payload["anytime"] = {
+                "trees_used": info['trees_used'],
+                "n_trees": info['n_trees'],
+                "stop_reason": info['stop_reason'],
+                "elapsed_ms": round(info['elapsed_ms'], 3),
+                "std_error_mean": float(std_error.mean()) if len(std_error) else None,
+                "std_error_max": float(std_error.max()) if len(std_error) else None,
+                "budget_ms": budget_ms,
+                "tolerance": tolerance
+            }
+
+        with stage('serialize'):
+            response = json_response(payload, {"sample": sample_df}, orient)
+        response.headers['X-Prediction-Cache'] = cache_status
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -295,28 +1159,51 @@ def ml_predict_validation():
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         val_path = os.path.join(base_dir, 'Data', '04_Split', 'val_data.csv')
 
-        if not os.path.exists(val_path):
+        if not data_file_exists(val_path):
             return jsonify({"error": f"Validation data not found at {val_path}"}), 404
 
-        # Read validation data
-        df = pd.read_csv(val_path)
+        model_version, error = _resolve_model_version()
+        if error:
+            return error
 
-        # Predict on first 10 rows
-        sample_df = df.head(10)
-        predictions_scaled = ml_service.predict_from_dataframe(sample_df)
+        orient, error = _requested_orient()
+        if error:
+            return error
 
-        # Inverse transform to get original values
-        predictions_original = ml_service.inverse_transform_predictions(predictions_scaled)
+        # Dashboards poll this; skip reading and scoring while the file is unchanged
+        with stage('digest'):
+            digest = content_digest(resolve_data_path(val_path), 'predict-validation')
+        cached = ml_service.prediction_cache.get_file(model_version, digest)
+        cache_status = 'hit' if cached is not None else 'miss'
 
-        sample_df['predicted_value_log_scaled'] = predictions_scaled
-        sample_df['predicted_value'] = predictions_original
+        if cached is None:
+            # Read validation data (Parquet twin when present)
+            with stage('parse'):
+                df = read_data_file(val_path)
 
-        return jsonify({
-            "success": True,
-            "sample_size": len(sample_df),
-            "total_rows": len(df),
-            "sample": sample_df.to_dict('records')
-        })
+            # Predict on first 10 rows; a copy, so the cached sample doesn't keep all of df alive
+            sample_df = df.head(10).copy()
+            predictions_scaled = ml_service.predict_from_dataframe(sample_df, model_version)
+
+            # Inverse transform to get original values
+            predictions_original = ml_service.inverse_transform_predictions(predictions_scaled, model_version)
+
+            sample_df['predicted_value_log_scaled'] = predictions_scaled
+            sample_df['predicted_value'] = predictions_original
+
+            cached = (sample_df, len(df))
+            ml_service.prediction_cache.put_file(model_version, digest, cached, frame_nbytes(sample_df))
+        sample_df, total_rows = cached
+
+        with stage('serialize'):
+            response = json_response({
+                "success": True,
+                "model_version": model_version,
+                "sample_size": len(sample_df),
+                "total_rows": total_rows
+            }, {"sample": sample_df}, orient)
+        response.headers['X-Prediction-Cache'] = cache_status
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -329,7 +1216,7 @@ def ml_predict_validation():
 @app.route('/api/ml/data-info', methods=['POST'])
 def ml_data_info():
     """
-    Upload CSV to get data summary without predictions
+    Upload CSV (or Parquet / Arrow IPC) to get data summary without predictions
     Useful for checking data before prediction
     """
     try:
@@ -337,7 +1224,7 @@ def ml_data_info():
             return jsonify({"error": "No file provided"}), 400
 
         file = request.files['file']
-        df = pd.read_csv(file)
+        df = read_upload(file)
 
         info = {
             "row_count": len(df),
@@ -359,21 +1246,27 @@ if __name__ == '__main__':
     print("Health Survey ML API")
     print("=" * 60)
 
-    # Try to load existing model
-    print("\nChecking for existing model...")
-    if ml_service.load_model():
-        print("[SUCCESS] Model loaded from disk")
-    else:
-        print("[INFO] No model found - train a new model via /api/ml/train")
-
-    print("\nStarting Flask server...")
+    # The model is loaded by the warm-up thread (see warm_up above)
+    print("\nStarting Flask server (model loads in the background)...")
     print("=" * 60)
     print("API Endpoints:")
     print("  Health:              GET  /api/health")
+    print("  Liveness:            GET  /api/health/live")
+    print("  Readiness:           GET  /api/health/ready")
     print("  Model Info:          GET  /api/ml/model-info")
     print("  Feature Importance:  GET  /api/ml/feature-importance")
+    print("  Batching Stats:      GET  /api/ml/batching-stats")
+    print("  Cache Stats:         GET  /api/ml/cache-stats")
+    print("  Metrics:             GET  /api/ml/metrics")
+    print("  Model Versions:      GET  /api/ml/models")
+    print("  Activate Version:    POST /api/ml/models/<version>/activate")
     print("  Train Model:         POST /api/ml/train")
+    print("  Job Status:          GET  /api/ml/jobs/<job_id>")
+    print("  Cancel Job:          POST /api/ml/jobs/<job_id>/cancel")
     print("  Evaluate Model:      POST /api/ml/evaluate")
+    print("  Tune Hyperparams:    POST /api/ml/tune")
+    print("  Promote Tuned:       POST /api/ml/tune/<job_id>/promote")
+    print("  Cross-Validate:      POST /api/ml/cross-validate")
     print("  Predict CSV:         POST /api/ml/predict-csv")
     print("  Predict Sample:      POST /api/ml/predict-sample")
     print("  Data Info:           POST /api/ml/data-info")
@@ -0,0 +1,115 @@
+"""
+Compiled Forest Engine Benchmark
+Compares sklearn and engine batch latency for batch sizes 1 - 100k
+(prediction parity is checked by tests/test_forest_engine.py)
+
+Usage:
+    python benchmarks/bench_forest_engine.py [--n-estimators 750] [--repeats 5] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest_engine import CompiledForest
+
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def load_features(train_path):
+    """Load train_data.csv and encode it the same way MLService does"""
+    df = pd.read_csv(train_path)
+    y = df['value_log_scaled']
+    X = df[[col for col in df.columns if col != 'value_log_scaled']].copy()
+
+    for col in X.columns:
+        if X[col].dtype == 'object' or X[col].dtype.name == 'category':
+            mapping = {val: idx for idx, val in enumerate(X[col].unique())}
+            X[col] = X[col].map(mapping)
+
+    return X, y
+
+
+def best_time(fn, repeats):
+    """Best wall time of several runs, in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CompiledForest against sklearn predict")
+    parser.add_argument('--n-estimators', type=int, default=750)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--max-batch', type=int, default=max(BATCH_SIZES))
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    train_path = os.path.join(base_dir, 'Data', '04_Split', 'train_data.csv')
+
+    X, y = load_features(train_path)
+
+    print(f"Training forest: {args.n_estimators} trees on {len(X)} rows...")
+    model = RandomForestRegressor(
+        n_estimators=args.n_estimators, max_features='sqrt', min_samples_leaf=5,
+        random_state=123, n_jobs=args.n_jobs
+    )
+    model.fit(X.values, y)
+
+    start = time.perf_counter()
+    engine = CompiledForest.from_sklearn(model)
+    compile_ms = (time.perf_counter() - start) * 1000
+    print(f"Compiled {engine.n_trees} trees in {compile_ms:.1f} ms "
+          f"({engine.nbytes / 1e6:.1f} MB, max depth {engine.max_depth})")
+
+    # Resample training rows (with jitter) to build large batches
+    rng = np.random.default_rng(123)
+    pool = X.values.astype(np.float64)
+    results = []
+
+    print(f"\n{'Batch':>8} {'sklearn ms':>12} {'engine ms':>12} {'speedup':>9}")
+    for batch_size in [b for b in BATCH_SIZES if b <= args.max_batch]:
+        rows = rng.integers(0, len(pool), size=batch_size)
+        batch = pool[rows] + rng.normal(0, 0.05, size=(batch_size, pool.shape[1]))
+
+        repeats = args.repeats if batch_size <= 10000 else max(1, args.repeats // 2)
+        sk_ms = best_time(lambda: model.predict(batch), repeats)
+        engine_ms = best_time(lambda: engine.predict(batch), repeats)
+
+        results.append({
+            'batch_size': batch_size,
+            'sklearn_ms': sk_ms,
+            'engine_ms': engine_ms,
+            'speedup': sk_ms / engine_ms
+        })
+        print(f"{batch_size:>8} {sk_ms:>12.2f} {engine_ms:>12.2f} {sk_ms / engine_ms:>8.1f}x")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'n_estimators': args.n_estimators,
+                'compile_ms': compile_ms,
+                'engine_nbytes': engine.nbytes,
+                'max_depth': engine.max_depth,
+                'results': results
+            }, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""
+MLService Benchmark Suite
+Training time across n_estimators / n_jobs / row counts, predict_from_dataframe
+latency for batches of 1 - 1M rows and end-to-end endpoint throughput through
+Flask's test client, on synthetic data shaped like Data/04_Split/train_data.csv
+(generated by synthetic_data.py)
+
+Usage:
+    python benchmarks/bench_ml_service.py [--quick] [--sections train predict endpoints] [--output results.json]
+    python benchmarks/bench_ml_service.py --baseline results.json [--tolerance 0.2]
+    python benchmarks/bench_ml_service.py --compare old.json new.json [--tolerance 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from importlib import metadata
+
+import numpy as np
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path for imports
+sys.path.append(API_DIR)
+
+from ml_service import MLService
+from synthetic_data import SyntheticDataGenerator
+
+
+SECTIONS = ['train', 'predict', 'endpoints']
+
+# Training grid (every combination is trained once); --quick uses the smaller one
+TRAIN_GRID = {'rows': [1000, 10000, 100000], 'n_estimators': [100, 300, 750], 'n_jobs': [1, -1]}
+QUICK_TRAIN_GRID = {'rows': [1000, 10000], 'n_estimators': [50, 150], 'n_jobs': [1, -1]}
+
+# Hyperparameters besides the grid (MLService defaults)
+BASE_HYPERPARAMS = {'max_features': 'sqrt', 'min_samples_leaf': 5, 'random_state': 123}
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000, 1000000]
+QUICK_BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+# (name, path, rows per uploaded file, extra form fields)
+ENDPOINTS = [
+    ('predict-sample', '/api/ml/predict-sample', 1000, {}),
+    ('predict-csv json', '/api/ml/predict-csv', 1000, {}),
+    ('predict-csv json columns', '/api/ml/predict-csv', 10000, {'orient': 'columns'}),
+    ('predict-csv csv', '/api/ml/predict-csv', 10000, {'format': 'csv'}),
+    ('predict-csv stream', '/api/ml/predict-csv', 10000, {'stream': 'true'}),
+    ('evaluate', '/api/ml/evaluate', 10000, {})
+]
+
+# Compared between runs: (section, fields identifying a row, metric, higher is better)
+COMPARED = [
+    ('training', ('rows', 'n_estimators', 'n_jobs'), 'seconds', False),
+    ('predict', ('batch_size',), 'median_ms', False),
+    ('endpoints', ('name',), 'requests_per_second', True)
+]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide progress output and pandas warnings so the result tables stay readable"""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        yield
+
+
+def bench_training(generator, grid, model_dir, seed):
+    """Train every grid combination once and time train_model end to end"""
+    print(f"\n{'Rows':>8} {'Trees':>6} {'n_jobs':>6} {'seconds':>9} {'trees/s':>9}")
+    frames = {}
+    results = []
+
+    # Untimed fit so the first grid entry doesn't pay for importing sklearn
+    with quiet():
+        warm = MLService(model_dir, prediction_cache_bytes=0)
+        result = warm.train_model(generator.sample(200, seed),
+                                  dict(BASE_HYPERPARAMS, n_estimators=5, n_jobs=1), publish=False)
+        warm.registry.delete_version(result['version'])
+
+    for rows, n_estimators, n_jobs in itertools.product(grid['rows'], grid['n_estimators'], grid['n_jobs']):
+        if rows not in frames:
+            frames[rows] = generator.sample(rows, seed + rows)
+
+        service = MLService(model_dir, prediction_cache_bytes=0)
+        hyperparams = dict(BASE_HYPERPARAMS, n_estimators=n_estimators, n_jobs=n_jobs)
+
+        start = time.perf_counter()
+        with quiet():
+            result = service.train_model(frames[rows], hyperparams, publish=False)
+        seconds = time.perf_counter() - start
+        service.registry.delete_version(result['version'])
+
+        results.append({
+            'rows': rows,
+            'n_estimators': n_estimators,
+            'n_jobs': n_jobs,
+            'seconds': seconds,
+            'trees_per_second': n_estimators / seconds
+        })
+        print(f"{rows:>8} {n_estimators:>6} {n_jobs:>6} {seconds:>9.2f} {n_estimators / seconds:>9.1f}")
+
+    return results
+
+
+def bench_predict(service, generator, batch_sizes, repeats, seed):
+    """predict_from_dataframe latency per batch size (encode + dedup + score)"""
+    print(f"\n{'Batch':>8} {'median ms':>11} {'p95 ms':>10} {'rows/s':>12}")
+    results = []
+    for batch_size in batch_sizes:
+        df = generator.sample(batch_size, seed + batch_size)
+
+        # Warm-up call (loads the sklearn pickle the first time a big batch arrives)
+        service.predict_from_dataframe(df)
+
+        runs = repeats if batch_size <= 10000 else max(1, repeats // 3)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            service.predict_from_dataframe(df)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        median_ms = float(np.median(timings))
+        results.append({
+            'batch_size': batch_size,
+            'repeats': runs,
+            'median_ms': median_ms,
+            'p95_ms': float(np.percentile(timings, 95)),
+            'rows_per_second': batch_size / (median_ms / 1000)
+        })
+        print(f"{batch_size:>8} {median_ms:>11.2f} {results[-1]['p95_ms']:>10.2f} {results[-1]['rows_per_second']:>12.0f}")
+
+    return results
+
+
+def bench_endpoints(model_dir, generator, n_requests, concurrency, seed):
+    """Requests per second through Flask's test client, `concurrency` clients at a time"""
+    # The app builds its MLService at import time from these
+    os.environ.update({'ML_MODEL_DIR': model_dir, 'ML_WARM_UP': '0', 'ML_PREDICTION_CACHE_MB': '0'})
+    with quiet():
+        import app as app_module
+        app_module.warm_up.start()
+        app_module.warm_up.wait()
+
+    print(f"\n{'Endpoint':<26} {'rows':>6} {'req/s':>8} {'rows/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    results = []
+    for name, path, rows, form in ENDPOINTS:
+        body = generator.sample(rows, seed + rows).to_csv(index=False).encode()
+
+        def one_request(_):
+            client = app_module.app.test_client()
+            start = time.perf_counter()
+            response = client.post(path, data=dict(form, file=(io.BytesIO(body), 'bench.csv')))
+            response.get_data()
+            if response.status_code != 200:
+                raise RuntimeError(f"{name}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+            return (time.perf_counter() - start) * 1000
+
+        with quiet():
+            one_request(None)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                latencies = list(pool.map(one_request, range(n_requests)))
+            wall = time.perf_counter() - start
+
+        results.append({
+            'name': name,
+            'path': path,
+            'rows_per_request': rows,
+            'requests': n_requests,
+            'concurrency': concurrency,
+            'requests_per_second': n_requests / wall,
+            'rows_per_second': n_requests * rows / wall,
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95))
+        })
+        r = results[-1]
+        print(f"{name:<26} {rows:>6} {r['requests_per_second']:>8.1f} {r['rows_per_second']:>10.0f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}")
+
+    return results
+
+
+def environment():
+    """Machine and library versions, stored with every run"""
+    versions = {}
+    for package in ('numpy', 'pandas', 'scikit-learn', 'flask', 'pyarrow', 'orjson'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=API_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'git_commit': commit,
+        'packages': versions
+    }
+
+
+def compare(old, new, tolerance):
+    """Print metric changes between two runs; returns the regressed entries"""
+    for field in ('cpus', 'python', 'packages'):
+        if old['environment'].get(field) != new['environment'].get(field):
+            print(f"WARNING: runs differ in {field}: {old['environment'].get(field)} -> {new['environment'].get(field)}")
+
+    regressions = []
+    for section, key_fields, metric, higher_is_better in COMPARED:
+        baseline = {tuple(row[k] for k in key_fields): row for row in old.get(section, [])}
+        rows = [(tuple(row[k] for k in key_fields), row) for row in new.get(section, [])]
+        rows = [(key, row, baseline[key]) for key, row in rows if key in baseline]
+        if not rows:
+            continue
+
+        print(f"\n{section} ({metric}, {'higher' if higher_is_better else 'lower'} is better)")
+        print(f"{'':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+        for key, row, base in rows:
+            change = row[metric] / base[metric] - 1
+            worse = -change if higher_is_better else change
+            label = ', '.join(f"{k}={v}" for k, v in zip(key_fields, key))
+            flag = ''
+            if worse > tolerance:
+                regressions.append(f"{section}: {label}")
+                flag = '  REGRESSION'
+            print(f"{label:<40} {base[metric]:>12.2f} {row[metric]:>12.2f} {change:>+7.0%}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}")
+    else:
+        print(f"\nNo regressions beyond {tolerance:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MLService training, prediction and endpoints")
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS, default=SECTIONS)
+    parser.add_argument('--quick', action='store_true', help="Smaller training grid and batches up to 100k")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs per predict batch size")
+    parser.add_argument('--predict-estimators', type=int, default=750, help="Trees in the model used for predict / endpoints")
+    parser.add_argument('--predict-train-rows', type=int, default=10000)
+    parser.add_argument('--max-batch', type=int, help="Largest predict batch size")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=4, help="Concurrent test clients")
+    parser.add_argument('--seed', type=int, default=123)
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    parser.add_argument('--baseline', help="Results JSON to compare against (exit 1 on regression)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two saved runs without benchmarking")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown vs the baseline")
+    args = parser.parse_args()
+
+    if args.compare:
+        runs = []
+        for path in args.compare:
+            with open(path, 'r') as f:
+                runs.append(json.load(f))
+        sys.exit(1 if compare(runs[0], runs[1], args.tolerance) else 0)
+
+    env = environment()
+    print(f"Python {env['python']} on {env['platform']}, {env['cpus']} CPUs, commit {env['git_commit']}")
+
+    # Continuous columns make practically every generated row unique, so row
+    # dedup and the prediction cache (disabled anyway) can't flatter the timings
+    generator = SyntheticDataGenerator.from_files(seed=args.seed)
+    batch_sizes = QUICK_BATCH_SIZES if args.quick else BATCH_SIZES
+    if args.max_batch:
+        batch_sizes = [b for b in BATCH_SIZES if b <= args.max_batch]
+
+    results = {'environment': env, 'settings': vars(args)}
+    model_dir = tempfile.mkdtemp(prefix='bench_ml_service_')
+    try:
+        if 'train' in args.sections:
+            print("\n== train_model ==")
+            results['training'] = bench_training(generator, QUICK_TRAIN_GRID if args.quick else TRAIN_GRID,
+                                                 model_dir, args.seed)
+
+        if 'predict' in args.sections or 'endpoints' in args.sections:
+            # One published model shared by the predict and endpoint benchmarks
+            service = MLService(model_dir, prediction_cache_bytes=0)
+            with quiet():
+                service.train_model(generator.sample(args.predict_train_rows, args.seed),
+                                    dict(BASE_HYPERPARAMS, n_estimators=args.predict_estimators, n_jobs=-1))
+
+            if 'predict' in args.sections:
+                print(f"\n== predict_from_dataframe ({args.predict_estimators} trees) ==")
+                results['predict'] = bench_predict(service, generator, batch_sizes, args.repeats, args.seed)
+
+            if 'endpoints' in args.sections:
+                print(f"\n== endpoints ({args.requests} requests, {args.concurrency} concurrent) ==")
+                results['endpoints'] = bench_endpoints(model_dir, generator, args.requests, args.concurrency, args.seed)
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
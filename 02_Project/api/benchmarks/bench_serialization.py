@@ -0,0 +1,112 @@
+"""
+JSON Serialization Benchmark
+Compares the old prediction response path (to_dict('records') through
+Flask's stdlib JSON provider) with the records and columnar encoders in
+serialization.py at 10k and 1M rows
+
+Usage:
+    python benchmarks/bench_serialization.py [--rows 10000 1000000] [--repeats 3] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import HAS_ORJSON, encode_dataframe
+
+
+ROW_COUNTS = [10000, 1000000]
+
+
+def prediction_frame(train_path, n_rows, seed=123):
+    """train_data.csv tiled to n_rows, with the two prediction columns predict-csv adds"""
+    base = pd.read_csv(train_path)
+    df = pd.concat([base] * (n_rows // len(base) + 1), ignore_index=True).head(n_rows)
+
+    rng = np.random.default_rng(seed)
+    df['predicted_value_log_scaled'] = rng.normal(size=n_rows)
+    df['predicted_value'] = np.expm1(df['value_log'] + rng.normal(scale=0.1, size=n_rows))
+    return df
+
+
+def best_time(fn, repeats):
+    """Best wall time of several runs in milliseconds, plus the last result"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def check_parity(df, baseline_bytes):
+    """Both new layouts must decode to the same values as the old path"""
+    expected = json.loads(baseline_bytes)['predictions']
+
+    records = json.loads(encode_dataframe(df, 'records'))
+    assert records == expected, "records output differs from the old path"
+
+    columnar = json.loads(encode_dataframe(df, 'columns'))
+    rebuilt = [dict(zip(columnar['columns'], row)) for row in zip(*columnar['data'])]
+    assert rebuilt == expected, "columns output differs from the old path"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prediction JSON serialization")
+    parser.add_argument('--rows', type=int, nargs='+', default=ROW_COUNTS)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    train_path = os.path.join(base_dir, 'Data', '04_Split', 'train_data.csv')
+
+    # The old path: Flask's default provider (stdlib json, sorted keys) on a dict per row
+    app = Flask(__name__)
+    old_provider = DefaultJSONProvider(app)
+
+    print(f"orjson available: {HAS_ORJSON}\n")
+    print(f"{'Rows':>8}  {'Path':<22} {'ms':>10} {'MB':>8} {'speedup':>8}")
+
+    results = []
+    for n_rows in args.rows:
+        df = prediction_frame(train_path, n_rows)
+
+        with app.app_context():
+            old_ms, old_bytes = best_time(
+                lambda: old_provider.response({'predictions': df.to_dict('records')}).get_data(),
+                args.repeats
+            )
+
+        # NaN-free data, so the old stdlib output is valid JSON to compare against
+        check_parity(df, old_bytes)
+
+        paths = [('old to_dict + jsonify', old_ms, len(old_bytes))]
+        for orient in ('records', 'columns'):
+            ms, data = best_time(lambda: encode_dataframe(df, orient), args.repeats)
+            paths.append((orient, ms, len(data)))
+
+        for name, ms, size in paths:
+            print(f"{n_rows:>8}  {name:<22} {ms:>10.1f} {size / 1e6:>8.1f} {old_ms / ms:>7.1f}x")
+            results.append({'rows': n_rows, 'path': name, 'ms': ms, 'bytes': size, 'speedup': old_ms / ms})
+
+    print("\nParity check passed for all row counts")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'orjson': HAS_ORJSON, 'results': results}, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
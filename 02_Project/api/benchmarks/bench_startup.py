@@ -0,0 +1,212 @@
+"""
+API Startup Benchmark
+Profiles `import app` with -X importtime and times a fresh process until
+/api/health/live and /api/health/ready answer, so slow imports creeping
+back into the startup path show up as regressions
+
+Usage:
+    python benchmarks/bench_startup.py [--repeats 5] [--model-dir ml/outputs] [--output startup.json]
+    python benchmarks/bench_startup.py --baseline startup.json [--tolerance 0.2]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported on first use (or by the warm-up thread)
+HEAVY_MODULES = ['pandas', 'sklearn', 'scipy', 'joblib', 'pyarrow']
+
+# Timed in a fresh interpreter: import, first liveness answer, readiness, first prediction
+STARTUP_SCRIPT = r'''
+import json, os, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+
+client = app.app.test_client()
+assert client.get('/api/health/live').status_code == 200
+live_at = time.perf_counter()
+
+while client.get('/api/health/ready').status_code != 200 and app.warm_up.state == 'warming':
+    time.sleep(0.005)
+ready_at = time.perf_counter()
+
+first_predict_ms = None
+sample_path = os.environ.get('BENCH_SAMPLE_CSV')
+if app.ml_service.is_loaded and sample_path:
+    with open(sample_path, 'rb') as f:
+        t = time.perf_counter()
+        response = client.post('/api/ml/predict-sample', data={'file': (f, 'sample.csv')})
+        first_predict_ms = (time.perf_counter() - t) * 1000
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+print('BENCH ' + json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'time_to_live_ms': (live_at - started) * 1000,
+    'time_to_ready_ms': (ready_at - started) * 1000,
+    'first_predict_ms': first_predict_ms,
+    'warm_up': app.warm_up.status(),
+    'model_loaded': app.ml_service.is_loaded
+}))
+'''
+
+# Metrics compared against a baseline (lower is better)
+COMPARED = ['import_ms', 'time_to_live_ms', 'time_to_ready_ms', 'first_predict_ms']
+
+
+def run_python(args, env_overrides):
+    env = dict(os.environ, **env_overrides)
+    return subprocess.run([sys.executable] + args, cwd=API_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def profile_imports(env_overrides, top_n):
+    """
+    `python -X importtime -c "import app"` without the warm-up thread
+
+    Returns:
+        Dict with the total import time, the slowest top-level imports of
+        app and which heavy modules were loaded by importing it
+    """
+    check = "import sys, json, app; print('BENCH ' + json.dumps([m for m in %r if m in sys.modules]))" % HEAVY_MODULES
+    result = run_python(['-X', 'importtime', '-c', check], dict(env_overrides, ML_WARM_UP='0'))
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | name" (name indented 2 spaces per level)
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((name, int(self_us), int(cumulative_us)))
+
+    # Rows are printed after their children: app's direct imports are the
+    # depth-1 rows between the previous top-level row and app's own row
+    app_index = next(i for i, row in enumerate(rows) if row[0].strip() == 'app')
+    direct = []
+    for name, self_us, cumulative_us in reversed(rows[:app_index]):
+        if _depth(name) == 0:
+            break
+        if _depth(name) == 1:
+            direct.append((name, self_us, cumulative_us))
+    direct.sort(key=lambda row: row[2], reverse=True)
+    app_row = rows[app_index]
+
+    return {
+        'total_ms': app_row[2] / 1000,
+        'heavy_modules_loaded': _bench_output(result.stdout),
+        'slowest_imports': [
+            {'module': name.strip(), 'cumulative_ms': cumulative / 1000, 'self_ms': self_time / 1000}
+            for name, self_time, cumulative in direct[:top_n]
+        ]
+    }
+
+
+def _depth(name):
+    """Nesting level of an importtime row (two spaces per level after the separator)"""
+    return (len(name) - len(name.lstrip(' ')) - 1) // 2
+
+
+def _bench_output(stdout):
+    for line in stdout.splitlines():
+        if line.startswith('BENCH '):
+            return json.loads(line[len('BENCH '):])
+    raise RuntimeError(f"No benchmark output in:\n{stdout}")
+
+
+def time_startup(env_overrides, repeats):
+    """Median startup timings over several fresh processes"""
+    runs = [_bench_output(run_python(['-c', STARTUP_SCRIPT], env_overrides).stdout) for _ in range(repeats)]
+
+    summary = {}
+    for metric in COMPARED:
+        values = [run[metric] for run in runs if run[metric] is not None]
+        summary[metric] = statistics.median(values) if values else None
+    summary['model_loaded'] = runs[-1]['model_loaded']
+    summary['warm_up_steps'] = runs[-1]['warm_up']['step_seconds']
+    return summary
+
+
+def compare(results, baseline, tolerance):
+    """Print metric changes against a baseline; returns the regressed metrics"""
+    regressions = []
+    print(f"\n{'Metric':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for metric in COMPARED:
+        old = baseline['startup'].get(metric)
+        new = results['startup'].get(metric)
+        if old is None or new is None:
+            continue
+        change = new / old - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(metric)
+            flag = '  REGRESSION'
+        print(f"{metric:<20} {old:>10.1f} {new:>10.1f} {change:>+7.0%}{flag}")
+
+    new_heavy = sorted(set(results['imports']['heavy_modules_loaded']) - set(baseline['imports']['heavy_modules_loaded']))
+    if new_heavy:
+        regressions.append('heavy_modules_loaded')
+        print(f"\nREGRESSION: `import app` now loads {', '.join(new_heavy)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API import time and warm-up")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--model-dir', help="Model directory to warm up with (default: the app's ml/outputs)")
+    parser.add_argument('--sample-csv', default=os.path.join(os.path.dirname(API_DIR), 'Data', '04_Split', 'val_data.csv'),
+                        help="CSV for the first prediction after warm-up")
+    parser.add_argument('--top', type=int, default=10, help="Slowest direct imports to list")
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    parser.add_argument('--baseline', help="Results JSON to compare against (exit 1 on regression)")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown vs the baseline")
+    args = parser.parse_args()
+
+    env_overrides = {'BENCH_SAMPLE_CSV': args.sample_csv}
+    if args.model_dir:
+        env_overrides['ML_MODEL_DIR'] = os.path.abspath(args.model_dir)
+
+    print(f"Python {platform.python_version()} on {platform.platform()}, {os.cpu_count()} CPUs\n")
+
+    imports = profile_imports(env_overrides, args.top)
+    print(f"`import app`: {imports['total_ms']:.0f} ms (-X importtime, warm-up disabled)")
+    print(f"Heavy modules loaded by the import: {', '.join(imports['heavy_modules_loaded']) or 'none'}")
+    print(f"\n{'Direct import':<28} {'cumulative ms':>14} {'self ms':>9}")
+    for row in imports['slowest_imports']:
+        print(f"{row['module']:<28} {row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}")
+
+    startup = time_startup(env_overrides, args.repeats)
+    print(f"\nFresh process, median of {args.repeats}:")
+    for metric in COMPARED:
+        value = startup[metric]
+        print(f"  {metric:<20} {'n/a' if value is None else f'{value:.1f}'}")
+    print(f"  model loaded: {startup['model_loaded']}, warm-up steps: {startup['warm_up_steps']}")
+
+    results = {
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'imports': imports,
+        'startup': startup
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Categorical Encoder
+Encodes the text categorical columns (indicator_importance, sample_size_tier)
+straight into the model's float32 feature matrix in one pass per request
+"""
+
+import os
+import json
+
+import numpy as np
+
+
+# Saved next to the model; categorical_mappings.json is still written for older readers
+ENCODER_FILE = 'categorical_encoder.json'
+MAPPINGS_FILE = 'categorical_mappings.json'
+
+# Code for categories not seen during training (and missing values)
+UNKNOWN_CODE = -1
+
+
+class CategoricalEncoder:
+    """
+    Per-column category lists with an explicit unknown code
+
+    Column codes are positions in the fitted category list, i.e. the same
+    codes the old {category: code} mappings produced. Anything outside the
+    list - new categories or NaN - gets unknown_code instead of silently
+    becoming NaN, so every row can be scored. Trees trained without the
+    unknown code send it down the "lowest value" branch of every split on
+    that column, which is at least deterministic.
+    """
+
+    def __init__(self, categories=None, unknown_code=UNKNOWN_CODE):
+        """
+        Initialize encoder
+
+        Args:
+            categories: {column: [category, ...]} in code order
+            unknown_code: Code for unseen categories and missing values
+        """
+        self.categories = {col: list(cats) for col, cats in (categories or {}).items()}
+        self.unknown_code = unknown_code
+
+        # Hash tables built once, so each request only looks its values up
+        import pandas as pd
+        self._indexes = {col: pd.Index(cats) for col, cats in self.categories.items()}
+
+    @classmethod
+    def fit(cls, df, columns=None):
+        """
+        Learn categories for every text / category column
+
+        Categories are numbered in order of first appearance, matching the
+        mappings models were trained with before this encoder existed.
+
+        Args:
+            df: Training DataFrame
+            columns: Feature columns to consider (default: all)
+
+        Returns:
+            CategoricalEncoder
+        """
+        import pandas as pd
+
+        categories = {}
+        for col in (columns if columns is not None else df.columns):
+            if df[col].dtype == 'object' or df[col].dtype.name == 'category':
+                categories[col] = [val for val in pd.unique(df[col]) if not pd.isna(val)]
+        return cls(categories)
+
+    @classmethod
+    def from_mappings(cls, mappings):
+        """Build from legacy {column: {category: code}} mappings"""
+        return cls({
+            col: [cat for cat, _ in sorted(mapping.items(), key=lambda item: item[1])]
+            for col, mapping in (mappings or {}).items()
+        })
+
+    def to_mappings(self):
+        """Legacy {column: {category: code}} form (categorical_mappings.json)"""
+        return {col: {cat: code for code, cat in enumerate(cats)} for col, cats in self.categories.items()}
+
+    def to_dict(self):
+        """JSON-serializable form"""
+        return {'categories': self.categories, 'unknown_code': self.unknown_code}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state.get('categories'), state.get('unknown_code', UNKNOWN_CODE))
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load the encoder saved with a model
+
+        Falls back to categorical_mappings.json for models saved before the
+        encoder existed, and to an empty encoder for all-numeric models.
+        """
+        encoder_path = os.path.join(directory, ENCODER_FILE)
+        if os.path.exists(encoder_path):
+            with open(encoder_path, 'r') as f:
+                return cls.from_dict(json.load(f))
+
+        mappings_path = os.path.join(directory, MAPPINGS_FILE)
+        if os.path.exists(mappings_path):
+            with open(mappings_path, 'r') as f:
+                return cls.from_mappings(json.load(f))
+
+        return cls()
+
+    def save(self, directory):
+        """Write the encoder (and legacy mappings) into a model directory"""
+        if not self.categories:
+            return
+
+        with open(os.path.join(directory, ENCODER_FILE), 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+        with open(os.path.join(directory, MAPPINGS_FILE), 'w') as f:
+            json.dump(self.to_mappings(), f, indent=2)
+
+    def encode(self, df, feature_names):
+        """
+        Build the model's feature matrix from a DataFrame
+
+        Writes each feature column once into a preallocated float32 array
+        (the precision the trees split on) instead of copying the frame,
+        mapping categorical columns and then reordering it.
+
+        Args:
+            df: DataFrame with at least feature_names (extra columns, e.g. the
+                target, are ignored)
+            feature_names: Columns in model order
+
+        Returns:
+            (X, unknown_counts): float32 array (n_rows, n_features) and
+            {column: rows encoded as unknown_code} for columns that had any
+        """
+        missing = [col for col in feature_names if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+
+        X = np.empty((len(df), len(feature_names)), dtype=np.float32, order='F')
+        unknown_counts = {}
+
+        for j, col in enumerate(feature_names):
+            index = self._indexes.get(col)
+            if index is None:
+                values = df[col].to_numpy()
+                if values.dtype == object:
+                    # Nullable integer/float columns hold pd.NA
+                    values = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+                X[:, j] = values
+                continue
+
+            # Same codes pd.Categorical(values, categories) would give, -1 when not found
+            codes = index.get_indexer(df[col])
+            unknown = codes < 0
+            n_unknown = int(unknown.sum())
+            if n_unknown:
+                unknown_counts[col] = n_unknown
+                codes = np.where(unknown, self.unknown_code, codes)
+            X[:, j] = codes
+
+        return np.ascontiguousarray(X), unknown_counts
+
+    def encode_frame(self, df, feature_names):
+        """encode() wrapped in a DataFrame, for sklearn fit/predict with feature names"""
+        import pandas as pd
+
+        X, unknown_counts = self.encode(df, feature_names)
+        return pd.DataFrame(X, columns=feature_names, index=df.index, copy=False), unknown_counts
+
+    @property
+    def columns(self):
+        return list(self.categories)
@@ -0,0 +1,290 @@
+"""
+Cross Validation
+K-fold (optionally grouped) cross-validation of the Random Forest, with the
+folds trained in a process pool over the memory-mapped training matrix
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from matrix_cache import load_matrix
+from streaming_metrics import RegressionAccumulator
+
+
+DEFAULT_FOLDS = 5
+DEFAULT_SEED = 123
+
+# Grouping by indicator keeps every row of an indicator in one fold, so a
+# fold is scored on indicators the model never saw (rows of one indicator
+# are near-duplicates, which makes plain k-fold optimistic)
+GROUP_COLUMN = 'indicator_encoded'
+
+# Same defaults as MLService.train_model
+DEFAULT_HYPERPARAMS = {
+    'n_estimators': 750,
+    'max_features': 'sqrt',
+    'min_samples_leaf': 5,
+    'random_state': 123
+}
+
+# Hyperparameters a request may override
+HYPERPARAM_NAMES = ('n_estimators', 'max_features', 'min_samples_leaf', 'max_depth', 'random_state')
+
+# Memory-mapped arrays and fold assignments opened by this worker process
+_shared_data = {}
+
+
+def fold_assignment(n_rows, n_folds, seed=DEFAULT_SEED, groups=None):
+    """
+    Fold index (0 .. n_folds - 1) of every row
+
+    Args:
+        n_rows: Number of rows
+        n_folds: Number of folds
+        seed: Shuffle seed
+        groups: Optional group label per row; rows of a group share a fold
+            (see _group_folds)
+
+    Returns:
+        int32 array (n_rows,)
+    """
+    if groups is not None:
+        return _group_folds(np.asarray(groups), n_folds, seed)
+
+    from sklearn.model_selection import KFold
+
+    if n_rows < n_folds:
+        raise ValueError(f"Only {n_rows} rows for {n_folds} folds")
+    splitter = KFold(n_splits=n_folds, shuffle=True, random_state=seed)
+
+    folds = np.empty(n_rows, dtype=np.int32)
+    for fold, (_, test_rows) in enumerate(splitter.split(np.empty((n_rows, 1)))):
+        folds[test_rows] = fold
+    return folds
+
+
+def run_fold(data_paths, fold, n_folds, seed, group_index, hyperparams, n_jobs=1):
+    """
+    Fit on every fold but one and score the held-out fold
+
+    Runs in a pool worker. The fold assignment is rebuilt from the shared
+    arrays (it is deterministic), so only paths and settings are pickled.
+
+    The forest is fitted on the whole memory-mapped matrix with the held-out
+    rows weighted 0, which sklearn's trees leave out entirely, so the
+    training rows are never copied into the worker. Only the held-out rows
+    (1/k of the matrix) are copied for predict. Bootstrap samples are drawn
+    over all rows and held-out draws are dropped, so the forest is a
+    statistically equivalent (not identical) draw to a fit on the training
+    rows alone.
+
+    Returns:
+        Dict with the fold's metrics, its error sums (merged into the pooled
+        metrics), row counts and timings
+    """
+    from sklearn.ensemble import RandomForestRegressor
+
+    X, y, folds = _open_shared_data(data_paths, n_folds, seed, group_index)
+    held_out = folds == fold
+
+    start = time.perf_counter()
+    model = RandomForestRegressor(**dict(hyperparams, n_jobs=n_jobs))
+    model.fit(X, y, sample_weight=(~held_out).astype(np.float64))
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions = model.predict(X[held_out])
+    predict_seconds = time.perf_counter() - start
+
+    accumulator = RegressionAccumulator()
+    accumulator.update(y[held_out], predictions)
+    result = {
+        'fold': fold,
+        'n_train': int(len(y) - held_out.sum()),
+        'n_test': accumulator.n,
+        'metrics': accumulator.result(),
+        'fit_seconds': round(fit_seconds, 3),
+        'predict_seconds': round(predict_seconds, 3),
+        'sums': {'n': accumulator.n, 'sse': accumulator.sse, 'sae': accumulator.sae,
+                 'mean': accumulator.mean, 'm2': accumulator.m2}
+    }
+    if group_index is not None:
+        result['n_test_groups'] = int(len(np.unique(X[held_out, group_index])))
+    return result
+
+
+def cross_validate(data_paths, n_folds=DEFAULT_FOLDS, hyperparams=None, group_index=None, seed=DEFAULT_SEED,
+                   workers=None, progress=None):
+    """
+    Train and score every fold in a process pool
+
+    Args:
+        data_paths: (X, y) .npy paths of the training matrix
+        n_folds: Number of folds
+        hyperparams: RandomForestRegressor parameters (default DEFAULT_HYPERPARAMS)
+        group_index: Column of X whose values group rows into folds (None: plain k-fold)
+        seed: Fold shuffle seed
+        workers: Pool size (default: one process per fold, capped at the CPU count)
+        progress: Optional JobProgress handle (cancellation is checked after every fold)
+
+    Returns:
+        (folds, aggregate): per-fold results ordered by fold, and the mean /
+        std of the fold metrics plus the metrics pooled over all held-out rows
+    """
+    hyperparams = dict(DEFAULT_HYPERPARAMS, **(hyperparams or {}))
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, n_folds)
+    # CPUs left over when there are fewer folds than cores go to each fit
+    n_jobs = max(1, cpus // workers)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(run_fold, data_paths, fold, n_folds, seed, group_index, hyperparams, n_jobs)
+                   for fold in range(n_folds)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                print(f"[CV] Fold {result['fold']}: RMSE {result['metrics']['rmse']:.4f} on {result['n_test']} rows "
+                      f"(fit {result['fit_seconds']:.1f}s)")
+
+            if progress is not None:
+                progress.update(phase='cross_validating', folds_done=len(results), n_folds=n_folds,
+                                fraction=min(len(results) / n_folds, 0.99))
+                if progress.cancelled():
+                    # Folds already running finish; leaving the with block joins the pool
+                    for future in pending:
+                        future.cancel()
+                    progress.check_cancelled()
+
+    results.sort(key=lambda r: r['fold'])
+    return results, aggregate_folds(results)
+
+
+def aggregate_folds(results):
+    """Mean / std / min / max of each fold metric, and metrics pooled over all held-out rows"""
+    pooled = RegressionAccumulator()
+    for result in results:
+        pooled.add(**result['sums'])
+
+    aggregate = {'pooled': dict(pooled.result(), n_samples=pooled.n)}
+    for name in ('rmse', 'mae', 'r2'):
+        values = np.array([r['metrics'][name] for r in results if r['metrics'][name] is not None])
+        if len(values) == 0:
+            aggregate[name] = None
+            continue
+        aggregate[name] = {
+            'mean': float(values.mean()),
+            'std': float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+            'min': float(values.min()),
+            'max': float(values.max())
+        }
+    return aggregate
+
+
+def run_cross_validation_job(progress, train_path, n_folds=DEFAULT_FOLDS, grouped=False, hyperparams=None,
+                             seed=DEFAULT_SEED, workers=None):
+    """
+    Background cross-validation job (runs in a JobRunner worker process)
+
+    Args:
+        progress: JobProgress handle (None when run from the command line)
+        train_path: Path to train_data.csv (its Parquet twin is used when present)
+        n_folds: Number of folds
+        grouped: Keep all rows of an indicator (GROUP_COLUMN) in the same fold
+        hyperparams: Overrides of DEFAULT_HYPERPARAMS
+        seed: Fold shuffle seed
+        workers: Pool size (default: one process per fold, capped at the CPU count)
+
+    Returns:
+        Dict with the settings, per-fold results, aggregate metrics and timing
+    """
+    if progress is not None:
+        progress.update(phase='loading_data')
+
+    start = time.perf_counter()
+    matrix = load_matrix(train_path)
+    if matrix.y is None:
+        raise ValueError("Target column 'value_log_scaled' not found in training data")
+    load_seconds = time.perf_counter() - start
+
+    group_index = None
+    if grouped:
+        if GROUP_COLUMN not in matrix.feature_names:
+            raise ValueError(f"Column '{GROUP_COLUMN}' not found in training data")
+        group_index = matrix.feature_names.index(GROUP_COLUMN)
+
+    hyperparams = dict(DEFAULT_HYPERPARAMS, **(hyperparams or {}))
+    print(f"[CV] {n_folds}-fold{' grouped by ' + GROUP_COLUMN if grouped else ''} cross-validation on "
+          f"{matrix.n_rows} rows, {hyperparams['n_estimators']} trees per fold")
+
+    start = time.perf_counter()
+    data_paths = (matrix.array_path('X'), matrix.array_path('y'))
+    folds, aggregate = cross_validate(data_paths, n_folds, hyperparams, group_index, seed, workers, progress)
+    wall_seconds = time.perf_counter() - start
+
+    for result in folds:
+        result.pop('sums')
+
+    fit_seconds = sum(result['fit_seconds'] for result in folds)
+    print(f"[CV] RMSE {aggregate['rmse']['mean']:.4f} +/- {aggregate['rmse']['std']:.4f} "
+          f"in {wall_seconds:.1f}s ({fit_seconds:.1f}s of fitting)")
+
+    return {
+        'n_folds': n_folds,
+        'grouped_by': GROUP_COLUMN if grouped else None,
+        'seed': seed,
+        'n_samples': matrix.n_rows,
+        'hyperparams': hyperparams,
+        'folds': folds,
+        'aggregate': aggregate,
+        'timing': {
+            'load_seconds': round(load_seconds, 3),
+            'wall_seconds': round(wall_seconds, 3),
+            'fit_seconds_total': round(fit_seconds, 3),
+            # Summed fold fit time over wall time: how much the pool overlapped the folds
+            'parallel_speedup': round(fit_seconds / wall_seconds, 2) if wall_seconds > 0 else None
+        }
+    }
+
+
+def _group_folds(groups, n_folds, seed):
+    """
+    Fold per row with every group in a single fold
+
+    Groups are shuffled with the seed, then assigned largest first to the
+    fold with the fewest rows so far (GroupKFold's balancing, with shuffled
+    ties; done here because GroupKFold only shuffles in scikit-learn >= 1.6).
+    """
+    uniques, group_ids = np.unique(groups, return_inverse=True)
+    if len(uniques) < n_folds:
+        raise ValueError(f"Only {len(uniques)} groups for {n_folds} folds")
+
+    sizes = np.bincount(group_ids)
+    order = np.random.default_rng(seed).permutation(len(uniques))
+    order = order[np.argsort(-sizes[order], kind='stable')]
+
+    fold_rows = np.zeros(n_folds, dtype=np.int64)
+    group_fold = np.empty(len(uniques), dtype=np.int32)
+    for group in order:
+        fold = int(np.argmin(fold_rows))
+        group_fold[group] = fold
+        fold_rows[fold] += sizes[group]
+    return group_fold[group_ids]
+
+
+def _open_shared_data(data_paths, n_folds, seed, group_index):
+    """(X, y, fold assignment), memory-mapped / computed once per worker"""
+    key = (data_paths, n_folds, seed, group_index)
+    shared = _shared_data.get(key)
+    if shared is None:
+        X, y = (np.load(path, mmap_mode='r') for path in data_paths)
+        groups = X[:, group_index] if group_index is not None else None
+        shared = (X, y, fold_assignment(len(y), n_folds, seed, groups))
+        _shared_data.clear()
+        _shared_data[key] = shared
+    return shared
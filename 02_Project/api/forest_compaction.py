@@ -0,0 +1,273 @@
+"""
+Forest Compaction
+Shrinks a trained forest to the smallest tree subset that stays within an
+accuracy tolerance on the validation set, stores its engine arrays as
+float32, and registers the result as a new model version
+"""
+
+import copy
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from forest_engine import CompiledForest
+from model_registry import ENGINE_DIR, ModelBundle
+
+
+# Allowed relative increase of the validation RMSE over the full forest
+DEFAULT_TOLERANCE = 0.01
+
+# Greedy selection on a small validation set overfits it with very few
+# trees; the compacted forest never goes below this many
+DEFAULT_MIN_TREES = 50
+
+# Validation rows the greedy selection scores (a seeded sample of larger
+# sets; the reported metrics always use every row)
+SELECTION_MAX_ROWS = 50000
+
+# Repeats per latency / load time measurement (the median / best is reported)
+LATENCY_REPEATS = 50
+LOAD_REPEATS = 3
+
+REPORT_FILE = 'compaction_report.json'
+
+TARGET_COLUMN = 'value_log_scaled'
+
+
+def greedy_select(tree_predictions, y_true, tolerance=DEFAULT_TOLERANCE, min_trees=DEFAULT_MIN_TREES,
+                  max_trees=None):
+    """
+    Forward selection: repeatedly add the tree that lowers validation RMSE most
+
+    Stops at the first subset of at least min_trees trees whose RMSE is
+    within tolerance of the full forest's. Each candidate's sum of squared
+    errors is updated from one matrix-vector product per step,
+
+        |r + p / k|^2 = |r|^2 + 2 (p . r) / k + |p|^2 / k^2
+
+    with r the current subset's residual rescaled to k trees, so no
+    (trees x rows) temporary is built per step.
+
+    Args:
+        tree_predictions: float64 array (n_trees, n_rows)
+        y_true: Targets (n_rows,)
+        tolerance: Allowed relative RMSE increase over the full forest
+        min_trees: Smallest subset to return
+        max_trees: Largest subset to try (default: all trees)
+
+    Returns:
+        (selected tree indices in the order they were picked, RMSE after each pick,
+        RMSE of the full forest)
+    """
+    P = np.asarray(tree_predictions, dtype=np.float64)
+    y = np.asarray(y_true, dtype=np.float64)
+    n_trees, n_rows = P.shape
+    max_trees = min(max_trees or n_trees, n_trees)
+    min_trees = min(min_trees, max_trees)
+
+    full_rmse = float(np.sqrt(np.mean((P.mean(axis=0) - y) ** 2)))
+    target = full_rmse * (1.0 + tolerance)
+
+    squared_norms = np.einsum('ij,ij->i', P, P)
+    available = np.ones(n_trees, dtype=bool)
+    total = np.zeros(n_rows)
+    selected, trace = [], []
+
+    while len(selected) < max_trees:
+        k = len(selected) + 1
+        residual = total / k - y
+        sse = residual @ residual + 2.0 * (P @ residual) / k + squared_norms / k ** 2
+        sse[~available] = np.inf
+
+        best = int(np.argmin(sse))
+        selected.append(best)
+        available[best] = False
+        total += P[best]
+        trace.append(float(np.sqrt(max(sse[best], 0.0) / n_rows)))
+
+        if k >= min_trees and trace[-1] <= target:
+            break
+
+    return selected, trace, full_rmse
+
+
+def compact_model(service, df_val, version=None, tolerance=DEFAULT_TOLERANCE, min_trees=DEFAULT_MIN_TREES,
+                  max_trees=None, df_test=None, activate=False, seed=0):
+    """
+    Compact a registered version into a new, smaller version
+
+    The trees are selected greedily on the validation set (see greedy_select)
+    and kept in the order they were picked, so anytime prediction evaluates
+    the most useful trees first. The sklearn pickle holds the selected trees
+    (sklearn's tree structure is float64 only); the memory-mapped engine
+    arrays that serve small batches are float32.
+
+    Args:
+        service: MLService whose registry holds the version
+        df_val: Validation DataFrame (features + target) to select trees on
+        version: Version to compact (default: the active one)
+        tolerance: Allowed relative validation RMSE increase
+        min_trees, max_trees: Bounds on the subset size
+        df_test: Optional held-out DataFrame for an unbiased before / after check
+            (the validation metrics are optimistic - the trees were picked on them)
+        activate: Serve the compacted version right away
+        seed: Seed for subsampling validation rows above SELECTION_MAX_ROWS
+
+    Returns:
+        Report dict (also written to <version_dir>/compaction_report.json)
+    """
+    base = service.get_bundle(version)
+    if TARGET_COLUMN not in df_val.columns:
+        raise ValueError(f"Validation data has no '{TARGET_COLUMN}' column")
+
+    X_val, _ = base.encoder.encode(df_val, base.feature_names)
+    y_val = df_val[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    if len(X_val) > SELECTION_MAX_ROWS:
+        rows = np.sort(np.random.default_rng(seed).choice(len(X_val), SELECTION_MAX_ROWS, replace=False))
+        X_val, y_val = X_val[rows], y_val[rows]
+
+    start = time.perf_counter()
+    selected, trace, full_rmse = greedy_select(_tree_predictions(base, X_val), y_val,
+                                               tolerance, min_trees, max_trees)
+    selection_seconds = time.perf_counter() - start
+    print(f"[COMPACT] Selected {len(selected)} of {base.n_trees} trees in {selection_seconds:.1f}s "
+          f"(selection RMSE {trace[-1]:.4f}, full forest {full_rmse:.4f})")
+
+    model = copy.copy(base.model)
+    model.estimators_ = [base.model.estimators_[i] for i in selected]
+    model.n_estimators = len(selected)
+    for attr in ('oob_score_', 'oob_prediction_'):
+        model.__dict__.pop(attr, None)
+    engine = CompiledForest.from_sklearn(model).to_float32()
+
+    feature_importance = [
+        {'feature': name, 'importance': float(imp)}
+        for name, imp in zip(base.feature_names, model.feature_importances_)
+    ]
+    feature_importance.sort(key=lambda x: x['importance'], reverse=True)
+
+    new_version, version_dir = service.registry.new_version()
+    metadata = dict(base.metadata)
+    for key in ('training_metrics', 'growth'):
+        metadata.pop(key, None)
+    metadata.update({
+        'version': new_version,
+        'training_date': datetime.now().isoformat(),
+        'n_estimators': len(selected),
+        'parent_version': base.version,
+        'lineage': base.metadata.get('lineage', []) + [base.version],
+        'compaction': {
+            'parent_n_estimators': base.n_trees,
+            'tolerance': tolerance,
+            'min_trees': min_trees,
+            'selected_trees': selected,
+            'engine_dtype': 'float32'
+        }
+    })
+
+    bundle = ModelBundle(new_version, model, metadata, base.feature_names, feature_importance,
+                         base.encoder, base.value_log_scaler, engine=engine)
+
+    # Cached so the comparison scores the new version before it is on disk
+    service.registry.put(bundle)
+    comparisons = {'validation': service.evaluate_model(df_val, 'Validation', new_version, group_by=[],
+                                                        baseline_version=base.version)}
+    if df_test is not None:
+        comparisons['test'] = service.evaluate_model(df_test, 'Test', new_version, group_by=[],
+                                                     baseline_version=base.version)
+
+    metadata['metrics'] = comparisons['validation']['metrics']
+    metadata['metrics_source'] = 'validation'
+    bundle.save(version_dir)
+    print(f"[COMPACT] Model artifacts saved to {version_dir}")
+
+    base_dir = service.registry.version_dir(base.version)
+    report = {
+        'version': new_version,
+        'parent_version': base.version,
+        'n_trees': {'before': base.n_trees, 'after': len(selected)},
+        'tolerance': tolerance,
+        'selection': {
+            'rows': len(y_val),
+            'seconds': round(selection_seconds, 3),
+            'full_forest_rmse': full_rmse,
+            'rmse_trace': trace
+        },
+        'metrics': {
+            name: {
+                'n_samples': result['n_samples'],
+                'before': result['baseline']['metrics'],
+                'after': result['metrics'],
+                'delta': result['delta']
+            }
+            for name, result in comparisons.items()
+        },
+        'size_bytes': {'before': _artifact_sizes(base_dir), 'after': _artifact_sizes(version_dir)},
+        'activated': False
+    }
+    benchmarks = {'before': _benchmark(base.version, base_dir, X_val),
+                  'after': _benchmark(new_version, version_dir, X_val)}
+    for key in ('load_seconds', 'latency_ms'):
+        report[key] = {label: result[key] for label, result in benchmarks.items()}
+
+    if activate:
+        service.activate_version(new_version)
+        report['activated'] = True
+
+    with open(os.path.join(version_dir, REPORT_FILE), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+def _tree_predictions(bundle, X):
+    """(n_trees, n_rows) float64 prediction of every tree"""
+    if bundle.engine is not None:
+        return bundle.engine.tree_predictions(X).astype(np.float64, copy=False)
+    return np.stack([estimator.predict(X) for estimator in bundle.model.estimators_])
+
+
+def _artifact_sizes(version_dir):
+    """Bytes on disk of the sklearn pickle, the engine arrays and the whole version"""
+    engine_dir = os.path.join(version_dir, ENGINE_DIR)
+    engine_bytes = sum(os.path.getsize(os.path.join(engine_dir, name)) for name in os.listdir(engine_dir)) \
+        if os.path.isdir(engine_dir) else 0
+    pickle_bytes = os.path.getsize(os.path.join(version_dir, 'final_rf_model.pkl'))
+    other_bytes = sum(os.path.getsize(os.path.join(version_dir, name)) for name in os.listdir(version_dir)
+                      if os.path.isfile(os.path.join(version_dir, name)) and name != 'final_rf_model.pkl')
+    return {'pickle': pickle_bytes, 'engine': engine_bytes, 'total': pickle_bytes + engine_bytes + other_bytes}
+
+
+def _benchmark(version, version_dir, X):
+    """
+    Load time and engine latency of a saved version
+
+    Load times are the best of LOAD_REPEATS fresh loads: the bundle (engine
+    arrays memory-mapped) and then the sklearn pickle. Latency is the median
+    of LATENCY_REPEATS predictions of 1 and 256 rows from the mapped engine.
+    """
+    bundle_seconds, pickle_seconds = [], []
+    for _ in range(LOAD_REPEATS):
+        bundle = ModelBundle.load(version, version_dir)
+        bundle_seconds.append(bundle.load_seconds)
+        if not bundle.model_loaded:
+            bundle.model
+        pickle_seconds.append(bundle.model_load_seconds)
+
+    latency = {}
+    if bundle.engine is not None:
+        for rows in (1, 256):
+            batch = np.resize(X, (rows, X.shape[1]))
+            bundle.engine.predict(batch)
+            times = []
+            for _ in range(LATENCY_REPEATS):
+                start = time.perf_counter()
+                bundle.engine.predict(batch)
+                times.append(time.perf_counter() - start)
+            latency[f'{rows}_rows'] = round(float(np.median(times)) * 1000, 4)
+
+    return {'load_seconds': {'bundle': round(min(bundle_seconds), 4), 'sklearn_pickle': round(min(pickle_seconds), 4)},
+            'latency_ms': latency}
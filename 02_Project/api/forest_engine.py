@@ -0,0 +1,389 @@
+"""
+Compiled Forest Inference Engine
+Flattens a trained RandomForestRegressor into contiguous NumPy node arrays
+and evaluates every tree level-by-level for a whole batch at once
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+
+# Node arrays written by save() as <name>.npy, in constructor order
+ARRAY_NAMES = ('feature', 'threshold', 'children', 'value', 'roots')
+
+# Upper bound on (trees x rows) node indices walked at once, sized so temporaries stay in cache
+BLOCK_ELEMENTS = 1 << 16
+
+# Trees evaluated between two stopping checks in anytime prediction
+ANYTIME_BLOCK_TREES = 25
+
+
+class CompiledForest:
+    """
+    Array-compiled tree ensemble
+
+    All trees are stored back to back in flat arrays:
+      feature   - split feature per node (0 for leaves)
+      threshold - split threshold per node (+inf for leaves)
+      children  - left/right child index per node, interleaved as [2 * node + go_right]
+                  (leaves point to themselves)
+      value     - prediction stored at each node
+      roots     - index of each tree's root node
+
+    Because leaves loop back to themselves, walking a batch for max_depth
+    steps lands every (tree, row) pair on its leaf without per-tree Python
+    dispatch. Predictions match sklearn: rows are cast to float32 and compared
+    with `x <= threshold` exactly like the Cython tree code.
+
+    threshold and value are float64 as compiled, or float32 after
+    to_float32() (compacted versions), which halves them without changing
+    which leaf any row reaches.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features):
+        """
+        Initialize from already flattened arrays
+
+        Args:
+            feature: int array (n_nodes,) of split features
+            threshold: float64 or float32 array (n_nodes,) of split thresholds
+            children: int array (2 * n_nodes,) of interleaved left/right child indices
+            value: float64 or float32 array (n_nodes,) of node predictions
+            roots: int array (n_trees,) of root node indices
+            max_depth: Deepest tree in the forest
+            n_features: Number of input features
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+        # True when the node arrays are read-only views of files (see load)
+        self.mapped = False
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Compile a fitted sklearn forest
+
+        Args:
+            model: Fitted RandomForestRegressor (single output)
+
+        Returns:
+            CompiledForest
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = np.array([tree.node_count for tree in trees], dtype=np.int32)
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+        n_nodes = int(sizes.sum())
+
+        feature = np.empty(n_nodes, dtype=np.int32)
+        threshold = np.empty(n_nodes, dtype=np.float64)
+        children = np.empty((n_nodes, 2), dtype=np.int32)
+        value = np.empty(n_nodes, dtype=np.float64)
+
+        for tree, offset in zip(trees, roots):
+            nodes = slice(offset, offset + tree.node_count)
+            node_ids = np.arange(offset, offset + tree.node_count, dtype=np.int32)
+            is_leaf = tree.children_left == -1
+
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+            children[nodes, 0] = np.where(is_leaf, node_ids, tree.children_left + offset)
+            children[nodes, 1] = np.where(is_leaf, node_ids, tree.children_right + offset)
+            value[nodes] = tree.value[:, 0, 0]
+
+        children = children.ravel()
+
+        max_depth = max(tree.max_depth for tree in trees)
+
+        return cls(feature, threshold, children, value, roots, max_depth, model.n_features_in_)
+
+    def to_float32(self):
+        """
+        Copy with float32 thresholds and node values
+
+        Each threshold is rounded down to the largest float32 not above it.
+        Inputs are float32, and for a float32 x `x <= t` holds exactly when
+        `x <= round_down(t)`, so every row still reaches the same leaf; only
+        the leaf values lose precision (about 1e-7 relative).
+
+        Returns:
+            CompiledForest
+        """
+        threshold = self.threshold.astype(np.float32)
+        too_high = threshold.astype(np.float64) > self.threshold
+        threshold[too_high] = np.nextafter(threshold[too_high], np.float32(-np.inf))
+
+        return CompiledForest(np.array(self.feature), threshold, np.array(self.children),
+                              self.value.astype(np.float32), np.array(self.roots),
+                              self.max_depth, self.n_features)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load node arrays written by save()
+
+        With mmap_mode='r' the arrays are read-only views of the files, so
+        every process serving the same model shares one page-cache copy
+        instead of holding a private one.
+
+        Args:
+            directory: Directory written by save()
+            mmap_mode: np.load memory-map mode (None reads into private memory)
+
+        Returns:
+            CompiledForest
+        """
+        with open(os.path.join(directory, 'engine.json'), 'r') as f:
+            shape = json.load(f)
+
+        arrays = []
+        for name in ARRAY_NAMES:
+            arr = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            # Plain ndarray view of the mapping - skips np.memmap overhead on every fancy index
+            arrays.append(arr.view(np.ndarray) if isinstance(arr, np.memmap) else arr)
+
+        forest = cls(*arrays, max_depth=shape['max_depth'], n_features=shape['n_features'])
+        forest.mapped = mmap_mode is not None
+        return forest
+
+    def save(self, directory):
+        """
+        Save node arrays as uncompressed .npy files that load() can memory-map
+
+        Args:
+            directory: Target directory (created if missing)
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+
+        with open(os.path.join(directory, 'engine.json'), 'w') as f:
+            json.dump({'max_depth': self.max_depth, 'n_features': self.n_features}, f, indent=2)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        """Memory held by the node arrays"""
+        return int(sum(arr.nbytes for arr in (self.feature, self.threshold, self.children, self.value, self.roots)))
+
+    def predict(self, X):
+        """
+        Predict a batch with every tree
+
+        Args:
+            X: Array-like (n_rows, n_features) in training feature order
+
+        Returns:
+            float64 array (n_rows,) of forest predictions
+        """
+        X = self._check_input(X)
+        predictions = np.empty(len(X), dtype=np.float64)
+
+        for start, stop in self._row_blocks(len(X)):
+            predictions[start:stop] = self._tree_values(X[start:stop]).mean(axis=0, dtype=np.float64)
+
+        return predictions
+
+    def tree_predictions(self, X):
+        """
+        Every tree's prediction for every row, in one vectorized pass per row block
+
+        Args:
+            X: Array-like (n_rows, n_features) in training feature order
+
+        Returns:
+            float64 array (n_trees, n_rows); its mean over axis 0 is predict(X)
+        """
+        X = self._check_input(X)
+        values = np.empty((self.n_trees, len(X)), dtype=np.float64)
+
+        for start, stop in self._row_blocks(len(X)):
+            values[:, start:stop] = self._tree_values(X[start:stop])
+
+        return values
+
+    def leaf_values(self, leaves):
+        """
+        Trees x rows prediction matrix from per-tree leaf ids
+
+        Compiling keeps sklearn's node ids within each tree (offset by the
+        tree's root), so the output of the sklearn forest's apply() maps
+        straight onto the value array.
+
+        Args:
+            leaves: int array (n_rows, n_trees) of leaf node ids per tree
+
+        Returns:
+            array (n_trees, n_rows) in the value array's dtype, same values
+            as tree_predictions
+        """
+        return self.value[np.ascontiguousarray((leaves + self.roots).T)]
+
+    def predict_anytime(self, X, budget_ms=None, tolerance=None, block_trees=ANYTIME_BLOCK_TREES):
+        """
+        Predict with as many trees as a latency budget / error tolerance allows
+
+        Trees are evaluated in their stored order, block_trees at a time; see
+        anytime_average for the stopping rules and the returned info.
+
+        Args:
+            X: Array-like (n_rows, n_features) in training feature order
+            budget_ms: Stop before a block that would exceed this many ms
+            tolerance: Stop once every row's standard error is at most this
+            block_trees: Trees per block
+
+        Returns:
+            (predictions, info) as returned by anytime_average
+        """
+        X = self._check_input(X)
+        return anytime_average(self._iter_tree_blocks(X, block_trees), self.n_trees, budget_ms, tolerance)
+
+    def _iter_tree_blocks(self, X, block_trees):
+        """Yield (n_block_trees, n_rows) leaf values, block_trees trees at a time"""
+        for start in range(0, self.n_trees, block_trees):
+            roots = self.roots[start:start + block_trees]
+            values = np.empty((len(roots), len(X)), dtype=np.float64)
+
+            block_rows = max(1, BLOCK_ELEMENTS // len(roots))
+            for row_start in range(0, len(X), block_rows):
+                row_stop = min(row_start + block_rows, len(X))
+                values[:, row_start:row_stop] = self._tree_values(X[row_start:row_stop], roots)
+
+            yield values
+
+    def _check_input(self, X):
+        """Cast to contiguous float32, the precision sklearn trees split on"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+        return X
+
+    def _row_blocks(self, n_rows):
+        """Split rows so a block never walks more than BLOCK_ELEMENTS nodes at once"""
+        block_rows = max(1, BLOCK_ELEMENTS // self.n_trees)
+        for start in range(0, n_rows, block_rows):
+            yield start, min(start + block_rows, n_rows)
+
+    def _tree_values(self, X_block, roots=None):
+        """
+        Walk a block of rows down every tree
+
+        Args:
+            X_block: float32 array (n_rows, n_features)
+            roots: Root indices of the trees to walk (default: all trees)
+
+        Returns:
+            array (n_trees, n_rows) of leaf values, in the value array's dtype
+        """
+        roots = self.roots if roots is None else roots
+        n_rows = len(X_block)
+        flat_X = X_block.ravel()
+        row_offsets = np.arange(n_rows, dtype=np.int32) * np.int32(self.n_features)
+
+        # One column of node indices per row, one row per tree
+        nodes = np.repeat(roots[:, None], n_rows, axis=1)
+
+        for _ in range(self.max_depth):
+            x = flat_X[row_offsets + self.feature[nodes]]
+            go_right = x > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+
+        return self.value[nodes]
+
+
+def anytime_average(blocks, n_trees, budget_ms=None, tolerance=None):
+    """
+    Average per-tree predictions block by block until a stopping rule fires
+
+    The per-row mean and variance across trees are merged block by block
+    (Chan et al.'s parallel form of Welford's update). The forest is a
+    random-order ensemble, so the first k trees are a simple random sample
+    of all n_trees and the standard error of their mean against the full
+    forest's prediction is
+
+        sqrt(var / k * (n_trees - k) / (n_trees - 1))
+
+    i.e. it shrinks to 0 once every tree has been used.
+
+    The first block is always evaluated. After that evaluation stops when
+    every row's standard error is within tolerance ('converged'), or when the
+    next block - assumed to take as long as the last one - would end past
+    budget_ms ('budget'). Otherwise all trees are used ('all_trees').
+
+    Args:
+        blocks: Iterable of (n_block_trees, n_rows) per-tree predictions
+        n_trees: Number of trees blocks can yield in total
+        budget_ms: Latency budget in ms (None: no budget)
+        tolerance: Standard error every row must reach (None: no threshold)
+
+    Returns:
+        (predictions, info): float64 array (n_rows,) and a dict with
+        trees_used, n_trees, stop_reason, elapsed_ms and std_error (per row)
+    """
+    started = time.perf_counter()
+    count = 0
+    mean = m2 = None
+    std_error = None
+    stop_reason = 'all_trees'
+
+    # Blocks are usually produced lazily, so a block's cost is the time between iterations
+    block_started = started
+    for values in blocks:
+        block_count = len(values)
+        block_mean = values.mean(axis=0)
+        block_m2 = ((values - block_mean) ** 2).sum(axis=0)
+
+        if mean is None:
+            mean, m2 = block_mean, block_m2
+        else:
+            total = count + block_count
+            delta = block_mean - mean
+            mean = mean + delta * (block_count / total)
+            m2 = m2 + block_m2 + delta ** 2 * (count * block_count / total)
+        count += block_count
+
+        std_error = _finite_std_error(m2, count, n_trees)
+        if count >= n_trees:
+            break
+
+        if tolerance is not None and np.all(std_error <= tolerance):
+            stop_reason = 'converged'
+            break
+
+        now = time.perf_counter()
+        if budget_ms is not None and (now - started + now - block_started) * 1000 > budget_ms:
+            stop_reason = 'budget'
+            break
+        block_started = now
+
+    info = {
+        'trees_used': count,
+        'n_trees': int(n_trees),
+        'stop_reason': stop_reason,
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+        'std_error': std_error
+    }
+    return mean, info
+
+
+def _finite_std_error(m2, count, n_trees):
+    """Standard error of a k-tree mean against the n_trees mean (finite population correction)"""
+    if count >= n_trees:
+        return np.zeros_like(m2)
+    if count < 2:
+        # One tree says nothing about the spread
+        return np.full_like(m2, np.inf)
+    variance = m2 / (count - 1)
+    return np.sqrt(variance / count * (n_trees - count) / (n_trees - 1))
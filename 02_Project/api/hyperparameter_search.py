@@ -0,0 +1,356 @@
+"""
+Hyperparameter Search
+Randomized and successive-halving search over Random Forest hyperparameters,
+with trials run in a process pool over memory-mapped training data
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from matrix_cache import load_matrix
+from streaming_metrics import RegressionAccumulator
+
+
+STRATEGIES = ('halving', 'random')
+
+# Values sampled per hyperparameter; n_estimators is also the budget
+# successive halving grows surviving candidates towards
+SEARCH_SPACE = {
+    'n_estimators': [100, 200, 300, 500, 750, 1000],
+    'max_features': ['sqrt', 'log2', 0.2, 0.33, 0.5, 1.0],
+    'min_samples_leaf': [1, 2, 3, 5, 8, 12, 20]
+}
+
+DEFAULT_CANDIDATES = 24
+
+# Successive halving: keep the best 1/ETA candidates per rung, multiply their trees by ETA
+DEFAULT_ETA = 3
+DEFAULT_MIN_TREES = 25
+
+# Fixed for every trial and the promoted model
+DEFAULT_RANDOM_STATE = 123
+
+# Memory-mapped matrices opened by this worker process, by array paths
+_shared_data = {}
+
+
+def sample_candidates(n_candidates, seed, space=None):
+    """
+    Draw distinct hyperparameter combinations from the search space
+
+    Args:
+        n_candidates: Number of combinations (capped at the size of the space)
+        seed: Random seed
+        space: {name: [values]} (default SEARCH_SPACE)
+
+    Returns:
+        List of hyperparameter dicts
+    """
+    space = space or SEARCH_SPACE
+    names = list(space)
+    sizes = [len(space[name]) for name in names]
+    total = int(np.prod(sizes))
+
+    rng = np.random.default_rng(seed)
+    flat = rng.choice(total, size=min(n_candidates, total), replace=False)
+    candidates = []
+    for position in zip(*np.unravel_index(flat, sizes)):
+        candidates.append({name: _plain(space[name][i]) for name, i in zip(names, position)})
+    return candidates
+
+
+def successive_halving_rungs(max_trees, min_trees=DEFAULT_MIN_TREES, eta=DEFAULT_ETA):
+    """Tree budget per rung: min_trees * eta^i, ending exactly at max_trees"""
+    rungs = []
+    budget = min_trees
+    while budget < max_trees:
+        rungs.append(budget)
+        budget *= eta
+    rungs.append(max_trees)
+    return rungs
+
+
+def share_training_data(train_path, val_path):
+    """
+    Encode train / validation data into the matrix cache, which workers memory-map
+
+    The cached features are the float32 C-contiguous matrices the trees split
+    on, so neither the fit nor the validation predict copies them, every
+    worker process shares the same page cache instead of receiving a pickle,
+    and a later search on unchanged files skips parsing and encoding.
+
+    Returns:
+        Dict with the array paths (X_train, y_train, X_val, y_val), row
+        counts, feature names and the training TrainingMatrix
+    """
+    train = load_matrix(train_path)
+    val = load_matrix(val_path, train.encoder, train.feature_names)
+    if train.y is None or val.y is None:
+        raise ValueError("Target column 'value_log_scaled' not found in the training / validation data")
+
+    paths = {f'{name}_{split}': matrix.array_path(name)
+             for split, matrix in (('train', train), ('val', val)) for name in ('X', 'y')}
+    return dict(paths, n_train=train.n_rows, n_val=val.n_rows, feature_names=train.feature_names, train=train)
+
+
+def run_trial(data_paths, hyperparams, n_trees, random_state=DEFAULT_RANDOM_STATE, model_path=None,
+              keep_model=False):
+    """
+    Grow one candidate to n_trees trees and score it on the validation set
+
+    Runs in a pool worker. A candidate's forest from its previous rung is
+    loaded from model_path and grown with warm_start, so a survivor only
+    fits the trees its new budget adds. With a fixed random_state the grown
+    forest is the one a fresh fit with n_trees trees would give.
+
+    Args:
+        model_path: Where the candidate's forest is kept between rungs
+        keep_model: Save the grown forest to model_path for the next rung
+
+    Returns:
+        Dict with rmse / mae / r2 on the validation set, the fit time and the
+        number of trees fitted by this call
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    X_train, y_train, X_val, y_val = _open_shared_data(data_paths)
+
+    start = time.perf_counter()
+    if model_path is not None and os.path.exists(model_path):
+        model = joblib.load(model_path)
+        model.set_params(n_estimators=n_trees, warm_start=True)
+    else:
+        model = RandomForestRegressor(**dict(hyperparams, n_estimators=n_trees, random_state=random_state, n_jobs=1))
+    trees_before = len(getattr(model, 'estimators_', []))
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    if keep_model:
+        tmp_path = f'{model_path}.{os.getpid()}.tmp'
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, model_path)
+
+    accumulator = RegressionAccumulator()
+    accumulator.update(y_val, model.predict(X_val))
+    return dict(accumulator.result(), fit_seconds=round(fit_seconds, 3), trees_fitted=n_trees - trees_before)
+
+
+def search(progress, data_paths, candidates, strategy='halving', eta=DEFAULT_ETA, min_trees=DEFAULT_MIN_TREES,
+           workers=None, random_state=DEFAULT_RANDOM_STATE):
+    """
+    Evaluate candidates rung by rung in a process pool
+
+    halving: every rung grows the surviving candidates to min_trees * eta^i
+        trees (capped at each candidate's own n_estimators) and keeps the best
+        1/eta by validation RMSE, so losing configs stop after a fraction of
+        their trees. Survivors' forests are kept in a temporary directory
+        between rungs and grown with warm_start, so no tree is fitted twice.
+    random: one rung, every candidate fitted with its full n_estimators.
+
+    Args:
+        progress: JobProgress handle (cancellation is checked after every trial)
+        data_paths: (X_train, y_train, X_val, y_val) .npy paths from share_training_data
+        candidates: Hyperparameter dicts from sample_candidates
+
+    Returns:
+        (trials, rungs): one result per candidate ranked by validation RMSE
+        (completed candidates first), and the tree budget of each rung
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy must be one of: {', '.join(STRATEGIES)}")
+
+    max_trees = max(candidate['n_estimators'] for candidate in candidates)
+    rungs = successive_halving_rungs(max_trees, min_trees, eta) if strategy == 'halving' else [max_trees]
+
+    model_dir = tempfile.mkdtemp(prefix='tune_') if len(rungs) > 1 else None
+    try:
+        return _search_rungs(progress, data_paths, candidates, rungs, eta, workers, random_state, model_dir)
+    finally:
+        if model_dir is not None:
+            shutil.rmtree(model_dir, ignore_errors=True)
+
+
+def _search_rungs(progress, data_paths, candidates, rungs, eta, workers, random_state, model_dir):
+    """Rung loop of search (candidate forests between rungs live in model_dir)"""
+    trials = [{'trial': i, 'hyperparams': candidate, 'status': 'running', 'history': []}
+              for i, candidate in enumerate(candidates)]
+    active = list(trials)
+    total_fits = _planned_fits(len(trials), len(rungs), eta)
+    fits_done = 0
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(trials))) as pool:
+        for rung, budget in enumerate(rungs):
+            if len(active) == 1 and rung < len(rungs) - 1:
+                # Nothing left to compare - the survivor goes straight to its full size
+                continue
+
+            pending = {}
+            for trial in active:
+                n_trees = min(budget, trial['hyperparams']['n_estimators'])
+                if trial.get('n_trees') == n_trees:
+                    # Already at its own n_estimators - the last score stands
+                    continue
+                params = {k: v for k, v in trial['hyperparams'].items() if k != 'n_estimators'}
+                model_path = os.path.join(model_dir, f"trial-{trial['trial']}.pkl") if model_dir else None
+                # Forests that can't grow any further aren't needed again
+                keep_model = model_path is not None and n_trees < trial['hyperparams']['n_estimators'] \
+                    and rung < len(rungs) - 1
+                future = pool.submit(run_trial, data_paths, params, n_trees, random_state, model_path, keep_model)
+                pending[future] = (trial, n_trees)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial, n_trees = pending.pop(future)
+                    result = future.result()
+                    trial['history'].append(dict(result, rung=rung, n_trees=n_trees))
+                    trial.update(n_trees=n_trees, rung=rung, metrics=result)
+                    fits_done += 1
+
+                best = min(t['metrics']['rmse'] for t in trials if 'metrics' in t)
+                progress.update(phase='searching', rung=rung, rungs=len(rungs), tree_budget=budget,
+                                fits_done=fits_done, fraction=min(fits_done / total_fits, 0.99),
+                                best_val_rmse=best)
+                if progress.cancelled():
+                    # Fits already running finish; leaving the with block joins the pool
+                    for future in pending:
+                        future.cancel()
+                    progress.check_cancelled()
+
+            active.sort(key=lambda t: t['metrics']['rmse'])
+            if rung < len(rungs) - 1:
+                keep = max(1, len(active) // eta)
+                print(f"[TUNE] Rung {rung}: {budget} trees, kept {keep} of {len(active)} candidates "
+                      f"(best val RMSE {active[0]['metrics']['rmse']:.4f})")
+                for trial in active[keep:]:
+                    trial['status'] = 'stopped'
+                    trial['stopped_at_rung'] = rung
+                    if model_dir is not None:
+                        _remove(os.path.join(model_dir, f"trial-{trial['trial']}.pkl"))
+                active = active[:keep]
+
+    for trial in active:
+        trial['status'] = 'completed'
+
+    return _rank_trials(trials), rungs
+
+
+def _rank_trials(trials):
+    """
+    Sort trials best first and number them
+
+    Completed candidates rank by validation RMSE alone: one that reached its
+    own n_estimators early keeps the rung of its last fit, so rungs don't
+    compare them. Stopped candidates follow, the ones stopped latest first.
+    """
+    def key(trial):
+        if trial['status'] == 'completed':
+            return (0, 0, trial['metrics']['rmse'])
+        return (1, -trial['stopped_at_rung'], trial['metrics']['rmse'])
+
+    trials.sort(key=key)
+    for rank, trial in enumerate(trials, 1):
+        trial['rank'] = rank
+    return trials
+
+
+def run_tuning_job(progress, model_dir, train_path, val_path, strategy='halving', n_candidates=DEFAULT_CANDIDATES,
+                   eta=DEFAULT_ETA, min_trees=DEFAULT_MIN_TREES, space=None, seed=0, workers=None, promote=False):
+    """
+    Background tuning job (runs in a JobRunner worker process)
+
+    Args:
+        progress: JobProgress handle for status updates and cancellation
+        model_dir: Serving model directory (registry root)
+        train_path: Path to train_data.csv (its Parquet twin is used when present)
+        val_path: Path to val_data.csv, which the candidates are ranked on
+        strategy: 'halving' or 'random'
+        n_candidates: Number of sampled hyperparameter combinations
+        eta, min_trees: Successive halving settings
+        space: Optional search space {name: [values]} (default SEARCH_SPACE)
+        seed: Seed for sampling candidates
+        workers: Pool size (default: number of CPUs)
+        promote: Train the winner on train_data and register it as a new
+            version (the serving process activates it when the job completes)
+
+    Returns:
+        Dict with the ranked trials, the best hyperparameters and, when
+        promoted, the new version id
+    """
+    space = space or SEARCH_SPACE
+    candidates = sample_candidates(n_candidates, seed, space)
+
+    progress.update(phase='loading_data')
+    shared = share_training_data(train_path, val_path)
+    data_paths = tuple(shared[name] for name in ('X_train', 'y_train', 'X_val', 'y_val'))
+    print(f"[TUNE] {len(candidates)} candidates ({strategy}), {shared['n_train']} training rows, "
+          f"{shared['n_val']} validation rows")
+
+    start = time.perf_counter()
+    trials, rungs = search(progress, data_paths, candidates, strategy, eta, min_trees, workers)
+    search_seconds = time.perf_counter() - start
+
+    best = trials[0]
+    best_hyperparams = dict(best['hyperparams'], random_state=DEFAULT_RANDOM_STATE, n_jobs=-1)
+    print(f"[TUNE] Best: {best['hyperparams']} - val RMSE {best['metrics']['rmse']:.4f}")
+
+    result = {
+        'strategy': strategy,
+        'rungs': rungs,
+        'n_candidates': len(trials),
+        'n_train': shared['n_train'],
+        'n_val': shared['n_val'],
+        'search_seconds': round(search_seconds, 2),
+        'trees_fitted': sum(entry['trees_fitted'] for trial in trials for entry in trial['history']),
+        'best': {'hyperparams': best_hyperparams, 'val_metrics': best['metrics']},
+        'trials': trials,
+        'version': None
+    }
+
+    if promote:
+        from ml_service import MLService
+        progress.update(phase='training_winner', fraction=0.99)
+        trained = MLService(model_dir).train_model(shared['train'], best_hyperparams, publish=False)
+        result['version'] = trained['version']
+        result['promoted_metrics'] = trained['metrics']
+
+    return result
+
+
+def _planned_fits(n_candidates, n_rungs, eta):
+    """Number of trial fits over all rungs (for the progress fraction)"""
+    fits, active = 0, n_candidates
+    for rung in range(n_rungs):
+        fits += active
+        if rung < n_rungs - 1:
+            active = max(1, active // eta)
+    return fits
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _open_shared_data(data_paths):
+    """(X_train, y_train, X_val, y_val) memory-mapped read-only, opened once per worker"""
+    arrays = _shared_data.get(data_paths)
+    if arrays is None:
+        arrays = tuple(np.load(path, mmap_mode='r') for path in data_paths)
+        _shared_data.clear()
+        _shared_data[data_paths] = arrays
+    return arrays
+
+
+def _plain(value):
+    """numpy scalars from the search space as plain Python values (JSON and sklearn friendly)"""
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,244 @@
+"""
+Instrumentation
+Low-overhead stage timers, counters and gauges for the ML API, exported in
+the Prometheus text format by /api/ml/metrics
+"""
+
+import bisect
+import threading
+import time
+
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds (0.5 ms to 60 s)
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Row count buckets for batch sizes
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class _Metric:
+    """One metric family: a value (or histogram) per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        """Exposition lines for this family"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{self._labels(label_values)} {_format_value(value)}")
+        return lines
+
+    def _labels(self, label_values, extra=None):
+        pairs = list(zip(self.label_names, label_values))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, optionally read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, label_names=(), function=None):
+        """
+        Args:
+            function: Optional callable returning {label_values tuple: value}
+                (or a single number without labels), called on every render
+        """
+        super().__init__(name, documentation, label_names)
+        self.function = function
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self):
+        if self.function is not None:
+            values = self.function()
+            if not isinstance(values, dict):
+                values = {} if values is None else {(): values}
+            with self._lock:
+                self._values = {key: value for key, value in values.items() if value is not None}
+        return super().render()
+
+
+class Histogram(_Metric):
+    """Counts of observations per bucket, plus their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        # Non-cumulative counts; the last slot is the +Inf bucket
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def totals(self, *label_values):
+        """(sum, count) of the observations for one set of label values"""
+        with self._lock:
+            state = self._values.get(label_values)
+            return (state[1], state[2]) if state is not None else (0.0, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+
+        for label_values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f"{self.name}_bucket{self._labels(label_values, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(label_values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ordered collection of metric families rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, label_names=()):
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=(), function=None):
+        return self._register(Gauge(name, documentation, label_names, function))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+# Process-wide registry and the metrics the API and MLService record into
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'ml_stage_duration_seconds', 'Time spent in each step of handling a request', ['stage'])
+REQUEST_SECONDS = REGISTRY.histogram(
+    'ml_request_duration_seconds', 'Request latency including streamed bodies', ['endpoint'])
+REQUESTS = REGISTRY.counter(
+    'ml_requests_total', 'Requests handled', ['endpoint', 'status'])
+IN_FLIGHT = REGISTRY.gauge(
+    'ml_requests_in_flight', 'Requests currently being handled')
+ROWS = REGISTRY.counter(
+    'ml_rows_total', 'Rows predicted (input) and scored by the forest (after dedup and cache hits)', ['kind'])
+BATCH_ROWS = REGISTRY.histogram(
+    'ml_predict_batch_rows', 'Rows per batch sent to the forest', buckets=ROW_BUCKETS)
+
+
+class _StageTimer:
+    """Context manager behind stage() (a plain class is ~4x cheaper than @contextmanager)"""
+
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.name)
+        return False
+
+
+def stage(name):
+    """Time a `with` block into ml_stage_duration_seconds{stage=name}"""
+    return _StageTimer(name)
+
+
+def timed_iter(iterable, name):
+    """
+    Iterate, timing every next() call as stage `name` (e.g. reading chunks)
+
+    Closing the returned generator closes the wrapped iterator too.
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            STAGE_SECONDS.observe(time.perf_counter() - started, name)
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
@@ -0,0 +1,229 @@
+"""
+Background Job Runner
+Runs long tasks (model training) in a process pool so they never block a
+Flask worker, with file-based status so any worker can answer a poll
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+
+TERMINAL_STATES = ('completed', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+
+class JobProgress:
+    """
+    Progress handle passed to a running job
+
+    Lives in the worker process; every update rewrites the job's status file
+    so the API process can poll it without shared memory.
+    """
+
+    def __init__(self, jobs_dir, job_id):
+        self.jobs_dir = jobs_dir
+        self.job_id = job_id
+
+    def update(self, **progress):
+        """Merge progress fields into the job status"""
+        status = _read_status(self.jobs_dir, self.job_id) or {}
+        status.setdefault('progress', {}).update(progress)
+        _write_status(self.jobs_dir, self.job_id, status)
+
+    def cancelled(self):
+        """True once cancellation was requested for this job"""
+        return os.path.exists(_cancel_path(self.jobs_dir, self.job_id))
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested"""
+        if self.cancelled():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+
+class JobRunner:
+    """
+    Process-pool-backed job queue
+
+    Jobs are module-level functions called as fn(progress, **kwargs) in a
+    worker process. Their status lives in jobs_dir/<job_id>.json:
+      queued -> running -> completed | failed | cancelled
+    On completion the optional on_complete(result) callback runs in this
+    process, e.g. to swap a freshly trained model into service.
+    """
+
+    def __init__(self, jobs_dir, max_workers=1):
+        """
+        Initialize job runner
+
+        Args:
+            jobs_dir: Directory for job status and cancellation files
+            max_workers: Number of jobs that can run at the same time
+        """
+        self.jobs_dir = jobs_dir
+        self.max_workers = max_workers
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def submit(self, kind, fn, kwargs=None, on_complete=None):
+        """
+        Queue a job
+
+        Args:
+            kind: Short job type label (e.g. 'train')
+            fn: Module-level function fn(progress, **kwargs) run in the pool
+            kwargs: Picklable keyword arguments for fn
+            on_complete: Optional callback(result) run here after success
+
+        Returns:
+            Job id
+        """
+        job_id = uuid.uuid4().hex[:12]
+        _write_status(self.jobs_dir, job_id, {
+            'job_id': job_id,
+            'kind': kind,
+            'status': 'queued',
+            'submitted_at': datetime.now().isoformat(),
+            'progress': {}
+        })
+
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: this process already runs the warm-up, batching and
+                # model-sync threads, and a forked child can deadlock on a lock one of them held
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            future = self._executor.submit(_run_job, fn, self.jobs_dir, job_id, kwargs or {})
+            self._futures[job_id] = future
+
+        future.add_done_callback(lambda f: self._finish(job_id, f, on_complete))
+        return job_id
+
+    def get(self, job_id):
+        """
+        Get job status with elapsed time and ETA
+
+        Returns:
+            Status dict, or None for an unknown job id
+        """
+        status = _read_status(self.jobs_dir, job_id)
+        if status is None:
+            return None
+
+        started = status.get('started_at_ts')
+        if started is not None:
+            finished = status.get('finished_at_ts') or time.time()
+            elapsed = finished - started
+            status['elapsed_seconds'] = round(elapsed, 2)
+
+            fraction = status.get('progress', {}).get('fraction')
+            if status['status'] == 'running' and fraction:
+                status['eta_seconds'] = round(elapsed * (1 - fraction) / fraction, 2)
+
+        status.pop('started_at_ts', None)
+        status.pop('finished_at_ts', None)
+        return status
+
+    def cancel(self, job_id):
+        """
+        Request cancellation of a queued or running job
+
+        Returns:
+            True if the job exists and isn't finished yet
+        """
+        status = _read_status(self.jobs_dir, job_id)
+        if status is None or status['status'] in TERMINAL_STATES:
+            return False
+
+        # Running jobs poll this marker between training steps
+        with open(_cancel_path(self.jobs_dir, job_id), 'w') as f:
+            f.write(datetime.now().isoformat())
+
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.cancel()
+        return True
+
+    def _finish(self, job_id, future, on_complete):
+        """Record the final state of a job and run its completion callback"""
+        status = _read_status(self.jobs_dir, job_id) or {'job_id': job_id}
+        status['finished_at'] = datetime.now().isoformat()
+        status['finished_at_ts'] = time.time()
+
+        try:
+            if future.cancelled():
+                status['status'] = 'cancelled'
+            else:
+                result = future.result()
+                if on_complete is not None:
+                    on_complete(result)
+                status['status'] = 'completed'
+                status['result'] = result
+        except JobCancelled:
+            status['status'] = 'cancelled'
+        except Exception as e:
+            status['status'] = 'failed'
+            status['error'] = str(e)
+            print(f"[JOB-RUNNER ERROR] Job {job_id} failed: {e}")
+
+        _write_status(self.jobs_dir, job_id, status)
+
+        cancel_path = _cancel_path(self.jobs_dir, job_id)
+        if os.path.exists(cancel_path):
+            os.remove(cancel_path)
+
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+
+def _run_job(fn, jobs_dir, job_id, kwargs):
+    """Worker-process entry point: mark running, call fn, let the parent record the outcome"""
+    progress = JobProgress(jobs_dir, job_id)
+    progress.check_cancelled()
+
+    status = _read_status(jobs_dir, job_id) or {'job_id': job_id}
+    status['status'] = 'running'
+    status['started_at'] = datetime.now().isoformat()
+    status['started_at_ts'] = time.time()
+    _write_status(jobs_dir, job_id, status)
+
+    return fn(progress, **kwargs)
+
+
+def _status_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f'{job_id}.json')
+
+
+def _cancel_path(jobs_dir, job_id):
+    return os.path.join(jobs_dir, f'{job_id}.cancel')
+
+
+def _read_status(jobs_dir, job_id):
+    """Read a job status file (None if it doesn't exist)"""
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(_status_path(jobs_dir, job_id), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_status(jobs_dir, job_id, status):
+    """Write a job status file atomically so pollers never see half a file"""
+    path = _status_path(jobs_dir, job_id)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,305 @@
+"""
+Matrix Cache
+Encoded float32 feature matrices of local data files, written once next to
+the file and memory-mapped by later training, tuning and evaluation runs
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from categorical_encoder import CategoricalEncoder
+from prediction_cache import content_digest
+from streaming_metrics import EVAL_GROUP_COLUMNS
+from table_io import read_data_file, resolve_data_path
+
+
+# Cache entries live in this directory next to the data file
+CACHE_DIR_NAME = '.matrix_cache'
+
+# Bumped whenever the layout of an entry changes, so old entries are rebuilt
+FORMAT_VERSION = 1
+
+METADATA_FILE = 'matrix.json'
+
+TARGET_COLUMN = 'value_log_scaled'
+
+
+class TrainingMatrix:
+    """
+    Encoded features, target and column metadata of one data file
+
+    X is the float32 C-contiguous matrix the trees split on and y the
+    float64 target, both read-only memory maps when opened from the cache,
+    so every process training or scoring on the same file shares one
+    page-cache copy and nothing is parsed or encoded again.
+
+    Group columns (EVAL_GROUP_COLUMNS and text columns) are kept as
+    factorized codes plus labels, so evaluation breakdowns don't need the
+    original DataFrame.
+    """
+
+    def __init__(self, X, y, metadata, group_codes=None, cache_dir=None):
+        """
+        Initialize from arrays
+
+        Args:
+            X: float32 array (n_rows, n_features) in feature_names order
+            y: float64 array (n_rows,) of targets (None when the file has none)
+            metadata: Dict written to matrix.json (feature_names, encoder, ...)
+            group_codes: {column: int array of codes into metadata['groups'][column]}
+            cache_dir: Entry directory the arrays are mapped from (None if not cached)
+        """
+        self.X = X
+        self.y = y
+        self.metadata = metadata
+        self.group_codes = group_codes or {}
+        self.cache_dir = cache_dir
+
+        self.feature_names = metadata['feature_names']
+        self.encoder = CategoricalEncoder.from_dict(metadata['encoder'])
+        self.value_log_scaler = metadata.get('value_log_scaler')
+        self.unknown_counts = metadata.get('unknown_counts', {})
+
+        # True when load_matrix found the entry instead of building it
+        self.hit = False
+
+    @classmethod
+    def open(cls, cache_dir, mmap_mode='r'):
+        """Memory-map a cache entry written by save()"""
+        with open(os.path.join(cache_dir, METADATA_FILE), 'r') as f:
+            metadata = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(cache_dir, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        y = load('y') if metadata['has_target'] else None
+        group_codes = {col: load(f'group_{i}') for i, col in enumerate(metadata['groups'])}
+        return cls(load('X'), y, metadata, group_codes, cache_dir)
+
+    def save(self, cache_dir):
+        """Write the arrays as .npy files and the metadata as matrix.json"""
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(os.path.join(cache_dir, 'X.npy'), np.ascontiguousarray(self.X))
+        if self.y is not None:
+            np.save(os.path.join(cache_dir, 'y.npy'), self.y)
+        for i, col in enumerate(self.metadata['groups']):
+            np.save(os.path.join(cache_dir, f'group_{i}.npy'), self.group_codes[col])
+
+        with open(os.path.join(cache_dir, METADATA_FILE), 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+
+    @property
+    def n_rows(self):
+        return len(self.X)
+
+    def array_path(self, name):
+        """Path of a cached array ('X' or 'y') for processes that map it themselves"""
+        if self.cache_dir is None:
+            raise ValueError("Matrix is not cached")
+        return os.path.join(self.cache_dir, f'{name}.npy')
+
+    def frame(self, start=0, stop=None):
+        """X rows as a DataFrame with the feature names (a view, nothing is copied)"""
+        import pandas as pd
+        return pd.DataFrame(self.X[start:stop], columns=self.feature_names, copy=False)
+
+    def group_frame(self, columns, start=0, stop=None):
+        """
+        Stored group columns for a row range, as categoricals with the original labels
+
+        Columns that weren't stored are left out, like columns missing from
+        a file are left out of evaluation breakdowns.
+        """
+        import pandas as pd
+        groups = self.metadata['groups']
+        return pd.DataFrame({
+            col: pd.Categorical.from_codes(self.group_codes[col][start:stop], groups[col])
+            for col in columns if col in groups
+        })
+
+    def matches(self, encoder, feature_names):
+        """True if this matrix was encoded with encoder in feature_names order"""
+        return self.feature_names == list(feature_names) and self.metadata['encoder'] == encoder.to_dict()
+
+
+def load_matrix(path, encoder=None, feature_names=None, cache_root=None):
+    """
+    Encoded matrix of a CSV / Parquet file, from the cache when it is current
+
+    The cache key is the SHA-256 of the file's bytes (the CSV when it exists,
+    even if its Parquet twin is what gets read) plus the encoding. The digest
+    is remembered with the file's size and mtime, so an unchanged file is not
+    re-hashed; a changed size or mtime triggers a re-hash, and a changed
+    digest builds a new entry and deletes the entries of the old content.
+
+    Args:
+        path: Data file (usually Data/04_Split/*.csv)
+        encoder: CategoricalEncoder to encode with (e.g. a model's); None fits
+            one on the file, as train_model does
+        feature_names: Feature order (default: every column but the target)
+        cache_root: Cache directory (default: .matrix_cache next to the file)
+
+    Returns:
+        TrainingMatrix (memory-mapped; in memory only if the cache can't be written)
+    """
+    source = path if os.path.exists(path) else resolve_data_path(path)
+    cache_root = cache_root or os.path.join(os.path.dirname(os.path.abspath(source)), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    digest = _source_digest(source, cache_root, stem)
+    key = hashlib.sha256(json.dumps({
+        'format': FORMAT_VERSION,
+        'digest': digest,
+        'encoder': encoder.to_dict() if encoder is not None else None,
+        'feature_names': list(feature_names) if feature_names is not None else None
+    }, sort_keys=True).encode()).hexdigest()[:16]
+    entry_dir = os.path.join(cache_root, f'{stem}-{key}')
+
+    if not os.path.exists(os.path.join(entry_dir, METADATA_FILE)) and encoder is not None:
+        # A model's encoder is usually the one fitted on this very file
+        entry_dir = _find_equivalent_entry(cache_root, stem, digest, encoder, feature_names) or entry_dir
+
+    if os.path.exists(os.path.join(entry_dir, METADATA_FILE)):
+        matrix = TrainingMatrix.open(entry_dir)
+        matrix.hit = True
+        print(f"[MATRIX-CACHE] Mapped {os.path.basename(source)} ({matrix.n_rows} rows) from {entry_dir}")
+        return matrix
+
+    matrix = build_matrix(read_data_file(path), encoder, feature_names)
+    matrix.metadata.update({'source': os.path.abspath(source), 'digest': digest})
+
+    tmp_dir = f'{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        matrix.save(tmp_dir)
+        os.rename(tmp_dir, entry_dir)
+    except OSError as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(entry_dir, METADATA_FILE)):
+            print(f"[MATRIX-CACHE WARNING] Could not cache {source}, using it from memory: {e}")
+            return matrix
+        # Another process built the same entry first
+
+    _remove_stale_entries(cache_root, stem, digest)
+    print(f"[MATRIX-CACHE] Encoded {os.path.basename(source)} ({matrix.n_rows} rows) into {entry_dir}")
+    return TrainingMatrix.open(entry_dir)
+
+
+def build_matrix(df, encoder=None, feature_names=None):
+    """
+    Encode a DataFrame into an (uncached) TrainingMatrix
+
+    Args:
+        df: DataFrame with the features and, usually, the target
+        encoder, feature_names: As for load_matrix
+
+    Returns:
+        TrainingMatrix held in memory
+    """
+    import pandas as pd
+
+    has_target = TARGET_COLUMN in df.columns
+    if feature_names is None:
+        feature_names = [col for col in df.columns if col != TARGET_COLUMN]
+    if encoder is None:
+        encoder = CategoricalEncoder.fit(df, feature_names)
+
+    X, unknown_counts = encoder.encode(df, feature_names)
+    y = df[TARGET_COLUMN].to_numpy(dtype=np.float64) if has_target else None
+
+    value_log_scaler = None
+    if 'value_log' in df.columns:
+        value_log_scaler = {'mean': float(df['value_log'].mean()), 'std': float(df['value_log'].std())}
+
+    groups, group_codes = {}, {}
+    for col in df.columns:
+        if col in EVAL_GROUP_COLUMNS or df[col].dtype == 'object':
+            codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+            groups[col] = [str(value) for value in uniques]
+            group_codes[col] = codes.astype(np.int32)
+
+    metadata = {
+        'format': FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'n_rows': len(df),
+        'feature_names': list(feature_names),
+        'encoder': encoder.to_dict(),
+        'target': TARGET_COLUMN,
+        'has_target': has_target,
+        'value_log_scaler': value_log_scaler,
+        'unknown_counts': unknown_counts,
+        'groups': groups
+    }
+    return TrainingMatrix(X, y, metadata, group_codes)
+
+
+def _source_digest(source, cache_root, stem):
+    """
+    Content digest of a data file, re-hashed only when its size or mtime changed
+
+    The digest is remembered in <cache_root>/<stem>.source.json.
+    """
+    stat = os.stat(source)
+    index_path = os.path.join(cache_root, f'{stem}.source.json')
+    try:
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if (index['path'] == os.path.abspath(source) and index['size'] == stat.st_size
+                and index['mtime_ns'] == stat.st_mtime_ns):
+            return index['digest']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = content_digest(source)
+    index = {'path': os.path.abspath(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': digest}
+    try:
+        os.makedirs(cache_root, exist_ok=True)
+        tmp_path = f'{index_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        pass
+    return digest
+
+
+def _find_equivalent_entry(cache_root, stem, digest, encoder, feature_names):
+    """An entry of the same content already encoded with this encoder and feature order (or None)"""
+    if feature_names is None or not os.path.isdir(cache_root):
+        return None
+    for entry_dir in _entries(cache_root, stem):
+        metadata = _read_metadata(entry_dir)
+        if (metadata and metadata.get('digest') == digest and metadata['feature_names'] == list(feature_names)
+                and metadata['encoder'] == encoder.to_dict()):
+            return entry_dir
+    return None
+
+
+def _remove_stale_entries(cache_root, stem, digest):
+    """Delete entries built from older contents of the same file"""
+    for entry_dir in _entries(cache_root, stem):
+        metadata = _read_metadata(entry_dir)
+        if metadata is not None and metadata.get('digest') != digest:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            print(f"[MATRIX-CACHE] Removed stale entry {os.path.basename(entry_dir)}")
+
+
+def _entries(cache_root, stem):
+    """Complete entry directories of one data file"""
+    for name in os.listdir(cache_root):
+        entry_dir = os.path.join(cache_root, name)
+        if name.startswith(f'{stem}-') and not name.endswith('.tmp') and os.path.isdir(entry_dir):
+            yield entry_dir
+
+
+def _read_metadata(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, METADATA_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
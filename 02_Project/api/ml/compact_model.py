@@ -0,0 +1,87 @@
+"""
+Forest Compaction Script
+Prunes a trained model to the fewest trees that keep validation RMSE within
+a tolerance, stores the engine arrays as float32 and registers the result
+as a new version (see forest_compaction.py)
+
+Usage:
+    python ml/compact_model.py [--version V] [--tolerance 0.01] [--min-trees 50] [--activate]
+"""
+
+import argparse
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest_compaction import DEFAULT_MIN_TREES, DEFAULT_TOLERANCE, compact_model
+from ml_service import MLService
+from table_io import data_file_exists, read_data_file
+
+
+def print_report(report):
+    """Print sizes, load times, latency and metric deltas side by side"""
+    print(f"\nVersion {report['version']} (from {report['parent_version']})")
+
+    rows = [('Trees', report['n_trees']['before'], report['n_trees']['after'], 'd')]
+    for key in ('pickle', 'engine', 'total'):
+        rows.append((f"Size {key} (MB)", report['size_bytes']['before'][key] / 1e6,
+                     report['size_bytes']['after'][key] / 1e6, '.2f'))
+    for key in ('bundle', 'sklearn_pickle'):
+        rows.append((f"Load {key} (s)", report['load_seconds']['before'][key],
+                     report['load_seconds']['after'][key], '.4f'))
+    for key, before in report['latency_ms']['before'].items():
+        rows.append((f"Predict {key.replace('_', ' ')} (ms)", before, report['latency_ms']['after'][key], '.4f'))
+
+    for label, before, after, fmt in rows:
+        print(f"  {label:<26} {before:>12{fmt}} -> {after:{fmt}}")
+
+    for dataset, metrics in report['metrics'].items():
+        print(f"\n  {dataset.capitalize()} ({metrics['n_samples']} rows)")
+        for name in ('rmse', 'mae', 'r2'):
+            print(f"    {name.upper():<5} {metrics['before'][name]:.6f} -> {metrics['after'][name]:.6f} "
+                  f"({metrics['delta'][name]:+.6f})")
+
+
+def main():
+    """Compact the published (or given) model version"""
+    parser = argparse.ArgumentParser(description="Compact a trained forest into a new model version")
+    parser.add_argument('--version', help="Version to compact (default: the published one)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative validation RMSE increase (0.01 = 1%%)")
+    parser.add_argument('--min-trees', type=int, default=DEFAULT_MIN_TREES)
+    parser.add_argument('--max-trees', type=int, default=None)
+    parser.add_argument('--activate', action='store_true', help="Publish the compacted version")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # We're in 02_Project/api/ml/, need to go up to 02_Project/
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outputs')
+    val_data_path = os.path.join(base_dir, 'Data', '04_Split', 'val_data.csv')
+    test_data_path = os.path.join(base_dir, 'Data', '04_Split', 'test_data.csv')
+
+    print("=" * 70)
+    print("Forest Compaction")
+    print("=" * 70)
+
+    service = MLService(model_dir)
+    version = args.version or service.registry.current_version()
+    if version is None:
+        print(f"ERROR: No trained model found in {model_dir}")
+        return
+
+    df_test = read_data_file(test_data_path) if data_file_exists(test_data_path) else None
+    report = compact_model(service, read_data_file(val_data_path), version, args.tolerance, args.min_trees,
+                           args.max_trees, df_test, args.activate, args.seed)
+    print_report(report)
+
+    if report['activated']:
+        print(f"\nPublished {report['version']}")
+    else:
+        print(f"\nActivate with: POST /api/ml/models/{report['version']}/activate")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Cross-Validation Script
+K-fold cross-validation of the Random Forest on the training split, with the
+folds trained in parallel processes (see cross_validation.py)
+
+Usage:
+    python ml/cross_validate.py [--folds 5] [--grouped] [--n-estimators 750] [--workers N] [--output cv.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cross_validation import DEFAULT_FOLDS, DEFAULT_HYPERPARAMS, DEFAULT_SEED, run_cross_validation_job
+
+
+def print_report(result):
+    """Per-fold metrics, their spread and the timing"""
+    grouping = f", grouped by {result['grouped_by']}" if result['grouped_by'] else ""
+    print(f"\n{result['n_folds']} folds over {result['n_samples']} rows{grouping}")
+    print(f"  {'Fold':<6} {'Train':>7} {'Test':>7} {'RMSE':>10} {'MAE':>10} {'R2':>10} {'Fit (s)':>9}")
+    for fold in result['folds']:
+        metrics = fold['metrics']
+        r2 = 'n/a' if metrics['r2'] is None else f"{metrics['r2']:.4f}"
+        print(f"  {fold['fold']:<6} {fold['n_train']:>7} {fold['n_test']:>7} {metrics['rmse']:>10.6f} "
+              f"{metrics['mae']:>10.6f} {r2:>10} {fold['fit_seconds']:>9.2f}")
+
+    aggregate = result['aggregate']
+    print(f"\n  {'Metric':<8} {'Mean':>10} {'Std':>10} {'Min':>10} {'Max':>10} {'Pooled':>10}")
+    for name in ('rmse', 'mae', 'r2'):
+        stats = aggregate[name]
+        if stats is None:
+            continue
+        print(f"  {name.upper():<8} {stats['mean']:>10.6f} {stats['std']:>10.6f} {stats['min']:>10.6f} "
+              f"{stats['max']:>10.6f} {aggregate['pooled'][name]:>10.6f}")
+
+    timing = result['timing']
+    print(f"\n  Wall time {timing['wall_seconds']:.1f}s, fitting {timing['fit_seconds_total']:.1f}s "
+          f"over all folds (parallel speedup {timing['parallel_speedup']}x)")
+
+
+def main():
+    """Cross-validate on Data/04_Split/train_data.csv"""
+    parser = argparse.ArgumentParser(description="K-fold cross-validation of the Random Forest")
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--grouped', action='store_true',
+                        help="Keep all rows of an indicator in one fold (no leakage between folds)")
+    parser.add_argument('--n-estimators', type=int, default=DEFAULT_HYPERPARAMS['n_estimators'])
+    parser.add_argument('--max-features', default=DEFAULT_HYPERPARAMS['max_features'],
+                        help="'sqrt', 'log2' or a fraction of the features")
+    parser.add_argument('--min-samples-leaf', type=int, default=DEFAULT_HYPERPARAMS['min_samples_leaf'])
+    parser.add_argument('--workers', type=int, default=None, help="Folds fitted in parallel (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--data', help="Training data (default: Data/04_Split/train_data.csv)")
+    parser.add_argument('--output', help="Write the full result as JSON")
+    args = parser.parse_args()
+
+    if args.folds < 2:
+        parser.error("--folds must be at least 2")
+
+    # We're in 02_Project/api/ml/, need to go up to 02_Project/
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    train_data_path = args.data or os.path.join(base_dir, 'Data', '04_Split', 'train_data.csv')
+
+    max_features = args.max_features
+    if max_features not in ('sqrt', 'log2'):
+        max_features = float(max_features)
+
+    print("=" * 70)
+    print("Random Forest Cross-Validation")
+    print("=" * 70)
+
+    hyperparams = {
+        'n_estimators': args.n_estimators,
+        'max_features': max_features,
+        'min_samples_leaf': args.min_samples_leaf
+    }
+    result = run_cross_validation_job(None, train_data_path, args.folds, args.grouped, hyperparams,
+                                      args.seed, args.workers)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResult written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
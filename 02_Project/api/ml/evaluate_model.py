@@ -4,12 +4,22 @@ Tests trained model on test and validation sets
 Compares performance with R model metrics
 """
 
-import pandas as pd
-import numpy as np
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import joblib
 import json
 import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import ModelRegistry
+from categorical_encoder import CategoricalEncoder
+from streaming_metrics import EVAL_GROUP_COLUMNS, GroupedRegressionAccumulator
+from table_io import iter_data_file_chunks
+
+
+# Rows read and scored at a time
+CHUNK_SIZE = 50000
 
 
 def load_model_and_metadata(model_dir):
@@ -25,56 +35,66 @@ def load_model_and_metadata(model_dir):
     return model, metadata
 
 
-def load_test_data(data_path):
-    """Load test or validation data"""
-    df = pd.read_csv(data_path)
-    return df
+def load_test_data(data_path, chunk_size=CHUNK_SIZE):
+    """Read test or validation data in chunks (from its Parquet twin when present)"""
+    return iter_data_file_chunks(data_path, chunk_size)
 
 
-def evaluate_on_dataset(model, df, dataset_name, categorical_mappings_path):
+def evaluate_on_dataset(model, chunks, dataset_name, encoder, group_by=EVAL_GROUP_COLUMNS):
     """
-    Evaluate model on a dataset
+    Evaluate model on a dataset, one chunk at a time
+
+    Only running sums are kept between chunks, so memory doesn't grow with
+    the size of the dataset.
 
     Args:
         model: Trained model
-        df: DataFrame with features and target
+        chunks: Iterable of DataFrames with features and target
         dataset_name: Name for display (e.g., 'Test', 'Validation')
-        categorical_mappings_path: Path to categorical mappings JSON
+        encoder: CategoricalEncoder saved with the model
+        group_by: Columns to break the metrics down by
 
     Returns:
-        Dict of metrics
+        Dict of metrics, with per-group metrics under 'groups'
     """
-    # Separate features and target
     target_col = 'value_log_scaled'
-    y_true = df[target_col]
-    X = df[[col for col in df.columns if col != target_col]].copy()
+    feature_names = list(model.feature_names_in_)
+    accumulator = GroupedRegressionAccumulator(group_by)
+    unknown_counts = {}
 
-    # Load categorical mappings and encode text columns
-    if os.path.exists(categorical_mappings_path):
-        with open(categorical_mappings_path, 'r') as f:
-            categorical_mappings = json.load(f)
+    for chunk in chunks:
+        # Encode text columns in the model's feature order
+        X, chunk_unknown = encoder.encode_frame(chunk, feature_names)
+        for col, count in chunk_unknown.items():
+            unknown_counts[col] = unknown_counts.get(col, 0) + count
 
-        for col, mapping in categorical_mappings.items():
-            if col in X.columns:
-                X[col] = X[col].map(mapping)
+        # Make predictions and add them to the running sums
+        accumulator.update(chunk, chunk[target_col].to_numpy(dtype=float), model.predict(X))
 
-    # Make predictions
-    y_pred = model.predict(X)
-
-    # Calculate metrics
-    rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-    mae = mean_absolute_error(y_true, y_pred)
-    r2 = r2_score(y_true, y_pred)
+    for col, count in unknown_counts.items():
+        print(f"  WARNING: {count} row(s) with unknown '{col}' encoded as {encoder.unknown_code}")
 
+    overall, groups = accumulator.result()
     metrics = {
         'dataset': dataset_name,
-        'n_samples': len(df),
-        'rmse': float(rmse),
-        'mae': float(mae),
-        'r2': float(r2)
+        'n_samples': accumulator.overall.n,
+        'rmse': overall['rmse'],
+        'mae': overall['mae'],
+        'r2': overall['r2'],
+        'groups': groups
     }
 
-    return metrics, y_true, y_pred
+    return metrics
+
+
+def print_group_metrics(metrics):
+    """Per-group breakdown table"""
+    for col, groups in metrics['groups'].items():
+        print(f"\n  By {col}:")
+        print(f"    {'Group':<20} {'n':>8} {'RMSE':>10} {'MAE':>10} {'R2':>10}")
+        for label, group in groups.items():
+            r2 = 'n/a' if group['r2'] is None else f"{group['r2']:.4f}"
+            print(f"    {label:<20} {group['n_samples']:>8} {group['rmse']:>10.6f} {group['mae']:>10.6f} {r2:>10}")
 
 
 def compare_with_r_model(python_metrics):
@@ -139,39 +159,47 @@ def main():
     test_data_path = os.path.join(base_dir, 'Data', '04_Split', 'test_data.csv')
     val_data_path = os.path.join(base_dir, 'Data', '04_Split', 'val_data.csv')
 
+    # Resolve the published model version
+    registry = ModelRegistry(model_dir)
+    version = registry.current_version()
+    if version is None:
+        print(f"ERROR: No trained model found in {model_dir}")
+        return
+    model_dir = registry.version_dir(version)
+
     # Load model
-    print("\nLoading model...")
+    print(f"\nLoading model version {version}...")
     model, metadata = load_model_and_metadata(model_dir)
     print(f"Model trained on: {metadata['training_date']}")
     print(f"Model type: {metadata['model_type']}")
     print(f"Number of trees: {metadata['n_estimators']}")
 
-    # Load categorical mappings
-    categorical_mappings_path = os.path.join(model_dir, 'categorical_mappings.json')
+    # Load categorical encoder
+    encoder = CategoricalEncoder.load(model_dir)
 
     # Evaluate on test set
     print("\n" + "-" * 70)
     print("Evaluating on Test Set")
     print("-" * 70)
-    df_test = load_test_data(test_data_path)
-    test_metrics, y_test_true, y_test_pred = evaluate_on_dataset(model, df_test, 'Test', categorical_mappings_path)
+    test_metrics = evaluate_on_dataset(model, load_test_data(test_data_path), 'Test', encoder)
 
     print(f"\nTest Set Results ({test_metrics['n_samples']} samples):")
     print(f"  RMSE: {test_metrics['rmse']:.6f}")
     print(f"  MAE:  {test_metrics['mae']:.6f}")
     print(f"  R2:   {test_metrics['r2']:.6f}")
+    print_group_metrics(test_metrics)
 
     # Evaluate on validation set
     print("\n" + "-" * 70)
     print("Evaluating on Validation Set")
     print("-" * 70)
-    df_val = load_test_data(val_data_path)
-    val_metrics, y_val_true, y_val_pred = evaluate_on_dataset(model, df_val, 'Validation', categorical_mappings_path)
+    val_metrics = evaluate_on_dataset(model, load_test_data(val_data_path), 'Validation', encoder)
 
     print(f"\nValidation Set Results ({val_metrics['n_samples']} samples):")
     print(f"  RMSE: {val_metrics['rmse']:.6f}")
     print(f"  MAE:  {val_metrics['mae']:.6f}")
     print(f"  R2:   {val_metrics['r2']:.6f}")
+    print_group_metrics(val_metrics)
 
     # Compare with R model
     compare_with_r_model([test_metrics, val_metrics])
@@ -194,7 +222,8 @@ def main():
 
     # Final summary
     print("\nSummary:")
-    print(f"  Training samples:   {metadata['metrics']['r2']:.4f} R2")
+    training_label = 'Training (OOB):' if metadata.get('metrics_source') == 'oob' else 'Training samples:'
+    print(f"  {training_label:<20}{metadata['metrics']['r2']:.4f} R2")
     print(f"  Test samples:       {test_metrics['r2']:.4f} R2")
     print(f"  Validation samples: {val_metrics['r2']:.4f} R2")
     print("\nModel is ready for deployment!")
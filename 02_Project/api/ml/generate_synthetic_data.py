@@ -0,0 +1,52 @@
+"""
+Synthetic Data Writer
+Writes large DHS-shaped train/val/test files for benchmarks and load tests,
+learned from Data/04_Split/train_data.csv (see synthetic_data.py)
+
+Usage:
+    python ml/generate_synthetic_data.py --rows 1000000 [--format parquet] [--raw] [--seed 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import (DATA_DIR, DEFAULT_CHUNK_SIZE, RAW_DIR, SPLIT_FRACTIONS, TRAIN_PATH,
+                            SyntheticDataGenerator)
+
+
+def main():
+    """Learn the distributions and write the split files"""
+    parser = argparse.ArgumentParser(description="Generate synthetic DHS-shaped split files")
+    parser.add_argument('--rows', type=int, default=1000000, help="Total rows over train/val/test")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], default='csv')
+    parser.add_argument('--out-dir', default=os.path.join(DATA_DIR, 'Synthetic'))
+    parser.add_argument('--template', default=TRAIN_PATH, help="Split file to learn from")
+    parser.add_argument('--raw', action='store_true', help="Learn value_log from the Data/01_Raw DHS files")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Generating {args.rows:,} synthetic rows ({args.format})")
+    print("=" * 60)
+
+    generator = SyntheticDataGenerator.from_files(args.template, RAW_DIR if args.raw else None, args.seed)
+
+    start = time.perf_counter()
+    written = generator.write_splits(args.out_dir, args.rows, SPLIT_FRACTIONS, args.format,
+                                     args.chunk_size, args.seed)
+    elapsed = time.perf_counter() - start
+
+    for split, (path, rows) in written.items():
+        print(f"  {split:<6} {rows:>10,} rows  {os.path.getsize(path) / 1024 / 1024:>8.1f} MB  {path}")
+
+    print(f"\nDone in {elapsed:.1f}s. Same --seed, --chunk-size and template give the same files.")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,24 +3,29 @@ Random Forest Model Training Script
 Replicates Milestone 3 Task 03 model training with Python
 """
 
-import pandas as pd
-import numpy as np
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import joblib
 import json
 import os
 from datetime import datetime
 import sys
+import argparse
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from model_registry import ENGINE_DIR, ModelRegistry
+from forest_engine import CompiledForest
+from categorical_encoder import CategoricalEncoder
+from sharded_training import load_plan, load_plan_matrix, merge_shards, run_worker, train_sharded
+from streaming_metrics import oob_metrics, regression_metrics
+from table_io import read_data_file, resolve_data_path
+
 
 def load_training_data(data_path):
-    """Load pre-split training data"""
-    print(f"Loading training data from: {data_path}")
-    df = pd.read_csv(data_path)
+    """Load pre-split training data (from its Parquet twin when present)"""
+    print(f"Loading training data from: {resolve_data_path(data_path)}")
+    df = read_data_file(data_path)
     print(f"Loaded {len(df)} training records with {len(df.columns)} columns")
     return df
 
@@ -36,6 +41,7 @@ def prepare_features_and_target(df):
         X: Feature matrix (27 features)
         y: Target vector (value_log_scaled)
         feature_names: List of feature names
+        encoder: CategoricalEncoder for the text categorical columns
     """
     # Target variable
     target_col = 'value_log_scaled'
@@ -43,34 +49,32 @@ def prepare_features_and_target(df):
 
     # Feature columns (all except target)
     feature_cols = [col for col in df.columns if col != target_col]
-    X = df[feature_cols].copy()
-
-    # Handle categorical columns that might be text
-    categorical_mappings = {}
 
     # Convert text categorical columns to numeric
-    for col in X.columns:
-        if X[col].dtype == 'object' or X[col].dtype.name == 'category':
-            print(f"Encoding categorical column: {col}")
-            # Create mapping for this column
-            unique_vals = X[col].unique()
-            mapping = {val: idx for idx, val in enumerate(unique_vals)}
-            categorical_mappings[col] = mapping
-            X[col] = X[col].map(mapping)
-            print(f"  Mapped: {mapping}")
-
-    # Save categorical mappings
-    if categorical_mappings:
-        output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
-        with open(os.path.join(output_dir, 'categorical_mappings.json'), 'w') as f:
-            json.dump(categorical_mappings, f, indent=2)
+    encoder = CategoricalEncoder.fit(df, feature_cols)
+    for col, categories in encoder.categories.items():
+        print(f"Encoding categorical column: {col}")
+        print(f"  Categories: {categories}")
+    X, _ = encoder.encode_frame(df, feature_cols)
 
     print(f"Features: {len(feature_cols)} columns")
     print(f"Target: {target_col}")
     print(f"Sample shape: X={X.shape}, y={y.shape}")
 
-    return X, y, feature_cols
+    return X, y, feature_cols, encoder
+
+
+def default_hyperparams():
+    """Default hyperparameters from Milestone 3 Task 03"""
+    return {
+        'n_estimators': 750,        # ntree in R
+        'max_features': 'sqrt',      # mtry optimization
+        'min_samples_leaf': 5,       # nodesize optimization
+        'random_state': 123,         # Seed for reproducibility
+        'n_jobs': -1,                # Use all CPU cores
+        'oob_score': True,           # Out-of-bag predictions, computed during the fit
+        'verbose': 1                 # Show progress
+    }
 
 
 def train_random_forest(X, y, hyperparams=None):
@@ -85,16 +89,8 @@ def train_random_forest(X, y, hyperparams=None):
     Returns:
         Trained RandomForestRegressor model
     """
-    # Default hyperparameters from Milestone 3 Task 03
     if hyperparams is None:
-        hyperparams = {
-            'n_estimators': 750,        # ntree in R
-            'max_features': 'sqrt',      # mtry optimization
-            'min_samples_leaf': 5,       # nodesize optimization
-            'random_state': 123,         # Seed for reproducibility
-            'n_jobs': -1,                # Use all CPU cores
-            'verbose': 1                 # Show progress
-        }
+        hyperparams = default_hyperparams()
 
     print("\nTraining Random Forest with hyperparameters:")
     for key, value in hyperparams.items():
@@ -106,26 +102,12 @@ def train_random_forest(X, y, hyperparams=None):
     model.fit(X, y)
     print("Training complete!")
 
-    # Calculate OOB error
-    oob_score = model.score(X, y)
-    print(f"Training R2 score: {oob_score:.6f}")
+    if getattr(model, 'oob_score', False):
+        print(f"OOB R2 score: {model.oob_score_:.6f}")
 
     return model
 
 
-def calculate_metrics(y_true, y_pred):
-    """Calculate regression metrics"""
-    rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-    mae = mean_absolute_error(y_true, y_pred)
-    r2 = r2_score(y_true, y_pred)
-
-    return {
-        'rmse': float(rmse),
-        'mae': float(mae),
-        'r2': float(r2)
-    }
-
-
 def get_feature_importance(model, feature_names):
     """Extract feature importance rankings"""
     importances = model.feature_importances_
@@ -147,14 +129,16 @@ def get_feature_importance(model, feature_names):
     return feature_importance
 
 
-def save_model_artifacts(model, feature_names, feature_importance, metrics, output_dir):
-    """Save model and metadata"""
+def save_model_artifacts(model, feature_names, feature_importance, metrics, output_dir,
+                         encoder=None, version=None, metrics_source='oob',
+                         training_metrics=None):
+    """Save model and metadata (the model file last, it marks the version complete)"""
     os.makedirs(output_dir, exist_ok=True)
 
-    # Save model
-    model_path = os.path.join(output_dir, 'final_rf_model.pkl')
-    joblib.dump(model, model_path)
-    print(f"\nSaved model to: {model_path}")
+    # Save categorical encoder
+    if encoder is not None and encoder.categories:
+        encoder.save(output_dir)
+        print(f"\nSaved categorical encoder to: {output_dir}")
 
     # Save feature names
     feature_names_path = os.path.join(output_dir, 'feature_names.json')
@@ -170,6 +154,7 @@ def save_model_artifacts(model, feature_names, feature_importance, metrics, outp
 
     # Save metrics
     metadata = {
+        'version': version,
         'training_date': datetime.now().isoformat(),
         'model_type': 'RandomForestRegressor',
         'n_estimators': int(model.n_estimators),
@@ -177,17 +162,46 @@ def save_model_artifacts(model, feature_names, feature_importance, metrics, outp
         'min_samples_leaf': int(model.min_samples_leaf),
         'random_state': int(model.random_state) if model.random_state else None,
         'n_features': len(feature_names),
-        'metrics': metrics
+        'metrics': metrics,
+        'metrics_source': metrics_source
     }
+    if training_metrics is not None:
+        metadata['training_metrics'] = training_metrics
 
     metadata_path = os.path.join(output_dir, 'model_metadata.json')
     with open(metadata_path, 'w') as f:
         json.dump(metadata, f, indent=2)
     print(f"Saved model metadata to: {metadata_path}")
 
+    # Save flattened tree arrays the API memory-maps instead of unpickling the forest
+    engine_dir = os.path.join(output_dir, ENGINE_DIR)
+    CompiledForest.from_sklearn(model).save(engine_dir)
+    print(f"Saved inference arrays to: {engine_dir}")
+
+    # Save model
+    model_path = os.path.join(output_dir, 'final_rf_model.pkl')
+    joblib.dump(model, model_path)
+    print(f"Saved model to: {model_path}")
+
+
+def main(training_metrics=False, shards=0, workers=None, shard_dir=None, merge_only=False, timeout=None,
+         stale_after=None):
+    """
+    Main training pipeline
 
-def main():
-    """Main training pipeline"""
+    Args:
+        training_metrics: Also re-predict the training set (metrics are
+            out-of-bag by default)
+        shards: Build the forest as this many partial forests and merge them
+            (0 trains in this process as usual)
+        workers: Local worker processes for the shards (0 waits for workers
+            started elsewhere with --worker)
+        shard_dir: Directory shared with the workers (default outputs/shards/<timestamp>)
+        merge_only: Merge the finished shards in shard_dir instead of training
+        timeout: Give up waiting for shards after this many seconds
+        stale_after: Rebuild shards whose worker hasn't refreshed its claim
+            for this many seconds (a crashed worker)
+    """
     print("=" * 60)
     print("Random Forest Model Training - Survey Analytics")
     print("=" * 60)
@@ -199,27 +213,58 @@ def main():
     output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outputs')
 
     # Check if training data exists
-    if not os.path.exists(train_data_path):
+    if not os.path.exists(resolve_data_path(train_data_path)):
         print(f"ERROR: Training data not found at {train_data_path}")
         return
 
-    # Load data
-    df_train = load_training_data(train_data_path)
-
-    # Prepare features and target
-    X_train, y_train, feature_names = prepare_features_and_target(df_train)
-
-    # Train model
-    model = train_random_forest(X_train, y_train)
-
-    # Calculate training metrics
-    y_train_pred = model.predict(X_train)
-    train_metrics = calculate_metrics(y_train, y_train_pred)
-
-    print("\nTraining Metrics:")
-    print(f"  RMSE: {train_metrics['rmse']:.6f}")
-    print(f"  MAE:  {train_metrics['mae']:.6f}")
-    print(f"  R2:   {train_metrics['r2']:.6f}")
+    if shards or merge_only:
+        # Every shard reads train_data itself; merging gives one forest and its OOB predictions
+        if merge_only:
+            print(f"\nMerging shards in {shard_dir}")
+            model, oob_prediction = merge_shards(shard_dir)
+        else:
+            shard_dir = shard_dir or os.path.join(output_dir, 'shards', datetime.now().strftime('%Y%m%d-%H%M%S'))
+            hyperparams = default_hyperparams()
+            print(f"\nTraining {hyperparams['n_estimators']} trees as {shards} shards in {shard_dir}")
+            if not workers:
+                print(f"Waiting for workers: python ml/train_model.py --worker {shard_dir}")
+            model, oob_prediction = train_sharded(resolve_data_path(train_data_path), shard_dir,
+                                                  hyperparams, shards, workers, timeout=timeout,
+                                                  stale_after=stale_after)
+        print(f"Merged {model.n_estimators} trees")
+
+        # The encoded matrix the shards were fitted on (same encoder and feature order)
+        X_train, y_train, feature_names, encoder = load_plan_matrix(load_plan(shard_dir))
+        if list(model.feature_names_in_) != feature_names:
+            raise ValueError("The merged forest was fitted on different features than the plan's data")
+        metrics = oob_metrics(y_train, oob_prediction)
+    else:
+        # Load data
+        df_train = load_training_data(train_data_path)
+
+        # Prepare features and target
+        X_train, y_train, feature_names, encoder = prepare_features_and_target(df_train)
+
+        # Train model
+        model = train_random_forest(X_train, y_train)
+
+        # Out-of-bag metrics were computed during the fit
+        metrics = oob_metrics(y_train, model.oob_prediction_)
+
+    print(f"\nOut-of-Bag Metrics ({metrics['n_oob_samples']} samples):")
+    print(f"  RMSE: {metrics['rmse']:.6f}")
+    print(f"  MAE:  {metrics['mae']:.6f}")
+    print(f"  R2:   {metrics['r2']:.6f}")
+
+    # Re-predicting the training set is opt-in (a full extra predict pass, and optimistic)
+    train_metrics = None
+    if training_metrics:
+        train_metrics = regression_metrics(y_train, model.predict(X_train))
+
+        print("\nTraining Set Metrics:")
+        print(f"  RMSE: {train_metrics['rmse']:.6f}")
+        print(f"  MAE:  {train_metrics['mae']:.6f}")
+        print(f"  R2:   {train_metrics['r2']:.6f}")
 
     # Get feature importance
     feature_importance = get_feature_importance(model, feature_names)
@@ -228,23 +273,60 @@ def main():
     for i, feat in enumerate(feature_importance[:10], 1):
         print(f"  {i}. {feat['feature']}: {feat['importance']:.4f}")
 
-    # Save everything
+    # Save everything as a new registry version and publish it
+    registry = ModelRegistry(output_dir)
+    version, version_dir = registry.new_version()
     save_model_artifacts(
         model,
         feature_names,
         feature_importance,
-        train_metrics,
-        output_dir
+        metrics,
+        version_dir,
+        encoder=encoder,
+        version=version,
+        training_metrics=train_metrics
     )
+    registry.set_current(version)
 
     print("\n" + "=" * 60)
     print("Training Complete!")
     print("=" * 60)
-    print(f"\nModel artifacts saved to: {output_dir}")
+    print(f"\nModel version {version} saved to: {version_dir}")
     print("\nNext steps:")
     print("  1. Run evaluate_model.py to test on test/validation sets")
-    print("  2. Use model_loader.py to load model for predictions")
+    print("  2. A running API switches to the new version within ML_MODEL_SYNC_S seconds")
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Train the Random Forest model')
+    parser.add_argument('--training-metrics', action='store_true',
+                        help='Also re-predict the training set (metrics are out-of-bag by default)')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Build the forest as N partial forests and merge them')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Local worker processes for --shards (default: one per shard up to the CPU count; '
+                             '0 waits for --worker processes started elsewhere)')
+    parser.add_argument('--shard-dir', help='Directory shared by the coordinator and the workers')
+    parser.add_argument('--worker', metavar='SHARD_DIR',
+                        help='Build unclaimed shards of the plan in SHARD_DIR, then exit (run on each node)')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Threads per shard fit for --worker')
+    parser.add_argument('--merge', metavar='SHARD_DIR',
+                        help='Merge the finished shards in SHARD_DIR into a new model version')
+    parser.add_argument('--stale-after', type=float, default=None, metavar='SECONDS',
+                        help='Take over shards whose claim has not been refreshed for this long (a crashed '
+                             'worker); the coordinator rebuilds them itself. At least 30s')
+    parser.add_argument('--timeout', type=float, default=None, metavar='SECONDS',
+                        help='Coordinator: fail if the shards are not all finished after this long')
+    args = parser.parse_args()
+
+    if args.worker:
+        built = run_worker(args.worker, n_jobs=args.n_jobs, stale_after=args.stale_after)
+        print(f"Built shards: {built or 'none left'}")
+    elif args.merge:
+        main(training_metrics=args.training_metrics, shard_dir=args.merge, merge_only=True)
+    else:
+        workers = args.workers
+        if workers is None and args.shards:
+            workers = min(args.shards, os.cpu_count() or 1)
+        main(training_metrics=args.training_metrics, shards=args.shards, workers=workers,
+             shard_dir=args.shard_dir, timeout=args.timeout, stale_after=args.stale_after)
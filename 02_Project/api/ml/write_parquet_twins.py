@@ -0,0 +1,71 @@
+"""
+Parquet Twin Writer
+Writes train/val/test_data.parquet next to the split CSVs so the API and
+the training scripts can skip CSV parsing (they pick the twins up automatically)
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from table_io import HAS_PYARROW
+
+
+SPLIT_FILES = ['train_data.csv', 'val_data.csv', 'test_data.csv']
+
+
+def write_twin(csv_path):
+    """
+    Convert one CSV to Parquet and check the round trip
+
+    Args:
+        csv_path: Path to the CSV
+
+    Returns:
+        Path of the written Parquet file
+    """
+    df = pd.read_csv(csv_path)
+    twin_path = os.path.splitext(csv_path)[0] + '.parquet'
+    df.to_parquet(twin_path, index=False)
+
+    # The server swaps the twin in silently, so make sure it reads back identically
+    pd.testing.assert_frame_equal(pd.read_parquet(twin_path), df)
+
+    csv_size = os.path.getsize(csv_path)
+    twin_size = os.path.getsize(twin_path)
+    print(f"  {os.path.basename(csv_path):<16} {len(df):>8} rows  "
+          f"{csv_size / 1024:>8.1f} KB -> {twin_size / 1024:>8.1f} KB")
+    return twin_path
+
+
+def main():
+    """Write Parquet twins for all split files"""
+    print("=" * 60)
+    print("Writing Parquet twins for Data/04_Split")
+    print("=" * 60)
+
+    if not HAS_PYARROW:
+        print("ERROR: pyarrow is not installed (pip install pyarrow)")
+        return
+
+    # We're in 02_Project/api/ml/, need to go up to 02_Project/
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    split_dir = os.path.join(base_dir, 'Data', '04_Split')
+
+    for name in SPLIT_FILES:
+        csv_path = os.path.join(split_dir, name)
+        if not os.path.exists(csv_path):
+            print(f"  {name:<16} not found, skipped")
+            continue
+        write_twin(csv_path)
+
+    print("\nDone. Re-run this script after regenerating the CSVs - twins older")
+    print("than their CSV are ignored.")
+
+
+if __name__ == '__main__':
+    main()
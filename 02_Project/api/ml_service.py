@@ -5,13 +5,47 @@ Includes preprocessing for raw survey CSV data
 """
 
 import os
+import copy
 import json
-import joblib
-import pandas as pd
+import threading
+import time
 import numpy as np
 from datetime import datetime
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from categorical_encoder import CategoricalEncoder
+from forest_engine import ANYTIME_BLOCK_TREES, anytime_average
+from instrumentation import BATCH_ROWS, ROWS, stage, timed_iter
+from matrix_cache import TrainingMatrix, load_matrix
+from model_registry import ModelBundle, ModelRegistry
+from prediction_cache import PredictionCache
+from prediction_scheduler import DEFAULT_WAIT_TIMEOUT_S, MicroBatchScheduler
+from row_dedup import dedup_stats, unique_rows
+from streaming_metrics import EVAL_GROUP_COLUMNS, GroupedRegressionAccumulator, oob_metrics, regression_metrics
+from table_io import read_data_file
+
+
+# Largest batch scored by the compiled engine; bigger batches amortize sklearn's
+# per-tree dispatch and parallelize across cores with n_jobs, so they go to sklearn
+ENGINE_MAX_ROWS = 256
+
+# Number of progress updates while fitting with a progress callback
+PROGRESS_STEPS = 20
+
+# Trees added by an incremental (warm-start) training run unless a count is given
+DEFAULT_GROWTH_TREES = 100
+
+# Rows scored at a time when evaluating a cached matrix
+MATRIX_EVAL_ROWS = 50000
+
+# Default prediction interval: the 5th and 95th percentile of the trees' predictions
+DEFAULT_QUANTILES = (0.05, 0.95)
+
+# Seconds between checks of the CURRENT pointer for versions published by
+# other processes (see MLService.sync_published_version)
+MODEL_SYNC_SECONDS = 1.0
+
+# Rows per (n_trees x rows) prediction matrix when computing intervals
+# (750 trees x 2048 rows is 12 MB of float64)
+INTERVAL_BLOCK_ROWS = 2048
 
 
 class MLService:
@@ -22,34 +56,147 @@ class MLService:
     1. Train model from pre-processed CSV (train_data.csv from R preprocessing)
     2. Make predictions on new pre-processed CSV data
     3. Data must already have the 27 engineered features from R
+
+    Every trained model is stored as its own version in the ModelRegistry.
+    Requests score with the active version unless they pin one explicitly.
     """
 
-    def __init__(self, model_dir):
+    def __init__(self, model_dir, batch_window_ms=None, max_batch_rows=4096,
+                 model_cache_bytes=512 * 1024 * 1024, engine_max_rows=ENGINE_MAX_ROWS,
+                 prediction_cache_bytes=64 * 1024 * 1024, batch_wait_timeout_s=DEFAULT_WAIT_TIMEOUT_S,
+                 model_sync_seconds=MODEL_SYNC_SECONDS):
         """
         Initialize ML Service
 
         Args:
             model_dir: Directory to save/load model artifacts
+            batch_window_ms: Coalesce concurrent predictions for this many ms
+                (None or 0 scores every request on its own)
+            max_batch_rows: Row limit for one coalesced batch
+            model_cache_bytes: Memory budget for loaded model versions
+            engine_max_rows: Largest batch scored by the memory-mapped engine
+                (raise it to keep workers from ever loading the sklearn pickle)
+            prediction_cache_bytes: Memory budget for cached row and file
+                predictions (0 disables the cache)
+            batch_wait_timeout_s: A request whose batch isn't scored within
+                this many seconds is scored on its own
+            model_sync_seconds: How often sync_published_version looks at
+                the CURRENT pointer
         """
         self.model_dir = model_dir
-        self.model = None
-        self.metadata = None
-        self.feature_names = None
-        self.feature_importance = None
-        self.categorical_mappings = None
-        self.value_log_scaler = None
-        self.is_loaded = False
+        self.engine_max_rows = engine_max_rows
 
         # Create outputs directory if it doesn't exist
         os.makedirs(model_dir, exist_ok=True)
 
-    def train_model(self, df_train, hyperparams=None):
+        self.registry = ModelRegistry(model_dir, model_cache_bytes)
+
+        # Request-coalescing scheduler for concurrent predictions
+        self.scheduler = None
+        if batch_window_ms:
+            self.scheduler = MicroBatchScheduler(self._score_matrix, batch_window_ms, max_batch_rows,
+                                                 batch_wait_timeout_s)
+
+        # Predictions by (version, feature row) and (version, file digest);
+        # cleared whenever the served model changes
+        self.prediction_cache = PredictionCache(prediction_cache_bytes)
+
+        # CURRENT pointer as last seen by this process (see sync_published_version)
+        self.model_sync_seconds = model_sync_seconds
+        self._pointer_signature = None
+        self._next_sync = 0.0
+        self._sync_lock = threading.Lock()
+        self._syncing = False
+
+    # ============================================================
+    # ACTIVE MODEL
+    # ============================================================
+
+    @property
+    def is_loaded(self):
+        return self.registry.active is not None
+
+    @property
+    def model_version(self):
+        return self.registry.active.version if self.is_loaded else None
+
+    @property
+    def model(self):
+        return self.registry.active.model if self.is_loaded else None
+
+    @property
+    def engine(self):
+        return self.registry.active.engine if self.is_loaded else None
+
+    @property
+    def metadata(self):
+        return self.registry.active.metadata if self.is_loaded else None
+
+    @property
+    def feature_names(self):
+        return self.registry.active.feature_names if self.is_loaded else None
+
+    @property
+    def feature_importance(self):
+        return self.registry.active.feature_importance if self.is_loaded else None
+
+    @property
+    def categorical_mappings(self):
+        return self.registry.active.categorical_mappings if self.is_loaded else None
+
+    @property
+    def value_log_scaler(self):
+        return self.registry.active.value_log_scaler if self.is_loaded else None
+
+    def get_bundle(self, model_version=None):
+        """
+        Get the model bundle to score a request with
+
+        Args:
+            model_version: Pinned version id, or None for the active model
+
+        Returns:
+            ModelBundle
+        """
+        if model_version:
+            return self.registry.get(model_version)
+
+        bundle = self.registry.active
+        if bundle is None:
+            raise ValueError("Model not loaded")
+        return bundle
+
+    def resolve_version(self, model_version=None):
+        """
+        Resolve a request's model version once, so all steps of the request
+        (predict, inverse transform) use the same model even if another
+        version is activated in between
+        """
+        return self.get_bundle(model_version).version
+
+    # ============================================================
+    # TRAINING
+    # ============================================================
+
+    def train_model(self, df_train, hyperparams=None, progress_callback=None, publish=True,
+                    training_metrics=False):
         """
         Train Random Forest model from pre-processed training data
 
+        Reported metrics are out-of-bag: every tree is scored on the bootstrap
+        rows it never saw while the forest is fitted, which is both cheaper
+        and less optimistic than re-predicting the training set.
+
         Args:
-            df_train: DataFrame with engineered features + target (value_log_scaled)
+            df_train: DataFrame with engineered features + target (value_log_scaled),
+                or a TrainingMatrix from the matrix cache (already encoded)
             hyperparams: Optional dict of hyperparameters
+            progress_callback: Optional callable(trees_built, n_estimators); when
+                given the forest is grown in PROGRESS_STEPS warm-start steps so
+                progress can be reported (and the callback may raise to cancel)
+            publish: Serve the new version right away (False just registers it)
+            training_metrics: Also re-predict the training set and store those
+                metrics as 'training_metrics' (costs a full extra predict pass)
 
         Returns:
             Dict with training results
@@ -66,150 +213,737 @@ class MLService:
 
         # Separate features and target
         target_col = 'value_log_scaled'
-        if target_col not in df_train.columns:
-            raise ValueError(f"Target column '{target_col}' not found in training data")
-
-        y_train = df_train[target_col]
-        X_train = df_train[[col for col in df_train.columns if col != target_col]].copy()
-
-        if 'value_log' in df_train.columns:
-            value_log_mean = float(df_train['value_log'].mean())
-            value_log_std = float(df_train['value_log'].std())
-            self.value_log_scaler = {
-                'mean': value_log_mean,
-                'std': value_log_std
-            }
-            print(f"[ML-SERVICE] Saved value_log scaler: mean={value_log_mean:.4f}, std={value_log_std:.4f}")
+        if isinstance(df_train, TrainingMatrix):
+            # Encoded (and the scaler computed) when the matrix was cached
+            if df_train.y is None:
+                raise ValueError(f"Target column '{target_col}' not found in training data")
+            y_train = df_train.y
+            feature_names = df_train.feature_names
+            value_log_scaler = df_train.value_log_scaler
+            encoder = df_train.encoder
+            X_train = df_train.frame()
+        else:
+            if target_col not in df_train.columns:
+                raise ValueError(f"Target column '{target_col}' not found in training data")
+
+            y_train = df_train[target_col]
+            feature_names = [col for col in df_train.columns if col != target_col]
+
+            value_log_scaler = None
+            if 'value_log' in df_train.columns:
+                value_log_scaler = {
+                    'mean': float(df_train['value_log'].mean()),
+                    'std': float(df_train['value_log'].std())
+                }
 
-        # Handle categorical columns (encode text to numbers)
-        self.categorical_mappings = {}
-        for col in X_train.columns:
-            if X_train[col].dtype == 'object' or X_train[col].dtype.name == 'category':
-                unique_vals = X_train[col].unique()
-                mapping = {val: idx for idx, val in enumerate(unique_vals)}
-                self.categorical_mappings[col] = mapping
-                X_train[col] = X_train[col].map(mapping)
+            # Handle categorical columns (encode text to numbers)
+            encoder = CategoricalEncoder.fit(df_train, feature_names)
+            X_train, _ = encoder.encode_frame(df_train, feature_names)
 
-        # Store feature names
-        self.feature_names = X_train.columns.tolist()
+        if value_log_scaler:
+            print(f"[ML-SERVICE] Saved value_log scaler: mean={value_log_scaler['mean']:.4f}, "
+                  f"std={value_log_scaler['std']:.4f}")
 
         # Train model
         print(f"[ML-SERVICE] Training Random Forest...")
-        print(f"[ML-SERVICE] Samples: {len(X_train)}, Features: {len(self.feature_names)}")
+        print(f"[ML-SERVICE] Samples: {len(X_train)}, Features: {len(feature_names)}")
 
-        self.model = RandomForestRegressor(**hyperparams)
-        self.model.fit(X_train, y_train)
+        # Imported here: serving from the compiled engine never needs scikit-learn
+        from sklearn.ensemble import RandomForestRegressor
 
-        # Calculate training metrics
-        y_pred = self.model.predict(X_train)
-        metrics = self._calculate_metrics(y_train, y_pred)
+        model = RandomForestRegressor(**hyperparams)
+        # OOB predictions need bootstrap samples; without them fall back to re-predicting
+        use_oob = model.bootstrap
+        if progress_callback is None:
+            model.set_params(oob_score=use_oob)
+            model.fit(X_train, y_train)
+        else:
+            self._fit_with_progress(model, X_train, y_train, progress_callback, oob_score=use_oob)
 
         # Get feature importance
-        self.feature_importance = [
+        feature_importance = [
             {'feature': name, 'importance': float(imp)}
-            for name, imp in zip(self.feature_names, self.model.feature_importances_)
+            for name, imp in zip(feature_names, model.feature_importances_)
         ]
-        self.feature_importance.sort(key=lambda x: x['importance'], reverse=True)
+        feature_importance.sort(key=lambda x: x['importance'], reverse=True)
+
+        version, version_dir = self.registry.new_version()
 
         # Save metadata
-        self.metadata = {
+        metadata = {
+            'version': version,
             'training_date': datetime.now().isoformat(),
             'model_type': 'RandomForestRegressor',
             'n_estimators': hyperparams['n_estimators'],
             'max_features': hyperparams['max_features'],
             'min_samples_leaf': hyperparams['min_samples_leaf'],
             'random_state': hyperparams.get('random_state'),
-            'n_features': len(self.feature_names),
-            'n_samples': len(X_train),
-            'metrics': metrics
+            'n_features': len(feature_names),
+            'n_samples': len(X_train)
         }
 
+        bundle = ModelBundle(version, model, metadata, feature_names, feature_importance,
+                             encoder, value_log_scaler)
+
+        # Out-of-bag metrics were computed during the fit
+        if use_oob:
+            metadata['metrics'] = oob_metrics(y_train, model.oob_prediction_)
+            metadata['metrics_source'] = 'oob'
+
+        # Optional (or, without bootstrap, only) metrics from re-predicting the training set
+        if training_metrics or not use_oob:
+            y_pred = self._score_matrix(bundle, X_train)
+            metadata['training_metrics'] = regression_metrics(y_train, y_pred)
+            if not use_oob:
+                metadata['metrics'] = metadata['training_metrics']
+                metadata['metrics_source'] = 'training'
+
         # Save everything to disk
-        self._save_artifacts()
+        bundle.save(version_dir)
+        print(f"[ML-SERVICE] Model artifacts saved to {version_dir}")
 
-        self.is_loaded = True
+        if publish:
+            self.registry.publish(bundle)
+            self.prediction_cache.invalidate(f"retrained as {version}")
 
-        print(f"[ML-SERVICE] Training complete - R2: {metrics['r2']:.4f}")
+        print(f"[ML-SERVICE] Training complete - {metadata['metrics_source']} R2: {metadata['metrics']['r2']:.4f}")
 
         return {
-            'metrics': metrics,
-            'n_features': len(self.feature_names),
+            'version': version,
+            'metrics': metadata['metrics'],
+            'metrics_source': metadata['metrics_source'],
+            'n_features': len(feature_names),
             'n_samples': len(X_train)
         }
 
-    def evaluate_model(self, df_test, dataset_name='Test'):
+    def grow_model(self, df_new, n_new_trees=DEFAULT_GROWTH_TREES, base_version=None, df_eval=None,
+                   data_source='train_data', progress_callback=None, publish=True):
+        """
+        Add trees to an existing version instead of retraining the whole forest
+
+        The base forest is copied shallowly - its fitted trees are shared, not
+        refitted - and grown with warm_start, so the cost is fitting
+        n_new_trees on df_new. Grown on the base version's own training data
+        with a fixed random_state, the result equals a full fit with the
+        larger n_estimators; grown on fresh rows only, the new trees learn
+        those while the old ones keep what they learned.
+
+        The base version's encoder, feature order and value_log scaler are
+        reused, so categories first seen in df_new are encoded as unknown.
+        A grown forest has no OOB metrics (the old trees' bootstrap samples
+        index other data): with df_eval both versions are evaluated on it in
+        one pass, otherwise df_new is re-predicted.
+
+        Args:
+            df_new: DataFrame with the base version's features + target, or a
+                TrainingMatrix encoded with the base version's encoder
+            n_new_trees: Number of trees to add
+            base_version: Version to grow (default: the active one)
+            df_eval: Optional validation DataFrame (or TrainingMatrix) to compare before / after on
+            data_source: Label for the lineage record ('train_data', 'upload', ...)
+            progress_callback: Optional callable(trees_built, n_new_trees), as for train_model
+            publish: Serve the new version right away (False just registers it)
+
+        Returns:
+            Dict with training results, parent_version and (with df_eval) the
+            before / after comparison
+        """
+        if n_new_trees < 1:
+            raise ValueError("n_new_trees must be a positive integer")
+
+        base = self.get_bundle(base_version)
+        target_col = 'value_log_scaled'
+        if isinstance(df_new, TrainingMatrix):
+            if df_new.y is None:
+                raise ValueError(f"Target column '{target_col}' not found in training data")
+            if not df_new.matches(base.encoder, base.feature_names):
+                raise ValueError(f"Training matrix was not encoded for version {base.version}")
+            y_new = df_new.y
+            X_new, unknown_counts = df_new.frame(), df_new.unknown_counts
+        else:
+            if target_col not in df_new.columns:
+                raise ValueError(f"Target column '{target_col}' not found in training data")
+
+            missing = [col for col in base.feature_names if col not in df_new.columns]
+            if missing:
+                raise ValueError(f"Training data is missing features of version {base.version}: "
+                                 f"{', '.join(missing)}")
+
+            y_new = df_new[target_col]
+            X_new, unknown_counts = base.encoder.encode_frame(df_new, base.feature_names)
+        self._warn_unknown(unknown_counts, base)
+
+        # Shallow copy: the served model object (and its tree list) is never touched
+        base_model = base.model
+        model = copy.copy(base_model)
+        model.estimators_ = list(base_model.estimators_)
+        for attr in ('oob_score_', 'oob_prediction_'):
+            model.__dict__.pop(attr, None)
+
+        n_base_trees = len(model.estimators_)
+        n_estimators = n_base_trees + n_new_trees
+        model.set_params(n_estimators=n_estimators, oob_score=False)
+
+        print(f"[ML-SERVICE] Growing version {base.version} from {n_base_trees} to {n_estimators} trees "
+              f"on {len(X_new)} rows ({data_source})")
+
+        start = time.perf_counter()
+        if progress_callback is None:
+            model.set_params(warm_start=True)
+            model.fit(X_new, y_new)
+            model.set_params(warm_start=False)
+        else:
+            self._fit_with_progress(model, X_new, y_new, progress_callback)
+        fit_seconds = time.perf_counter() - start
+
+        feature_importance = [
+            {'feature': name, 'importance': float(imp)}
+            for name, imp in zip(base.feature_names, model.feature_importances_)
+        ]
+        feature_importance.sort(key=lambda x: x['importance'], reverse=True)
+
+        version, version_dir = self.registry.new_version()
+
+        # Hyperparameters and n_samples (the data the forest was first built on) carry over
+        metadata = dict(base.metadata)
+        metadata.pop('training_metrics', None)
+        metadata.update({
+            'version': version,
+            'training_date': datetime.now().isoformat(),
+            'n_estimators': n_estimators,
+            'parent_version': base.version,
+            'lineage': base.metadata.get('lineage', []) + [base.version],
+            'growth': {
+                'parent_version': base.version,
+                'parent_n_estimators': n_base_trees,
+                'trees_added': n_new_trees,
+                'data_source': data_source,
+                'n_samples': len(X_new),
+                'fit_seconds': round(fit_seconds, 3)
+            }
+        })
+
+        bundle = ModelBundle(version, model, metadata, base.feature_names, feature_importance,
+                             base.encoder, base.value_log_scaler)
+
+        comparison = None
+        if df_eval is not None:
+            # Cached so the comparison scores the new version before it is on disk
+            self.registry.put(bundle)
+            comparison = self.evaluate_model(df_eval, 'Validation', version, baseline_version=base.version)
+            metadata['metrics'] = comparison['metrics']
+            metadata['metrics_source'] = 'validation'
+            metadata['growth']['validation'] = {
+                'n_samples': comparison['n_samples'],
+                'before': comparison['baseline']['metrics'],
+                'after': comparison['metrics'],
+                'delta': comparison['delta']
+            }
+        else:
+            metadata['metrics'] = regression_metrics(y_new, self._score_matrix(bundle, X_new))
+            metadata['metrics_source'] = 'training'
+
+        bundle.save(version_dir)
+        print(f"[ML-SERVICE] Model artifacts saved to {version_dir}")
+
+        if publish:
+            self.registry.publish(bundle)
+            self.prediction_cache.invalidate(f"grown into {version}")
+
+        print(f"[ML-SERVICE] Growth complete in {fit_seconds:.1f}s - "
+              f"{metadata['metrics_source']} R2: {metadata['metrics']['r2']:.4f}")
+
+        return {
+            'version': version,
+            'parent_version': base.version,
+            'n_estimators': n_estimators,
+            'trees_added': n_new_trees,
+            'metrics': metadata['metrics'],
+            'metrics_source': metadata['metrics_source'],
+            'comparison': metadata['growth'].get('validation'),
+            'n_features': len(base.feature_names),
+            'n_samples': len(X_new),
+            'fit_seconds': round(fit_seconds, 3)
+        }
+
+    def _fit_with_progress(self, model, X_train, y_train, progress_callback, oob_score=False):
+        """
+        Grow the forest in warm-start steps, reporting progress after each one
+
+        With a fixed random_state the result is identical to a single fit.
+        OOB predictions are only computed on the last step, over all trees.
+        Trees a model already has (grow_model) are kept, and progress counts
+        only the new ones.
+        """
+        n_estimators = model.n_estimators
+        trees_built = n_existing = len(getattr(model, 'estimators_', []))
+        step = max(1, (n_estimators - n_existing) // PROGRESS_STEPS)
+
+        model.set_params(warm_start=True)
+        while trees_built < n_estimators:
+            trees_built = min(n_estimators, trees_built + step)
+            model.set_params(n_estimators=trees_built, oob_score=oob_score and trees_built == n_estimators)
+            model.fit(X_train, y_train)
+            progress_callback(trees_built - n_existing, n_estimators - n_existing)
+        model.set_params(warm_start=False)
+
+    # ============================================================
+    # EVALUATION AND PREDICTION
+    # ============================================================
+
+    def evaluate_model(self, df_test, dataset_name='Test', model_version=None, group_by=EVAL_GROUP_COLUMNS,
+                       baseline_version=None):
         """
         Evaluate model on test/validation data
 
         Args:
-            df_test: DataFrame with same structure as training data
+            df_test: DataFrame with same structure as training data, or a
+                cached TrainingMatrix (see evaluate_matrix)
             dataset_name: Name for display (e.g., 'Test', 'Validation')
+            model_version: Optional pinned model version
+            group_by: Columns to break the metrics down by
+            baseline_version: Optional version to compare against (e.g. the
+                parent of a grown model)
 
         Returns:
-            Dict with evaluation metrics
+            Dict with evaluation metrics (see evaluate_chunks)
         """
-        if not self.is_loaded:
-            raise ValueError("Model not loaded")
+        if isinstance(df_test, TrainingMatrix):
+            return self.evaluate_matrix(df_test, dataset_name, model_version, group_by, baseline_version)
+        return self.evaluate_chunks([df_test], dataset_name, model_version, group_by, baseline_version)
 
-        # Separate features and target
+    def evaluate_chunks(self, chunks, dataset_name='Test', model_version=None, group_by=EVAL_GROUP_COLUMNS,
+                        baseline_version=None):
+        """
+        Evaluate model on data read a chunk at a time
+
+        Only running sums are kept between chunks (see streaming_metrics), so
+        memory stays flat however large the holdout set is, and the metrics
+        equal those of scoring the whole set at once.
+
+        Args:
+            chunks: Iterable of DataFrames with the training data's structure
+            dataset_name: Name for display (e.g., 'Test', 'Validation')
+            model_version: Optional pinned model version
+            group_by: Columns to break the metrics down by (skipped when
+                missing from the data)
+            baseline_version: Optional version scored on the same chunks, for
+                a before / after comparison in one read of the data
+
+        Returns:
+            Dict with metrics, groups ({column: {value: metrics}}), n_samples,
+            n_chunks, unknown_categories and model_version; with a baseline
+            also baseline ({model_version, metrics, groups}) and delta
+            (metrics minus the baseline's)
+        """
+        bundle = self.get_bundle(model_version)
+        baseline = self.get_bundle(baseline_version) if baseline_version else None
         target_col = 'value_log_scaled'
-        y_true = df_test[target_col]
-        X_test = df_test[[col for col in df_test.columns if col != target_col]].copy()
 
-        # Apply categorical mappings
-        if self.categorical_mappings:
-            for col, mapping in self.categorical_mappings.items():
-                if col in X_test.columns:
-                    X_test[col] = X_test[col].map(mapping)
+        def encoded_chunks():
+            for chunk in chunks:
+                if target_col not in chunk.columns:
+                    raise ValueError(f"Evaluation data has no '{target_col}' column")
 
-        # Make predictions
-        y_pred = self.model.predict(X_test)
+                # Separate features and target
+                y_true = chunk[target_col].to_numpy(dtype=np.float64)
+                with stage('encode'):
+                    X_chunk, chunk_unknown = bundle.encoder.encode(chunk, bundle.feature_names)
 
-        # Calculate metrics
-        metrics = self._calculate_metrics(y_true, y_pred)
+                X_baseline = X_chunk
+                if baseline is not None and (baseline.encoder is not bundle.encoder
+                                             or baseline.feature_names != bundle.feature_names):
+                    X_baseline, _ = baseline.encoder.encode(chunk, baseline.feature_names)
 
-        print(f"[ML-SERVICE] {dataset_name} Set - R2: {metrics['r2']:.4f}, RMSE: {metrics['rmse']:.4f}")
+                yield chunk, y_true, X_chunk, X_baseline, chunk_unknown
 
-        return {
+        return self._evaluate_encoded(encoded_chunks(), bundle, baseline, dataset_name, group_by)
+
+    def evaluate_matrix(self, matrix, dataset_name='Test', model_version=None, group_by=EVAL_GROUP_COLUMNS,
+                        baseline_version=None, chunk_size=MATRIX_EVAL_ROWS):
+        """
+        Evaluate on a cached TrainingMatrix (see matrix_cache)
+
+        Nothing is parsed or encoded: row blocks of the memory-mapped matrix
+        are scored directly, and the group breakdowns come from the group
+        columns stored with it.
+
+        Args:
+            matrix: TrainingMatrix encoded with the model's (and baseline's) encoder
+            chunk_size: Rows scored at a time
+            Others: As for evaluate_chunks
+
+        Returns:
+            Dict with evaluation metrics (see evaluate_chunks)
+        """
+        bundle = self.get_bundle(model_version)
+        baseline = self.get_bundle(baseline_version) if baseline_version else None
+        for checked in filter(None, (bundle, baseline)):
+            if not matrix.matches(checked.encoder, checked.feature_names):
+                raise ValueError(f"Evaluation matrix was not encoded for version {checked.version}")
+        if matrix.y is None:
+            raise ValueError("Evaluation data has no 'value_log_scaled' column")
+
+        def encoded_chunks():
+            for start in range(0, matrix.n_rows, chunk_size):
+                stop = min(start + chunk_size, matrix.n_rows)
+                X_chunk = np.asarray(matrix.X[start:stop])
+                unknown = matrix.unknown_counts if start == 0 else {}
+                yield (matrix.group_frame(group_by, start, stop), np.asarray(matrix.y[start:stop]),
+                       X_chunk, X_chunk, unknown)
+
+        return self._evaluate_encoded(encoded_chunks(), bundle, baseline, dataset_name, group_by)
+
+    def _evaluate_encoded(self, encoded_chunks, bundle, baseline, dataset_name, group_by):
+        """
+        Score encoded chunks with a bundle (and optional baseline) and accumulate metrics
+
+        Args:
+            encoded_chunks: Iterable of (group DataFrame, y_true, X, X for the
+                baseline, unknown_counts) per chunk
+
+        Returns:
+            Dict with evaluation metrics (see evaluate_chunks)
+        """
+        target_col = 'value_log_scaled'
+        accumulator = GroupedRegressionAccumulator(group_by)
+        baseline_accumulator = GroupedRegressionAccumulator(group_by) if baseline else None
+        unknown_counts = {}
+        n_chunks = 0
+
+        for chunk, y_true, X_chunk, X_baseline, chunk_unknown in encoded_chunks:
+            if np.isnan(y_true).any():
+                raise ValueError(f"Evaluation data has missing '{target_col}' values")
+
+            # Make predictions
+            ROWS.inc('predicted', amount=len(y_true))
+            y_pred = self._predict_matrix(X_chunk, bundle)
+
+            accumulator.update(chunk, y_true, y_pred)
+            if baseline is not None:
+                baseline_accumulator.update(chunk, y_true, self._predict_matrix(X_baseline, baseline))
+
+            for col, count in chunk_unknown.items():
+                unknown_counts[col] = unknown_counts.get(col, 0) + count
+            n_chunks += 1
+
+        if accumulator.overall.n == 0:
+            raise ValueError("Evaluation data has no rows")
+
+        self._warn_unknown(unknown_counts, bundle)
+        metrics, groups = accumulator.result()
+
+        print(f"[ML-SERVICE] {dataset_name} Set - R2: {metrics['r2']:.4f}, RMSE: {metrics['rmse']:.4f} "
+              f"({accumulator.overall.n} rows in {n_chunks} chunk(s))")
+
+        result = {
             'metrics': metrics,
-            'n_samples': len(X_test)
+            'groups': groups,
+            'n_samples': accumulator.overall.n,
+            'n_chunks': n_chunks,
+            'unknown_categories': unknown_counts,
+            'model_version': bundle.version
         }
 
-    def predict_from_dataframe(self, df):
+        if baseline is not None:
+            baseline_metrics, baseline_groups = baseline_accumulator.result()
+            result['baseline'] = {
+                'model_version': baseline.version,
+                'metrics': baseline_metrics,
+                'groups': baseline_groups
+            }
+            result['delta'] = {
+                name: value - baseline_metrics[name]
+                for name, value in metrics.items()
+                if value is not None and baseline_metrics.get(name) is not None
+            }
+            print(f"[ML-SERVICE] {dataset_name} Set - baseline {baseline.version} R2: {baseline_metrics['r2']:.4f}, "
+                  f"RMSE: {baseline_metrics['rmse']:.4f} (delta RMSE {result['delta']['rmse']:+.4f})")
+
+        return result
+
+    def predict_from_dataframe(self, df, model_version=None, budget_ms=None, tolerance=None,
+                               return_info=False):
         """
         Make predictions from pre-processed DataFrame
 
+        With budget_ms or tolerance the forest is evaluated anytime-style:
+        trees are averaged in a fixed order, ANYTIME_BLOCK_TREES at a time,
+        and evaluation stops early once the latency budget would be exceeded
+        or every row's standard error (vs. using all trees) is within
+        tolerance. These requests skip micro-batching.
+
+        Rows with identical encoded features are scored once and their
+        prediction is copied back to every duplicate (see row_dedup); rows
+        scored before with the same version come from the prediction cache.
+
         Args:
             df: DataFrame with same engineered features as training data
+            model_version: Optional pinned model version
+            budget_ms: Optional latency budget for tree evaluation in ms
+            tolerance: Optional standard error (scaled units) to stop at
+            return_info: Also return how the prediction was made
 
         Returns:
-            Array of predictions (scaled values)
+            Array of predictions (scaled values), or (predictions, info) with
+            return_info; info has trees_used, n_trees, stop_reason, elapsed_ms,
+            a per-row std_error array and dedup (see row_dedup.dedup_stats)
         """
-        if not self.is_loaded:
-            raise ValueError("Model not loaded")
+        bundle = self.get_bundle(model_version)
 
-        # Prepare features (exclude target if present)
-        target_col = 'value_log_scaled'
-        if target_col in df.columns:
-            X = df[[col for col in df.columns if col != target_col]].copy()
+        # Encode in feature order (the target column, if present, is ignored)
+        with stage('encode'):
+            X, _ = self._encode_features(df, bundle)
+        n_rows = len(X)
+        ROWS.inc('predicted', amount=n_rows)
+        with stage('dedup'):
+            X, inverse = unique_rows(X)
+
+        # Make predictions
+        if budget_ms is None and tolerance is None:
+            predictions = self._predict_cached(X, bundle)
+            info = {
+                'trees_used': bundle.n_trees,
+                'n_trees': bundle.n_trees,
+                'stop_reason': 'all_trees',
+                'elapsed_ms': None,
+                'std_error': np.zeros(len(predictions))
+            }
         else:
-            X = df.copy()
+            with stage('predict_anytime'):
+                predictions, info = self._predict_anytime(X, bundle, budget_ms, tolerance)
+            ROWS.inc('scored', amount=len(X))
+
+        # Scatter the unique rows' results back to the original row order
+        if inverse is not None:
+            predictions = predictions[inverse]
+            info['std_error'] = info['std_error'][inverse]
+        info['dedup'] = dedup_stats(n_rows, len(X))
+
+        if return_info:
+            return predictions, info
+        return predictions
 
-        # Apply categorical mappings
-        if self.categorical_mappings:
-            for col, mapping in self.categorical_mappings.items():
-                if col in X.columns:
-                    X[col] = X[col].map(mapping)
+    def _predict_anytime(self, X, bundle, budget_ms, tolerance):
+        """
+        Anytime prediction with the engine, or sklearn's trees one by one
 
-        # Ensure correct feature order
-        X = X[self.feature_names]
+        Returns:
+            (predictions, info) as returned by anytime_average
+        """
+        if bundle.engine is not None and not np.isnan(X).any():
+            return bundle.engine.predict_anytime(X, budget_ms, tolerance)
+
+        # sklearn routes missing values itself; walk its estimators in the same order
+        estimators = bundle.model.estimators_
+        blocks = (
+            np.stack([tree.predict(X) for tree in estimators[start:start + ANYTIME_BLOCK_TREES]])
+            for start in range(0, len(estimators), ANYTIME_BLOCK_TREES)
+        )
+        return anytime_average(blocks, len(estimators), budget_ms, tolerance)
+
+    def predict_intervals(self, df, model_version=None, quantiles=DEFAULT_QUANTILES, return_info=False):
+        """
+        Point predictions plus the spread of the individual trees per row
 
-        # Make predictions
-        predictions = self.model.predict(X)
+        The trees x rows prediction matrix is built INTERVAL_BLOCK_ROWS rows
+        at a time (see _iter_tree_matrix), so memory stays bounded however
+        many rows are scored. Quantiles and standard deviation describe how
+        much the trees disagree; they are an ensemble spread, not a
+        calibrated predictive interval.
+
+        Args:
+            df: DataFrame with same engineered features as training data
+            model_version: Optional pinned model version
+            quantiles: Quantiles in (0, 1) to report per row
+            return_info: Also return {'dedup': ...} (rows are deduplicated
+                like in predict_from_dataframe)
 
+        Returns:
+            Dict of column name -> array (n_rows,), in this order:
+              predicted_value_log_scaled, predicted_value (same as predict +
+              inverse_transform_predictions), <name>_std for both and
+              <name>_q<percent> per quantile for both (e.g. predicted_value_q5);
+            or (columns, info) with return_info
+        """
+        # Resolved once: the trees and the inverse transform must come from the same version
+        bundle = self.get_bundle(model_version)
+        with stage('encode'):
+            X, _ = self._encode_features(df, bundle)
+        n_input_rows = len(X)
+        ROWS.inc('predicted', amount=n_input_rows)
+        with stage('dedup'):
+            X, inverse = unique_rows(X)
+        ROWS.inc('scored', amount=len(X))
+
+        n_rows = len(X)
+        mean = np.empty(n_rows)
+        std_scaled = np.empty(n_rows)
+        std_original = np.empty(n_rows)
+        quantile_values = np.empty((len(quantiles), n_rows))
+
+        for start, stop, values in timed_iter(self._iter_tree_matrix(X, bundle), 'predict_trees'):
+            mean[start:stop] = values.mean(axis=0)
+            std_scaled[start:stop] = values.std(axis=0)
+            quantile_values[:, start:stop] = np.quantile(values, quantiles, axis=0)
+
+            # The spread in original units comes from the transformed trees, not from transforming the std
+            if bundle.value_log_scaler is not None:
+                std_original[start:stop] = self.inverse_transform_predictions(values, bundle.version).std(axis=0)
+            else:
+                std_original[start:stop] = std_scaled[start:stop]
+
+        # Interval endpoints go through the same (monotonic) inverse transform as the point prediction
+        columns = {
+            'predicted_value_log_scaled': mean,
+            'predicted_value': self.inverse_transform_predictions(mean, bundle.version),
+            'predicted_value_log_scaled_std': std_scaled,
+            'predicted_value_std': std_original
+        }
+        for q, values in zip(quantiles, quantile_values):
+            columns[f'predicted_value_log_scaled_{quantile_label(q)}'] = values
+        for q, values in zip(quantiles, quantile_values):
+            columns[f'predicted_value_{quantile_label(q)}'] = self.inverse_transform_predictions(values, bundle.version)
+
+        if inverse is not None:
+            columns = {name: values[inverse] for name, values in columns.items()}
+
+        if return_info:
+            return columns, {'dedup': dedup_stats(n_input_rows, n_rows)}
+        return columns
+
+    def _iter_tree_matrix(self, X, bundle):
+        """
+        Yield (start, stop, per-tree predictions) for INTERVAL_BLOCK_ROWS rows at a time
+
+        Routed like _score_matrix: blocks up to engine_max_rows without
+        missing values are walked by the compiled engine in one vectorized
+        pass. Larger blocks get their leaf ids from one sklearn apply() call
+        (C tree traversal, threaded with n_jobs) and the engine maps those to
+        values. Only versions without an engine loop over estimators_.
+        """
+        for start in range(0, len(X), INTERVAL_BLOCK_ROWS):
+            stop = min(start + INTERVAL_BLOCK_ROWS, len(X))
+            X_block = X[start:stop]
+
+            if bundle.engine is None:
+                values = np.stack([tree.predict(X_block) for tree in bundle.model.estimators_])
+            elif len(X_block) <= self.engine_max_rows and not np.isnan(X_block).any():
+                values = bundle.engine.tree_predictions(X_block)
+            else:
+                values = bundle.engine.leaf_values(bundle.model.apply(self._sklearn_input(X_block, bundle)))
+
+            yield start, stop, values
+
+    def _encode_features(self, df, bundle):
+        """
+        Build the feature matrix for a bundle, warning about unknown categories
+
+        Returns:
+            (X, unknown_counts) as returned by CategoricalEncoder.encode
+        """
+        X, unknown_counts = bundle.encoder.encode(df, bundle.feature_names)
+        self._warn_unknown(unknown_counts, bundle)
+        return X, unknown_counts
+
+    def _warn_unknown(self, unknown_counts, bundle):
+        """Log rows whose categories weren't seen in training"""
+        for col, count in unknown_counts.items():
+            print(f"[ML-SERVICE WARNING] {count} row(s) with unknown '{col}' "
+                  f"encoded as {bundle.encoder.unknown_code}")
+
+    def _predict_cached(self, X, bundle):
+        """
+        Score a feature matrix, reusing cached predictions for rows seen before
+
+        Only full-forest predictions are cached (anytime results depend on the budget).
+
+        Args:
+            X: DataFrame or array with columns in feature order
+            bundle: ModelBundle to score with
+
+        Returns:
+            Array of predictions (scaled values)
+        """
+        with stage('cache_lookup'):
+            keys, predictions, missing = self.prediction_cache.lookup_rows(bundle.version, X)
+        if len(missing) == 0:
+            return predictions
+        if len(missing) == len(X):
+            predictions = self._predict_matrix(X, bundle)
+            self.prediction_cache.store_rows(bundle.version, keys, predictions)
+            return predictions
+
+        X_missing = X.iloc[missing] if hasattr(X, 'iloc') else X[missing]
+        predictions[missing] = self._predict_matrix(X_missing, bundle)
+        if keys is not None:
+            self.prediction_cache.store_rows(bundle.version, [keys[i] for i in missing], predictions[missing])
         return predictions
 
-    def inverse_transform_predictions(self, predictions_scaled):
+    def _predict_matrix(self, X, bundle):
+        """
+        Score a feature matrix, through the micro-batching scheduler when enabled
+
+        Args:
+            X: DataFrame or array with columns in feature order
+            bundle: ModelBundle to score with
+
+        Returns:
+            Array of predictions (scaled values)
+        """
+        BATCH_ROWS.observe(len(X))
+        ROWS.inc('scored', amount=len(X))
+
+        # Includes the wait for a micro-batch slot
+        with stage('predict'):
+            if self.scheduler is not None:
+                return self.scheduler.submit(np.asarray(X, dtype=np.float32), bundle)
+
+            return self._score_matrix(bundle, X)
+
+    def _score_matrix(self, bundle, X):
+        """
+        Score a feature matrix with the compiled engine
+
+        Small batches (up to engine_max_rows) go through the engine. Falls back
+        to sklearn for large batches, when the engine isn't available, or when
+        the input has missing values (sklearn has its own routing rules for NaN).
+
+        Args:
+            bundle: ModelBundle to score with
+            X: DataFrame or array with columns in feature order
+
+        Returns:
+            Array of predictions (scaled values)
+        """
+        if bundle.engine is not None and len(X) <= self.engine_max_rows:
+            values = np.asarray(X, dtype=np.float32)
+            if not np.isnan(values).any():
+                return bundle.engine.predict(values)
+
+        return bundle.model.predict(self._sklearn_input(X, bundle))
+
+    def _sklearn_input(self, X, bundle):
+        """Wrap a bare feature matrix in a DataFrame so sklearn doesn't warn about missing feature names"""
+        if not hasattr(X, 'columns') and hasattr(bundle.model, 'feature_names_in_'):
+            import pandas as pd
+            X = pd.DataFrame(X, columns=bundle.model.feature_names_in_, copy=False)
+        return X
+
+    def get_cache_stats(self):
+        """Get prediction cache hit / miss counters and memory use"""
+        return self.prediction_cache.get_stats()
+
+    def get_batching_stats(self):
+        """Get micro-batching queue depth and batch-size statistics"""
+        if self.scheduler is None:
+            return {'enabled': False}
+
+        stats = self.scheduler.get_stats()
+        stats['enabled'] = True
+        return stats
+
+    def inverse_transform_predictions(self, predictions_scaled, model_version=None):
         """
         Convert scaled predictions back to original survey values
 
@@ -219,127 +953,303 @@ class MLService:
 
         Args:
             predictions_scaled: Array of predictions in value_log_scaled space
+            model_version: Version the predictions came from (None for active)
 
         Returns:
             Array of predictions in original value space (percentages)
         """
-        if self.value_log_scaler is None:
+        value_log_scaler = self.get_bundle(model_version).value_log_scaler
+        if value_log_scaler is None:
             print("[ML-SERVICE WARNING] No scaler available, returning scaled values")
             return predictions_scaled
 
-        predictions_log = (predictions_scaled * self.value_log_scaler['std']) + self.value_log_scaler['mean']
+        with stage('inverse_transform'):
+            predictions_log = (predictions_scaled * value_log_scaler['std']) + value_log_scaler['mean']
 
-        predictions_original = np.expm1(predictions_log)
+            predictions_original = np.expm1(predictions_log)
 
         return predictions_original
 
-    def load_model(self):
-        """Load model and all artifacts from disk"""
+    # ============================================================
+    # MODEL VERSIONS
+    # ============================================================
+
+    def load_model(self, version=None):
+        """
+        Load a model version from disk and serve it
+
+        Args:
+            version: Version id, or None for the published version
+                (falls back to pre-registry artifacts in model_dir)
+
+        Returns:
+            True if a model is now being served
+        """
         try:
-            model_path = os.path.join(self.model_dir, 'final_rf_model.pkl')
-            if not os.path.exists(model_path):
+            # Read before the pointer, so a version published meanwhile is still noticed
+            signature = self.registry.pointer_signature()
+            published = version is None
+            version = version or self.registry.current_version()
+            if version is None:
                 return False
 
-            # Load model
-            self.model = joblib.load(model_path)
-
-            # Load metadata
-            with open(os.path.join(self.model_dir, 'model_metadata.json'), 'r') as f:
-                self.metadata = json.load(f)
+            # The published version is already what CURRENT says
+            self.registry.activate(version, write_pointer=not published)
+            self.prediction_cache.invalidate(f"loaded {version}")
+            self._pointer_signature = signature if published else self.registry.pointer_signature()
+            return True
 
-            # Load feature names
-            with open(os.path.join(self.model_dir, 'feature_names.json'), 'r') as f:
-                self.feature_names = json.load(f)
+        except Exception as e:
+            print(f"[ML-SERVICE ERROR] Failed to load model: {e}")
+            return False
 
-            # Load feature importance
-            with open(os.path.join(self.model_dir, 'feature_importance.json'), 'r') as f:
-                self.feature_importance = json.load(f)
+    def activate_version(self, version):
+        """Serve an existing version (promotion or rollback); raises if it can't be loaded"""
+        version = self.registry.activate(version).version
+        self.prediction_cache.invalidate(f"activated {version}")
+        self._pointer_signature = self.registry.pointer_signature()
+        return version
 
-            # Load categorical mappings if they exist
-            mappings_path = os.path.join(self.model_dir, 'categorical_mappings.json')
-            if os.path.exists(mappings_path):
-                with open(mappings_path, 'r') as f:
-                    self.categorical_mappings = json.load(f)
+    def sync_published_version(self):
+        """
+        Follow versions published by other processes
 
-            # Load value_log scaler if it exists
-            scaler_path = os.path.join(self.model_dir, 'value_log_scaler.json')
-            if os.path.exists(scaler_path):
-                with open(scaler_path, 'r') as f:
-                    self.value_log_scaler = json.load(f)
+        activate_version only swaps the model in the process that called it
+        (e.g. the gunicorn worker that submitted a training job); the others
+        see the CURRENT pointer change. Called per request, this is a clock
+        comparison except every model_sync_seconds, when the pointer is
+        stat'ed. A changed pointer loads the published version on a
+        background thread and swaps it in with one reference assignment;
+        requests keep using the previous model until then.
 
-            self.is_loaded = True
-            return True
+        Returns:
+            True if a switch was started
+        """
+        now = time.monotonic()
+        if now < self._next_sync:
+            return False
+        self._next_sync = now + self.model_sync_seconds
 
-        except Exception as e:
-            print(f"[ML-SERVICE ERROR] Failed to load model: {e}")
+        signature = self.registry.pointer_signature()
+        if signature is None or signature == self._pointer_signature:
             return False
 
-    def get_model_info(self):
+        with self._sync_lock:
+            if self._syncing:
+                return False
+            self._syncing = True
+        threading.Thread(target=self._follow_pointer, args=(signature,), name='model-sync', daemon=True).start()
+        return True
+
+    def _follow_pointer(self, signature):
+        """Serve the version CURRENT points at (background part of sync_published_version)"""
+        try:
+            version = self.registry.current_version()
+            if version is not None and version != self.model_version:
+                # Already published - only swap it in here
+                self.registry.activate(version, write_pointer=False)
+                self.prediction_cache.invalidate(f"published {version}")
+                print(f"[ML-SERVICE] Switched to published model version {version}")
+        except Exception as e:
+            print(f"[ML-SERVICE ERROR] Failed to load published model: {e}")
+        finally:
+            # A version that failed to load isn't retried until the pointer changes again
+            self._pointer_signature = signature
+            with self._sync_lock:
+                self._syncing = False
+
+    def list_models(self):
+        """All registered versions with their training metadata"""
+        active_version = self.model_version
+        cached = {entry['version'] for entry in self.registry.cache_info()['cached_versions']}
+
+        models = []
+        for version in self.registry.list_versions():
+            entry = {
+                'version': version,
+                'active': version == active_version,
+                'loaded': version in cached
+            }
+            metadata_path = os.path.join(self.registry.version_dir(version), 'model_metadata.json')
+            if os.path.exists(metadata_path):
+                with open(metadata_path, 'r') as f:
+                    metadata = json.load(f)
+                entry.update({
+                    'training_date': metadata.get('training_date'),
+                    'n_estimators': metadata.get('n_estimators'),
+                    'metrics': metadata.get('metrics'),
+                    'parent_version': metadata.get('parent_version')
+                })
+            models.append(entry)
+
+        return models
+
+    def get_model_info(self, model_version=None):
         """Get model metadata and performance metrics"""
-        if not self.is_loaded:
-            raise ValueError("Model not loaded")
+        bundle = self.get_bundle(model_version)
+        metadata = bundle.metadata
 
         return {
-            'model_type': self.metadata['model_type'],
-            'training_date': self.metadata['training_date'],
-            'n_estimators': self.metadata['n_estimators'],
-            'n_features': self.metadata['n_features'],
-            'n_samples': self.metadata.get('n_samples', 'unknown'),  # Handle old models
-            'metrics': self.metadata['metrics'],
+            'version': bundle.version,
+            'model_type': metadata['model_type'],
+            'training_date': metadata['training_date'],
+            'n_estimators': metadata['n_estimators'],
+            'n_features': metadata['n_features'],
+            'n_samples': metadata.get('n_samples', 'unknown'),  # Handle old models
+            'metrics': metadata['metrics'],
+            'metrics_source': metadata.get('metrics_source', 'training'),  # Older models re-predicted
+            'parent_version': metadata.get('parent_version'),
+            'lineage': metadata.get('lineage', []),
             'status': 'loaded'
         }
 
-    def get_feature_importance(self, top_n=10):
+    def get_feature_importance(self, top_n=10, model_version=None):
         """Get top N most important features"""
-        if not self.is_loaded:
-            raise ValueError("Model not loaded")
+        return self.get_bundle(model_version).feature_importance[:top_n]
 
-        return self.feature_importance[:top_n]
-
-    def get_feature_metadata(self):
+    def get_feature_metadata(self, model_version=None):
         """Get information about required features"""
-        if not self.is_loaded:
-            raise ValueError("Model not loaded")
+        bundle = self.get_bundle(model_version)
 
         return {
-            'feature_names': self.feature_names,
-            'n_features': len(self.feature_names),
-            'categorical_features': list(self.categorical_mappings.keys()) if self.categorical_mappings else []
+            'feature_names': bundle.feature_names,
+            'n_features': len(bundle.feature_names),
+            'categorical_features': bundle.encoder.columns
         }
 
-    def _calculate_metrics(self, y_true, y_pred):
-        """Calculate regression metrics"""
-        rmse = float(np.sqrt(mean_squared_error(y_true, y_pred)))
-        mae = float(mean_absolute_error(y_true, y_pred))
-        r2 = float(r2_score(y_true, y_pred))
-
-        return {'rmse': rmse, 'mae': mae, 'r2': r2}
+    def get_memory_info(self):
+        """
+        Model load times and memory of this worker process
 
-    def _save_artifacts(self):
-        """Save model and metadata to disk"""
-        # Save model
-        joblib.dump(self.model, os.path.join(self.model_dir, 'final_rf_model.pkl'))
+        rss_shared_bytes counts file-backed pages (the memory-mapped engine
+        arrays), which every worker serving the same version shares.
+        """
+        bundle = self.registry.active
+        info = {'pid': os.getpid()}
+        info.update(_process_memory())
+
+        if bundle is not None:
+            info.update({
+                'model_load_seconds': _round_or_none(bundle.load_seconds),
+                'engine_mmap': bundle.engine_mmap,
+                'sklearn_model_loaded': bundle.model_loaded,
+                'sklearn_load_seconds': _round_or_none(bundle.model_load_seconds)
+            })
+        return info
+
+
+def quantile_label(q):
+    """Column suffix for a quantile: 0.05 -> 'q5', 0.975 -> 'q97.5'"""
+    return f"q{q * 100:g}"
+
+
+def _process_memory():
+    """Resident set size of this process (Linux /proc, else peak RSS from resource)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        memory = {}
+        for key, name in (('VmRSS', 'rss_bytes'), ('RssAnon', 'rss_private_bytes'), ('RssFile', 'rss_shared_bytes')):
+            if key in fields:
+                memory[name] = int(fields[key].split()[0]) * 1024  # reported in kB
+        return memory
+    except OSError:
+        pass
+
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux but bytes on macOS
+        return {'peak_rss_bytes': peak if sys.platform == 'darwin' else peak * 1024}
+    except ImportError:
+        # Windows
+        return {}
+
+
+def _round_or_none(seconds):
+    return round(seconds, 4) if seconds is not None else None
+
+
+def run_training_job(progress, model_dir, train_path, hyperparams=None, training_metrics=False):
+    """
+    Background training job (runs in a JobRunner worker process)
 
-        # Save feature names
-        with open(os.path.join(self.model_dir, 'feature_names.json'), 'w') as f:
-            json.dump(self.feature_names, f, indent=2)
+    Registers the new model as an unpublished version; the serving process
+    activates it when the job completes.
 
-        # Save feature importance
-        with open(os.path.join(self.model_dir, 'feature_importance.json'), 'w') as f:
-            json.dump(self.feature_importance, f, indent=2)
+    Args:
+        progress: JobProgress handle for status updates and cancellation
+        model_dir: Serving model directory (registry root)
+        train_path: Path to train_data.csv (encoded once into the matrix cache,
+            memory-mapped on later runs)
+        hyperparams: Optional dict of hyperparameters
+        training_metrics: Also re-predict the training set (see train_model)
 
-        # Save metadata
-        with open(os.path.join(self.model_dir, 'model_metadata.json'), 'w') as f:
-            json.dump(self.metadata, f, indent=2)
+    Returns:
+        Dict with training results including the new version id
+    """
+    progress.update(phase='loading_data')
+    train_matrix = load_matrix(train_path)
 
-        # Save categorical mappings
-        if self.categorical_mappings:
-            with open(os.path.join(self.model_dir, 'categorical_mappings.json'), 'w') as f:
-                json.dump(self.categorical_mappings, f, indent=2)
+    service = MLService(model_dir)
+    return service.train_model(train_matrix, hyperparams, progress_callback=_report_trees(progress), publish=False,
+                               training_metrics=training_metrics)
 
-        # Save value_log scaler
-        if self.value_log_scaler:
-            with open(os.path.join(self.model_dir, 'value_log_scaler.json'), 'w') as f:
-                json.dump(self.value_log_scaler, f, indent=2)
 
-        print(f"[ML-SERVICE] Model artifacts saved to {self.model_dir}")
+def run_growth_job(progress, model_dir, data_path, n_new_trees=DEFAULT_GROWTH_TREES, base_version=None,
+                   val_path=None, data_source='train_data', remove_data=False):
+    """
+    Background incremental training job (runs in a JobRunner worker process)
+
+    Adds trees to an existing version with warm_start (see grow_model) and
+    registers the result as an unpublished version; the serving process
+    activates it when the job completes.
+
+    Args:
+        progress: JobProgress handle for status updates and cancellation
+        model_dir: Serving model directory (registry root)
+        data_path: Data the new trees are fitted on (train_data.csv or fresh rows)
+        n_new_trees: Number of trees to add
+        base_version: Version to grow (default: the published one)
+        val_path: Optional validation file to compare the parent and the grown model on
+        data_source: Label for the lineage record
+        remove_data: Delete data_path afterwards (an upload saved for this job)
+
+    Returns:
+        Dict with training results including the new and parent version ids
+    """
+    try:
+        service = MLService(model_dir)
+        base_version = base_version or service.registry.current_version()
+        if base_version is None:
+            raise ValueError("No model to grow. Train a model first.")
+
+        # Local split files go through the matrix cache, one-off uploads are just read
+        progress.update(phase='loading_data')
+        base = service.get_bundle(base_version)
+        if remove_data:
+            df_new = read_data_file(data_path)
+        else:
+            df_new = load_matrix(data_path, base.encoder, base.feature_names)
+        df_eval = load_matrix(val_path, base.encoder, base.feature_names) if val_path else None
+
+        return service.grow_model(df_new, n_new_trees, base_version, df_eval, data_source,
+                                  progress_callback=_report_trees(progress), publish=False)
+    finally:
+        if remove_data and os.path.exists(data_path):
+            os.remove(data_path)
+
+
+def _report_trees(progress):
+    """Progress callback for train_model / grow_model that reports to a job and honours cancellation"""
+    def on_trees_built(trees_built, n_estimators):
+        progress.update(
+            phase='fitting',
+            trees_built=trees_built,
+            n_estimators=n_estimators,
+            fraction=trees_built / n_estimators
+        )
+        progress.check_cancelled()
+
+    return on_trees_built
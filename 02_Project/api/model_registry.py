@@ -0,0 +1,503 @@
+"""
+Model Registry
+Versioned model artifacts under ml/outputs/versions/<version>/ with an
+atomically published CURRENT pointer and an LRU cache of loaded versions
+"""
+
+import os
+import json
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from categorical_encoder import CategoricalEncoder
+from forest_engine import CompiledForest
+
+
+# Version name used for artifacts saved directly in ml/outputs before the registry existed
+LEGACY_VERSION = 'legacy'
+
+# Files that make up one trained model (the last three are optional)
+ARTIFACT_FILES = [
+    'final_rf_model.pkl',
+    'feature_names.json',
+    'feature_importance.json',
+    'model_metadata.json',
+    'categorical_encoder.json',
+    'categorical_mappings.json',
+    'value_log_scaler.json'
+]
+
+# Subdirectory holding the compiled engine's node arrays as memory-mappable .npy files
+ENGINE_DIR = 'engine'
+
+# sklearn keeps a 64-byte node struct plus one float64 value per tree node
+SKLEARN_NODE_BYTES = 72
+
+
+class ModelBundle:
+    """
+    Everything needed to score with one model version
+
+    A bundle is built completely before anyone can see it and is never
+    mutated afterwards, so readers holding a reference always get a
+    consistent model / feature names / mappings / scaler combination.
+    """
+
+    def __init__(self, version, model, metadata, feature_names, feature_importance,
+                 encoder=None, value_log_scaler=None, engine=None, model_path=None):
+        """
+        Initialize bundle
+
+        Args:
+            version: Registry version id
+            model: Fitted RandomForestRegressor, or None to load it from
+                model_path on first use
+            metadata: Training metadata dict
+            feature_names: Feature order the model was trained on
+            feature_importance: Sorted feature importance list
+            encoder: CategoricalEncoder for the text columns (None if all numeric)
+            value_log_scaler: Optional {'mean': ..., 'std': ...}
+            engine: Already compiled (usually memory-mapped) CompiledForest;
+                compiled from model when omitted
+            model_path: Pickle to load the sklearn model from lazily
+        """
+        self.version = version
+        self.metadata = metadata
+        self.feature_names = feature_names
+        self.feature_importance = feature_importance
+        self.encoder = encoder or CategoricalEncoder()
+        self.value_log_scaler = value_log_scaler
+
+        self._model = model
+        self._model_path = model_path
+        self._model_lock = threading.Lock()
+
+        self.engine = engine if engine is not None else _compile_engine(model)
+        self.engine_mmap = self.engine is not None and self.engine.mapped
+
+        # Filled in by load() / the first access to .model
+        self.load_seconds = None
+        self.model_load_seconds = None
+
+        # Called with the bundle after the lazy pickle load grows it (set by
+        # the registry caching it, so the memory budget sees the real size)
+        self.on_model_load = None
+
+    @property
+    def model(self):
+        """
+        The sklearn forest
+
+        Bundles loaded from disk serve small batches from the memory-mapped
+        engine, so the pickle (which sklearn always copies into private
+        memory) is only read when a batch actually needs sklearn.
+        """
+        if self._model is None:
+            loaded = False
+            with self._model_lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = _load_pickle(self._model_path)
+                    self.model_load_seconds = time.perf_counter() - started
+                    loaded = True
+                    print(f"[MODEL-REGISTRY] Loaded sklearn model for version {self.version} "
+                          f"in {self.model_load_seconds:.2f}s")
+            if loaded and self.on_model_load is not None:
+                self.on_model_load(self)
+        return self._model
+
+    @property
+    def categorical_mappings(self):
+        """Legacy {column: {category: code}} view of the encoder (None if no text columns)"""
+        return self.encoder.to_mappings() or None
+
+    @property
+    def n_trees(self):
+        """Number of trees (from the engine, so the pickle isn't loaded just to count)"""
+        if self.engine is not None:
+            return self.engine.n_trees
+        return len(self.model.estimators_)
+
+    @property
+    def model_loaded(self):
+        """True once the sklearn forest is in memory"""
+        return self._model is not None
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by this version (sklearn trees if loaded + compiled engine)"""
+        engine_bytes = self.engine.nbytes if self.engine is not None else 0
+        if self._model is None:
+            return engine_bytes
+        n_nodes = sum(estimator.tree_.node_count for estimator in self._model.estimators_)
+        return n_nodes * SKLEARN_NODE_BYTES + engine_bytes
+
+    @classmethod
+    def load(cls, version, version_dir):
+        """
+        Load a bundle from a directory of artifacts
+
+        The engine arrays are memory-mapped when the version has them. Older
+        versions are compiled from the pickle once and their arrays written
+        next to it, so the next process to load them maps the same files.
+
+        Args:
+            version: Version id to label the bundle with
+            version_dir: Directory holding ARTIFACT_FILES
+
+        Returns:
+            ModelBundle
+        """
+        started = time.perf_counter()
+
+        with open(os.path.join(version_dir, 'model_metadata.json'), 'r') as f:
+            metadata = json.load(f)
+
+        with open(os.path.join(version_dir, 'feature_names.json'), 'r') as f:
+            feature_names = json.load(f)
+
+        with open(os.path.join(version_dir, 'feature_importance.json'), 'r') as f:
+            feature_importance = json.load(f)
+
+        encoder = CategoricalEncoder.load(version_dir)
+        value_log_scaler = _load_optional_json(os.path.join(version_dir, 'value_log_scaler.json'))
+
+        model_path = os.path.join(version_dir, 'final_rf_model.pkl')
+        engine_dir = os.path.join(version_dir, ENGINE_DIR)
+        model = None
+        engine = _map_engine(engine_dir)
+
+        if engine is None:
+            model = _load_pickle(model_path)
+            engine = _compile_engine(model)
+            if engine is not None and _write_engine(engine, engine_dir):
+                engine = _map_engine(engine_dir) or engine
+
+        bundle = cls(version, model, metadata, feature_names, feature_importance,
+                     encoder, value_log_scaler, engine=engine, model_path=model_path)
+        bundle.load_seconds = time.perf_counter() - started
+        if model is not None:
+            bundle.model_load_seconds = bundle.load_seconds
+        return bundle
+
+    def save(self, version_dir):
+        """
+        Save all artifacts of this bundle into version_dir
+
+        The model file is written last: a directory only counts as a complete
+        version once final_rf_model.pkl exists.
+        """
+        os.makedirs(version_dir, exist_ok=True)
+
+        with open(os.path.join(version_dir, 'feature_names.json'), 'w') as f:
+            json.dump(self.feature_names, f, indent=2)
+
+        with open(os.path.join(version_dir, 'feature_importance.json'), 'w') as f:
+            json.dump(self.feature_importance, f, indent=2)
+
+        with open(os.path.join(version_dir, 'model_metadata.json'), 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+
+        self.encoder.save(version_dir)
+
+        if self.value_log_scaler:
+            with open(os.path.join(version_dir, 'value_log_scaler.json'), 'w') as f:
+                json.dump(self.value_log_scaler, f, indent=2)
+
+        if self.engine is not None:
+            _write_engine(self.engine, os.path.join(version_dir, ENGINE_DIR))
+
+        import joblib
+        joblib.dump(self.model, os.path.join(version_dir, 'final_rf_model.pkl'))
+
+
+class ModelRegistry:
+    """
+    Versioned model store with a single published version
+
+    Layout:
+        <root>/versions/<version>/   one directory of ARTIFACT_FILES per version
+        <root>/versions/CURRENT      name of the published version
+        <root>/*.pkl, *.json         pre-registry artifacts, served as 'legacy'
+
+    Loaded bundles are kept in an LRU cache bounded by memory_budget_bytes so
+    pinned versions (A/B comparisons) don't reload on every request. The
+    active bundle is never evicted. Activating a version loads it completely
+    first and then publishes it with one reference assignment.
+    """
+
+    def __init__(self, root_dir, memory_budget_bytes=512 * 1024 * 1024):
+        """
+        Initialize registry
+
+        Args:
+            root_dir: Model output directory (ml/outputs)
+            memory_budget_bytes: Upper bound for cached bundles
+        """
+        self.root_dir = root_dir
+        self.versions_dir = os.path.join(root_dir, 'versions')
+        self.memory_budget_bytes = memory_budget_bytes
+
+        self.active = None
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._load_locks = {}
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    # --------------------------------------------------------
+    # Versions on disk
+    # --------------------------------------------------------
+
+    def new_version(self):
+        """
+        Reserve a new version id and its (empty) directory
+
+        Returns:
+            (version, version_dir)
+        """
+        version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        version_dir = os.path.join(self.versions_dir, version)
+        os.makedirs(version_dir)
+        return version, version_dir
+
+    def version_dir(self, version):
+        """Directory holding a version's artifacts (None if it doesn't exist)"""
+        if version == LEGACY_VERSION:
+            path = self.root_dir
+        elif version and version.replace('-', '').isalnum():
+            path = os.path.join(self.versions_dir, version)
+        else:
+            return None
+
+        if os.path.exists(os.path.join(path, 'final_rf_model.pkl')):
+            return path
+        return None
+
+    def list_versions(self):
+        """All complete versions on disk, oldest first"""
+        versions = sorted(
+            name for name in os.listdir(self.versions_dir)
+            if self.version_dir(name) is not None
+        )
+        if self.version_dir(LEGACY_VERSION) is not None:
+            versions.insert(0, LEGACY_VERSION)
+        return versions
+
+    def current_version(self):
+        """Published version id, falling back to legacy artifacts (None if no model)"""
+        pointer = os.path.join(self.versions_dir, 'CURRENT')
+        if os.path.exists(pointer):
+            with open(pointer, 'r') as f:
+                version = f.read().strip()
+            if self.version_dir(version) is not None:
+                return version
+
+        if self.version_dir(LEGACY_VERSION) is not None:
+            return LEGACY_VERSION
+        return None
+
+    def pointer_signature(self):
+        """
+        (mtime_ns, inode) of the CURRENT pointer, None if there is none
+
+        set_current replaces the file, so this changes whenever any process
+        publishes a version; cheaper than reading the pointer on every request.
+        """
+        try:
+            stat = os.stat(os.path.join(self.versions_dir, 'CURRENT'))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def current_dir(self):
+        """Directory of the published version (None if no model)"""
+        version = self.current_version()
+        return self.version_dir(version) if version else None
+
+    def delete_version(self, version):
+        """Remove an unpublished version directory (e.g. after a cancelled job)"""
+        if version == LEGACY_VERSION or (self.active is not None and self.active.version == version):
+            raise ValueError(f"Version {version} is in use and can't be deleted")
+
+        with self._cache_lock:
+            self._cache.pop(version, None)
+        shutil.rmtree(os.path.join(self.versions_dir, version), ignore_errors=True)
+
+    def set_current(self, version):
+        """
+        Point CURRENT at a version (atomic rename so readers never see a partial id)
+
+        Only updates the pointer on disk; other serving processes pick it up
+        through MLService.sync_published_version.
+        """
+        pointer = os.path.join(self.versions_dir, 'CURRENT')
+        tmp_path = f'{pointer}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, pointer)
+
+    # --------------------------------------------------------
+    # Loaded bundles
+    # --------------------------------------------------------
+
+    def get(self, version):
+        """
+        Get a loaded bundle, loading it on a cache miss
+
+        Args:
+            version: Version id
+
+        Returns:
+            ModelBundle
+        """
+        active = self.active
+        if active is not None and active.version == version:
+            return active
+
+        with self._cache_lock:
+            bundle = self._cache.get(version)
+            if bundle is not None:
+                self._cache.move_to_end(version)
+                return bundle
+            load_lock = self._load_locks.setdefault(version, threading.Lock())
+
+        # One loader per version; concurrent requests for it wait here
+        with load_lock:
+            with self._cache_lock:
+                bundle = self._cache.get(version)
+            if bundle is not None:
+                return bundle
+
+            version_dir = self.version_dir(version)
+            if version_dir is None:
+                raise ValueError(f"Model version '{version}' not found")
+
+            bundle = ModelBundle.load(version, version_dir)
+            self.put(bundle)
+            return bundle
+
+    def put(self, bundle):
+        """Add a bundle to the cache and evict least recently used ones over budget"""
+        bundle.on_model_load = self._model_loaded
+        with self._cache_lock:
+            self._cache[bundle.version] = bundle
+            self._cache.move_to_end(bundle.version)
+            self._evict()
+
+    def activate(self, version, write_pointer=True):
+        """
+        Load a version off the serving path, then publish it
+
+        Args:
+            version: Version id to serve by default
+            write_pointer: Also point CURRENT at it (False when following a
+                version another process already published)
+
+        Returns:
+            The now active ModelBundle
+        """
+        bundle = self.get(version)
+        self.publish(bundle, write_pointer)
+        return bundle
+
+    def publish(self, bundle, write_pointer=True):
+        """Make an already loaded bundle the default with a single reference swap"""
+        self.put(bundle)
+        if write_pointer and bundle.version != LEGACY_VERSION:
+            self.set_current(bundle.version)
+        self.active = bundle
+        print(f"[MODEL-REGISTRY] Serving model version {bundle.version}")
+
+    def cache_info(self):
+        """Loaded versions and their memory use"""
+        with self._cache_lock:
+            cached = [{'version': v, 'nbytes': b.nbytes} for v, b in self._cache.items()]
+        return {
+            'cached_versions': cached,
+            'cached_bytes': sum(entry['nbytes'] for entry in cached),
+            'memory_budget_bytes': self.memory_budget_bytes
+        }
+
+    def _model_loaded(self, bundle):
+        """Re-check the budget once a cached bundle has loaded its sklearn pickle"""
+        with self._cache_lock:
+            if self._cache.get(bundle.version) is bundle:
+                self._cache.move_to_end(bundle.version)
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used bundles until the cache fits the budget (caller holds lock)"""
+        total = sum(bundle.nbytes for bundle in self._cache.values())
+        for version in list(self._cache):
+            if total <= self.memory_budget_bytes:
+                break
+            if self.active is not None and version == self.active.version:
+                continue
+            total -= self._cache.pop(version).nbytes
+            print(f"[MODEL-REGISTRY] Evicted model version {version} from memory")
+
+
+def _load_pickle(model_path):
+    """
+    Unpickle a sklearn forest
+
+    joblib (and through the pickle, scikit-learn) is imported here rather than
+    at module load: workers that only serve from the memory-mapped engine
+    never pay for either.
+    """
+    import joblib
+    return joblib.load(model_path)
+
+
+def _compile_engine(model):
+    """Flatten a forest into the array-compiled inference engine (None if it can't be)"""
+    try:
+        engine = CompiledForest.from_sklearn(model)
+        print(f"[MODEL-REGISTRY] Compiled {engine.n_trees} trees for inference "
+              f"({engine.nbytes / 1e6:.1f} MB, max depth {engine.max_depth})")
+        return engine
+    except Exception as e:
+        print(f"[MODEL-REGISTRY WARNING] Could not compile forest, using sklearn predict: {e}")
+        return None
+
+
+def _map_engine(engine_dir):
+    """Memory-map saved engine arrays (None if there are none or they can't be read)"""
+    if not os.path.exists(os.path.join(engine_dir, 'engine.json')):
+        return None
+    try:
+        return CompiledForest.load(engine_dir, mmap_mode='r')
+    except Exception as e:
+        print(f"[MODEL-REGISTRY WARNING] Could not map engine arrays in {engine_dir}: {e}")
+        return None
+
+
+def _write_engine(engine, engine_dir):
+    """
+    Save engine arrays into engine_dir, all at once or not at all
+
+    The arrays go to a private temp directory that is renamed into place, so a
+    concurrent loader never maps half-written files. Losing the race to
+    another process (or a read-only model dir) is fine - returns False.
+    """
+    tmp_dir = f'{engine_dir}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        engine.save(tmp_dir)
+        os.rename(tmp_dir, engine_dir)
+        return True
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return os.path.exists(os.path.join(engine_dir, 'engine.json'))
+
+
+def _load_optional_json(path):
+    """Load a JSON file if it exists"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,243 @@
+"""
+Prediction Cache
+Memory-bounded LRU cache for predictions so dashboards that re-score the
+same rows or files don't run the forest again
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Estimated bookkeeping per row entry on top of the row bytes
+# (key tuple, bytes and float objects, OrderedDict node)
+ROW_ENTRY_OVERHEAD_BYTES = 250
+
+# Batches with more unique rows than this skip the row cache: they would
+# mostly evict each other, and the whole-file cache covers repeated uploads
+ROW_CACHE_MAX_BATCH_ROWS = 50000
+
+# Bytes read at a time when hashing a file
+DIGEST_CHUNK_BYTES = 1024 * 1024
+
+
+class PredictionCache:
+    """
+    LRU cache of predictions bounded by an estimated memory size
+
+    Two kinds of entries share one budget:
+      rows  - (model version, encoded feature row) -> scaled prediction
+      files - (model version, content digest) -> a caller's whole-file result
+
+    Row entries are keyed by the raw bytes of the encoded feature row, so
+    the dict's hash finds them and a hash collision can never return another
+    row's prediction. Model versions are immutable, but artifacts can be
+    replaced on disk (legacy layout, reload after a script run), so the owner
+    calls invalidate() whenever the served model changes.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Initialize cache
+
+        Args:
+            max_bytes: Memory budget for all entries (0 disables caching)
+        """
+        self.max_bytes = int(max_bytes)
+
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'row_hits': 0,
+            'row_misses': 0,
+            'row_bypassed': 0,
+            'file_hits': 0,
+            'file_misses': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    # --------------------------------------------------------
+    # Rows
+    # --------------------------------------------------------
+
+    def lookup_rows(self, version, X):
+        """
+        Look up cached predictions for the rows of a feature matrix
+
+        Args:
+            version: Model version the rows are scored with
+            X: 2-D array or DataFrame of encoded features
+
+        Returns:
+            (keys, predictions, missing): row keys to pass to store_rows,
+            a float array with the cached predictions (NaN where missing) and
+            the indices of the rows that still need scoring; keys is None when
+            the batch bypasses the cache
+        """
+        n_rows = len(X)
+        if not self.enabled or n_rows > ROW_CACHE_MAX_BATCH_ROWS:
+            with self._lock:
+                self._stats['row_bypassed'] += n_rows
+            return None, np.full(n_rows, np.nan), np.arange(n_rows)
+
+        keys = _row_keys(X)
+        predictions = np.full(n_rows, np.nan)
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get((version, key))
+                if entry is not None:
+                    self._entries.move_to_end((version, key))
+                    predictions[i] = entry[0]
+            missing = np.flatnonzero(np.isnan(predictions))
+            self._stats['row_hits'] += n_rows - len(missing)
+            self._stats['row_misses'] += len(missing)
+
+        return keys, predictions, missing
+
+    def store_rows(self, version, keys, predictions):
+        """
+        Cache freshly scored rows
+
+        Args:
+            version: Model version the rows were scored with
+            keys: Row keys from lookup_rows (the scored subset)
+            predictions: Their predictions
+        """
+        if keys is None:
+            return
+
+        with self._lock:
+            for key, value in zip(keys, predictions.tolist()):
+                self._put((version, key), value, len(key) + ROW_ENTRY_OVERHEAD_BYTES)
+            self._evict()
+
+    # --------------------------------------------------------
+    # Whole files
+    # --------------------------------------------------------
+
+    def get_file(self, version, digest):
+        """Cached result for a file digest (None on a miss)"""
+        with self._lock:
+            entry = self._entries.get(('file', version, digest))
+            if entry is None:
+                self._stats['file_misses'] += 1
+                return None
+
+            self._entries.move_to_end(('file', version, digest))
+            self._stats['file_hits'] += 1
+            return entry[0]
+
+    def put_file(self, version, digest, value, nbytes):
+        """
+        Cache a whole-file result
+
+        Args:
+            version: Model version the file was scored with
+            digest: content_digest of the file and the options that shaped the result
+            value: Result to return on later hits (treated as read-only)
+            nbytes: Estimated memory use of value; results bigger than the
+                whole budget are not cached
+        """
+        if not self.enabled or nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            self._put(('file', version, digest), value, int(nbytes))
+            self._evict()
+
+    # --------------------------------------------------------
+    # Maintenance
+    # --------------------------------------------------------
+
+    def invalidate(self, reason=None):
+        """Drop every entry (the served model changed)"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._nbytes = 0
+            self._stats['invalidations'] += 1
+
+        if dropped:
+            print(f"[PREDICTION-CACHE] Dropped {dropped} entries" + (f" ({reason})" if reason else ""))
+
+    def get_stats(self):
+        """Hit / miss counters and memory use"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['file_entries'] = sum(1 for key in self._entries if key[0] == 'file')
+            stats['nbytes'] = self._nbytes
+
+        row_lookups = stats['row_hits'] + stats['row_misses']
+        file_lookups = stats['file_hits'] + stats['file_misses']
+        stats.update({
+            'enabled': self.enabled,
+            'max_bytes': self.max_bytes,
+            'row_hit_rate': round(stats['row_hits'] / row_lookups, 4) if row_lookups else None,
+            'file_hit_rate': round(stats['file_hits'] / file_lookups, 4) if file_lookups else None
+        })
+        return stats
+
+    def _put(self, key, value, nbytes):
+        """Insert or refresh one entry (caller holds lock)"""
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._nbytes -= previous[1]
+        self._entries[key] = (value, nbytes)
+        self._nbytes += nbytes
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits the budget (caller holds lock)"""
+        while self._nbytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._nbytes -= nbytes
+            self._stats['evictions'] += 1
+
+
+def content_digest(source, *options):
+    """
+    SHA-256 of a file's bytes plus the request options that shape its result
+
+    Args:
+        source: Path or seekable binary stream (read from its current
+            position, which is restored afterwards)
+        *options: Values mixed into the digest (e.g. endpoint name, quantiles)
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256(repr(options).encode())
+
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            _update_digest(digest, f)
+    else:
+        position = source.tell()
+        _update_digest(digest, source)
+        source.seek(position)
+
+    return digest.hexdigest()
+
+
+def _update_digest(digest, stream):
+    for chunk in iter(lambda: stream.read(DIGEST_CHUNK_BYTES), b''):
+        digest.update(chunk)
+
+
+def _row_keys(X):
+    """Raw bytes of every row of a feature matrix"""
+    values = np.ascontiguousarray(X.to_numpy() if hasattr(X, 'to_numpy') else X)
+    return values.view(np.dtype((np.void, values.dtype.itemsize * values.shape[1]))).ravel().tolist()
+
+
+def frame_nbytes(df):
+    """Memory use of a DataFrame including its text values, for put_file"""
+    return int(df.memory_usage(index=True, deep=True).sum())
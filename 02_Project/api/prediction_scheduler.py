@@ -0,0 +1,237 @@
+"""
+Micro-Batching Prediction Scheduler
+Coalesces rows from concurrent requests into one vectorized predict call
+instead of every request fighting over the cores on its own
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+# A caller whose batch hasn't been scored after this many seconds (the
+# batching thread died or is stuck) scores its rows itself
+DEFAULT_WAIT_TIMEOUT_S = 5.0
+
+
+class _PendingRequest:
+    """Rows from one caller waiting for a batch slot"""
+
+    def __init__(self, X, context):
+        self.X = X
+        self.context = context
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Set by a caller that gave up waiting; the batching thread skips it
+        self.abandoned = False
+
+
+class MicroBatchScheduler:
+    """
+    Request-coalescing scheduler
+
+    A single background thread waits for the first pending request, then keeps
+    collecting requests for up to window_ms or until max_batch_rows rows are
+    queued. The window is skipped when no other caller is waiting, so a
+    single client never pays for it. Requests that share a context (the model snapshot they were encoded
+    for) are stacked into one matrix, scored with one predict_fn call and the
+    results are scattered back to the waiting callers.
+
+    Requests with max_batch_rows rows or more gain nothing from coalescing and
+    are scored directly on the caller's thread, as are requests that waited
+    longer than wait_timeout_s.
+
+    The thread belongs to the process that started it: after a fork (e.g.
+    gunicorn preloading the app) or if it died, the next request starts a
+    new one.
+    """
+
+    def __init__(self, predict_fn, window_ms=2.0, max_batch_rows=4096, wait_timeout_s=DEFAULT_WAIT_TIMEOUT_S):
+        """
+        Initialize scheduler
+
+        Args:
+            predict_fn: Callable(context, X) -> predictions for a stacked batch
+            window_ms: How long to wait for more requests after the first one
+            max_batch_rows: Row limit for one coalesced batch
+            wait_timeout_s: How long a caller waits for its batch before
+                scoring its rows itself
+        """
+        self.predict_fn = predict_fn
+        self.window_ms = float(window_ms)
+        self.max_batch_rows = int(max_batch_rows)
+        self.wait_timeout_s = float(wait_timeout_s)
+
+        self._queue = queue.Queue()
+        self._carry = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # Callers inside submit() waiting for a batch
+        self._waiting = 0
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'bypassed_requests': 0,
+            'timed_out_requests': 0,
+            'thread_restarts': 0,
+            'immediate_batches': 0,
+            'batches': 0,
+            'rows': 0,
+            'max_batch_rows_seen': 0,
+            'max_batch_requests_seen': 0,
+            'total_wait_ms': 0.0
+        }
+
+    def submit(self, X, context):
+        """
+        Score rows, coalescing them with other callers when possible
+
+        Args:
+            X: float array (n_rows, n_features)
+            context: Hashable object passed back to predict_fn; only requests
+                with equal contexts are batched together
+
+        Returns:
+            Array of predictions for X
+        """
+        if len(X) == 0 or len(X) >= self.max_batch_rows:
+            with self._stats_lock:
+                self._stats['bypassed_requests'] += 1
+            return self.predict_fn(context, X)
+
+        self._ensure_worker()
+
+        pending = _PendingRequest(X, context)
+        with self._stats_lock:
+            self._waiting += 1
+        try:
+            self._queue.put(pending)
+            finished = pending.done.wait(self.wait_timeout_s)
+        finally:
+            with self._stats_lock:
+                self._waiting -= 1
+
+        if not finished:
+            pending.abandoned = True
+            with self._stats_lock:
+                self._stats['timed_out_requests'] += 1
+            print(f"[BATCHING WARNING] No batch result after {self.wait_timeout_s}s, scoring {len(X)} row(s) directly")
+            return self.predict_fn(context, X)
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def get_stats(self):
+        """Queue depth and batch-size statistics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        batches = stats['batches']
+        stats['queue_depth'] = self._queue.qsize() + (1 if self._carry is not None else 0)
+        stats['avg_batch_rows'] = stats['rows'] / batches if batches else 0.0
+        stats['avg_batch_requests'] = stats['requests'] / batches if batches else 0.0
+        stats['avg_wait_ms'] = stats['total_wait_ms'] / stats['requests'] if stats['requests'] else 0.0
+        stats['window_ms'] = self.window_ms
+        stats['max_batch_rows'] = self.max_batch_rows
+        return stats
+
+    def _ensure_worker(self):
+        """Start the batching thread on first use, after a fork, or if it died"""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Forked child: the parent's queued requests belong to callers that don't exist here
+                self._queue = queue.Queue()
+                self._carry = None
+            elif self._thread is not None:
+                print("[BATCHING WARNING] Batching thread stopped, starting a new one")
+                with self._stats_lock:
+                    self._stats['thread_restarts'] += 1
+
+            self._thread = threading.Thread(target=self._run, name='prediction-batcher', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _next_request(self, timeout):
+        """Take the carried-over request first, then the queue"""
+        if self._carry is not None:
+            pending, self._carry = self._carry, None
+            return pending
+        return self._queue.get(timeout=timeout)
+
+    def _run(self):
+        """Batching loop: collect, score, scatter"""
+        while True:
+            batch = [self._next_request(timeout=None)]
+            n_rows = len(batch[0].X)
+            deadline = time.perf_counter() + self.window_ms / 1000
+
+            with self._stats_lock:
+                alone = self._waiting <= 1
+            if alone and self._queue.empty():
+                # Nobody to coalesce with - don't make the only caller wait
+                deadline = 0.0
+                with self._stats_lock:
+                    self._stats['immediate_batches'] += 1
+
+            while n_rows < self.max_batch_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = self._next_request(timeout=remaining)
+                except queue.Empty:
+                    break
+                if n_rows + len(pending.X) > self.max_batch_rows:
+                    # Doesn't fit - it opens the next batch instead
+                    self._carry = pending
+                    break
+                batch.append(pending)
+                n_rows += len(pending.X)
+
+            self._score_batch(batch, n_rows)
+
+    def _score_batch(self, batch, n_rows):
+        """Group a batch by context, predict each group once and hand results back"""
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._stats['requests'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['rows'] += n_rows
+            self._stats['max_batch_rows_seen'] = max(self._stats['max_batch_rows_seen'], n_rows)
+            self._stats['max_batch_requests_seen'] = max(self._stats['max_batch_requests_seen'], len(batch))
+            self._stats['total_wait_ms'] += sum((started - p.enqueued_at) * 1000 for p in batch)
+
+        groups = {}
+        for pending in batch:
+            if not pending.abandoned:
+                groups.setdefault(pending.context, []).append(pending)
+
+        for context, members in groups.items():
+            try:
+                X = members[0].X if len(members) == 1 else np.concatenate([p.X for p in members])
+                predictions = self.predict_fn(context, X)
+
+                start = 0
+                for pending in members:
+                    stop = start + len(pending.X)
+                    pending.result = predictions[start:stop]
+                    start = stop
+            except Exception as e:
+                for pending in members:
+                    pending.error = e
+            finally:
+                for pending in members:
+                    pending.done.set()
@@ -0,0 +1,90 @@
+"""
+Row Deduplication
+Finds identical rows in an encoded feature matrix so every distinct row is
+scored once and its prediction is scattered back to all of its copies
+"""
+
+import numpy as np
+
+
+# Smaller batches are scored as they are (hashing would cost more than it saves)
+MIN_DEDUP_ROWS = 64
+
+# Rows hashed at a time, so the column-by-column passes stay in cache
+HASH_BLOCK_ROWS = 16384
+
+# 64-bit FNV-1a parameters (applied per column word instead of per byte)
+FNV_OFFSET = np.uint64(14695981039346656037)
+FNV_PRIME = np.uint64(1099511628211)
+
+
+def unique_rows(X):
+    """
+    Collapse identical rows of a feature matrix
+
+    Every row's column words are hashed into one uint64 key (FNV-1a over
+    the raw bits), keys are grouped with a hash table and each row is then
+    checked bit for bit against its group's representative, so a hash
+    collision can never merge two different rows (if it would, the rows are
+    grouped with an exact byte-wise np.unique instead).
+
+    Rows match bit for bit: NaN matches NaN, 0.0 and -0.0 are kept apart.
+
+    Args:
+        X: 2-D array or DataFrame (n_rows, n_features), e.g.
+            CategoricalEncoder.encode output
+
+    Returns:
+        (X_unique, inverse) with X_unique (same type as X) taken at inverse
+        equal to X, or (X, None) when the batch is small or has no duplicate rows
+    """
+    n_rows = len(X)
+    if n_rows < MIN_DEDUP_ROWS:
+        return X, None
+
+    values = np.ascontiguousarray(X.to_numpy() if hasattr(X, 'to_numpy') else X)
+    words = values.view(f'u{values.dtype.itemsize}')
+
+    import pandas as pd
+    inverse, keys = pd.factorize(_row_hashes(words))
+    if len(keys) == n_rows:
+        return X, None
+
+    # Any member can represent its group once all members are verified equal to it
+    representatives = np.empty(len(keys), dtype=np.int64)
+    representatives[inverse] = np.arange(n_rows)
+
+    if not np.array_equal(words[representatives][inverse], words):
+        row_bytes = values.view(np.dtype((np.void, values.dtype.itemsize * values.shape[1]))).ravel()
+        _, representatives, inverse = np.unique(row_bytes, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        if len(representatives) == n_rows:
+            return X, None
+
+    if hasattr(X, 'iloc'):
+        return X.iloc[representatives], inverse
+    return values[representatives], inverse
+
+
+def dedup_stats(n_rows, n_unique):
+    """Row counts for API responses; dedup_ratio = rows / unique rows (1.0 means no duplicates)"""
+    return {
+        'rows': int(n_rows),
+        'unique_rows': int(n_unique),
+        'dedup_ratio': round(n_rows / n_unique, 4) if n_unique else 1.0
+    }
+
+
+def _row_hashes(words):
+    """FNV-1a hash of every row of an unsigned integer view, HASH_BLOCK_ROWS rows at a time"""
+    hashes = np.empty(len(words), dtype=np.uint64)
+
+    for start in range(0, len(words), HASH_BLOCK_ROWS):
+        block = words[start:start + HASH_BLOCK_ROWS]
+        h = np.full(len(block), FNV_OFFSET, dtype=np.uint64)
+        for j in range(block.shape[1]):
+            h ^= block[:, j]
+            h *= FNV_PRIME
+        hashes[start:start + len(block)] = h
+
+    return hashes
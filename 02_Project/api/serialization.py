@@ -0,0 +1,151 @@
+"""
+JSON Serialization
+Fast JSON for API responses: a Flask JSON provider that understands NumPy /
+pandas values, and DataFrame encoders that write prediction tables straight
+from column arrays instead of building a dict per row
+"""
+
+import json
+from datetime import date, datetime
+
+import numpy as np
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+# orjson encodes NumPy arrays natively; without it the stdlib / pandas encoders are used
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+
+# Table layouts a client can ask for with ?orient=
+#   records - [{"col": value, ...}, ...] (one object per row, the default)
+#   columns - {"columns": ["col", ...], "data": [[col values], ...]} (one array per column)
+ORIENTS = ('records', 'columns')
+
+# Flask sorts keys by default; keep responses identical to the stdlib provider
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS) if HAS_ORJSON else 0
+
+
+def to_jsonable(obj):
+    """Fallback for values json/orjson can't encode themselves"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return None if np.isnan(obj) else float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        # pd.Timestamp is a datetime subclass
+        return obj.isoformat()
+
+    # pd.NA / NaT (pandas is necessarily loaded by the time one of those exists)
+    import pandas as pd
+    if pd.api.types.is_scalar(obj) and pd.isna(obj):
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider for NumPy / pandas values
+
+    Flask 3 ignores app.json_encoder, so NumPy scalars used to fail or fall
+    through to slow paths; this provider is installed as app.json instead.
+    Encodes with orjson when it is installed (NaN becomes null).
+    """
+
+    default = staticmethod(to_jsonable)
+
+    def dumps(self, obj, **kwargs):
+        if HAS_ORJSON and not kwargs:
+            return dumps_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not HAS_ORJSON or self._app.debug:
+            # Keep the stdlib's indented output in debug mode
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def dumps_bytes(obj):
+    """Encode any response value (dicts, lists, NumPy values) as UTF-8 JSON"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=to_jsonable, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=to_jsonable, sort_keys=True).encode()
+
+
+def encode_dataframe(df, orient='records'):
+    """
+    Encode a DataFrame as JSON
+
+    Args:
+        df: DataFrame to encode (index is dropped)
+        orient: 'records' or 'columns' (see ORIENTS)
+
+    Returns:
+        UTF-8 JSON bytes; missing values become null
+    """
+    if orient not in ORIENTS:
+        raise ValueError(f"orient must be one of {', '.join(ORIENTS)}")
+
+    if orient == 'columns':
+        return _encode_columns(df)
+
+    if HAS_ORJSON:
+        return orjson.dumps(df.to_dict('records'), default=to_jsonable, option=ORJSON_OPTIONS)
+    return df.to_json(orient='records', double_precision=15).encode()
+
+
+def json_response(payload, tables=None, orient='records', status=200):
+    """
+    Build a JSON response with pre-encoded tables spliced in
+
+    Args:
+        payload: Dict of small response fields
+        tables: {key: DataFrame} encoded with encode_dataframe(orient)
+        orient: Table layout for every entry in tables
+        status: HTTP status code
+
+    Returns:
+        Flask Response
+    """
+    body = dumps_bytes(payload)
+    if tables:
+        # payload always encodes as an object, so splice the tables in before its closing brace
+        parts = [body[:-1]]
+        separator = b',' if payload else b''
+        for key, df in tables.items():
+            parts.append(separator + dumps_bytes(key) + b':' + encode_dataframe(df, orient))
+            separator = b','
+        parts.append(b'}')
+        body = b''.join(parts)
+
+    return current_app.response_class(body + b'\n', status=status, mimetype='application/json')
+
+
+def _encode_columns(df):
+    """Columnar layout: numeric columns go to the encoder as raw arrays"""
+    columns = [str(col) for col in df.columns]
+
+    if not HAS_ORJSON:
+        data = b','.join(df[col].to_json(orient='values', double_precision=15).encode() for col in df.columns)
+        return b'{"columns":' + dumps_bytes(columns) + b',"data":[' + data + b']}'
+
+    data = []
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if values.dtype.kind in 'biu' or (values.dtype.kind == 'f' and values.dtype.itemsize >= 4):
+            data.append(np.ascontiguousarray(values))
+        else:
+            # Text, nullable and other columns go through Python objects
+            data.append(values.tolist())
+
+    return orjson.dumps({'columns': columns, 'data': data}, default=to_jsonable, option=orjson.OPT_SERIALIZE_NUMPY)
@@ -0,0 +1,396 @@
+"""
+Sharded Training
+Builds one Random Forest in slices across processes (or machines sharing a
+directory) and merges the partial forests into a single RandomForestRegressor
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from matrix_cache import load_matrix
+from prediction_cache import content_digest
+
+
+PLAN_FILE = 'plan.json'
+TARGET_COLUMN = 'value_log_scaled'
+
+# Hyperparameters every shard must share for the slices to form one forest
+SHARED_PARAMS = ('max_features', 'min_samples_leaf', 'max_depth', 'bootstrap', 'max_samples', 'criterion')
+
+# Seconds between checks for finished shards while waiting
+POLL_SECONDS = 1.0
+
+# A worker touches its claim file this often while it builds the shard, so
+# the claim's mtime tells others it is still alive; stale_after must be
+# several times longer
+HEARTBEAT_SECONDS = 10.0
+
+
+def shard_seeds(seed, n_shards):
+    """Independent per-shard random states derived from one seed (numpy SeedSequence)"""
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(n_shards)]
+
+
+def split_trees(n_estimators, n_shards):
+    """Trees per shard, as even as possible (the first shards get the remainder)"""
+    base, extra = divmod(n_estimators, n_shards)
+    return [base + (i < extra) for i in range(n_shards)]
+
+
+def create_plan(shard_dir, train_path, hyperparams, n_shards, seed=123):
+    """
+    Write the plan workers pick shards from
+
+    Args:
+        shard_dir: Directory shared by all workers (created if missing)
+        train_path: Training data every worker reads (same path on every node)
+        hyperparams: RandomForestRegressor parameters; n_estimators is the
+            total over all shards, random_state and n_jobs are set per shard
+        n_shards: Number of partial forests
+        seed: Seed the per-shard random states are derived from
+
+    Returns:
+        Plan dict
+    """
+    n_estimators = int(hyperparams.get('n_estimators', 100))
+    if not 1 <= n_shards <= n_estimators:
+        raise ValueError(f"n_shards must be between 1 and n_estimators ({n_estimators})")
+
+    os.makedirs(shard_dir, exist_ok=True)
+    if os.path.exists(os.path.join(shard_dir, PLAN_FILE)):
+        raise ValueError(f"{shard_dir} already holds a plan")
+
+    params = {k: v for k, v in hyperparams.items() if k not in ('n_estimators', 'random_state', 'n_jobs', 'oob_score', 'verbose')}
+    plan = {
+        'created_at': datetime.now().isoformat(),
+        'train_path': os.path.abspath(train_path),
+        'data_digest': content_digest(train_path),
+        'hyperparams': params,
+        'n_estimators': n_estimators,
+        'seed': seed,
+        'shards': [
+            {'index': i, 'n_estimators': trees, 'random_state': shard_seed}
+            for i, (trees, shard_seed) in enumerate(zip(split_trees(n_estimators, n_shards), shard_seeds(seed, n_shards)))
+        ]
+    }
+    _write_json(os.path.join(shard_dir, PLAN_FILE), plan)
+    return plan
+
+
+def load_plan(shard_dir):
+    with open(os.path.join(shard_dir, PLAN_FILE), 'r') as f:
+        return json.load(f)
+
+
+def run_worker(shard_dir, n_jobs=1, stale_after=None):
+    """
+    Claim and build shards until none are left
+
+    Shards are claimed by creating shard-<i>.claim exclusively, so any
+    number of processes on any machine that sees shard_dir can run this
+    concurrently without building a shard twice. The claim is touched every
+    HEARTBEAT_SECONDS while the shard builds.
+
+    Args:
+        shard_dir: Directory with the plan
+        n_jobs: Threads per shard fit
+        stale_after: Take over claims not touched for this many seconds
+            whose shard never finished (a crashed worker); None never takes over
+
+    Returns:
+        Indices of the shards this worker built
+    """
+    _check_stale_after(stale_after)
+    plan = load_plan(shard_dir)
+    built = []
+    for shard in plan['shards']:
+        if _claim(shard_dir, shard['index'], stale_after):
+            _build_claimed(shard_dir, plan, shard, n_jobs)
+            built.append(shard['index'])
+    return built
+
+
+def build_shard(shard_dir, plan, shard, n_jobs=1):
+    """
+    Fit one partial forest and write it with its out-of-bag sums
+
+    OOB predictions are kept as per-row sums and tree counts (from
+    estimators_samples_) rather than sklearn's averages, so merging shards
+    gives exactly the OOB prediction of the merged forest.
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    X, y, _, _ = load_plan_matrix(plan)
+
+    start = time.perf_counter()
+    model = RandomForestRegressor(**plan['hyperparams'], n_estimators=shard['n_estimators'],
+                                  random_state=shard['random_state'], n_jobs=n_jobs)
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+
+    oob_sum = np.zeros(len(y))
+    oob_count = np.zeros(len(y), dtype=np.int64)
+    if model.bootstrap:
+        # The individual trees were fitted on the validated array, without feature names
+        X_values = X.to_numpy()
+        for tree, samples in zip(model.estimators_, model.estimators_samples_):
+            unsampled = np.ones(len(y), dtype=bool)
+            unsampled[samples] = False
+            oob_sum[unsampled] += tree.predict(X_values[unsampled])
+            oob_count[unsampled] += 1
+
+    name = _shard_name(shard['index'])
+    _atomic_write(os.path.join(shard_dir, f'{name}.pkl'), lambda path: joblib.dump(model, path))
+    _atomic_write(os.path.join(shard_dir, f'{name}-oob.npz'),
+                  lambda path: np.savez(path, oob_sum=oob_sum, oob_count=oob_count), suffix='.npz')
+
+    # The done marker is written last: a shard counts as finished once it exists
+    _write_json(os.path.join(shard_dir, f'{name}.json'), {
+        'index': shard['index'],
+        'n_estimators': shard['n_estimators'],
+        'random_state': shard['random_state'],
+        'fit_seconds': round(fit_seconds, 3),
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'finished_at': datetime.now().isoformat()
+    })
+    print(f"[SHARDED-TRAINING] Shard {shard['index']}: {shard['n_estimators']} trees in {fit_seconds:.1f}s "
+          f"on {socket.gethostname()} (pid {os.getpid()})")
+
+
+def shard_status(shard_dir):
+    """{'done': [...], 'claimed': [...], 'pending': [...]} shard indices"""
+    status = {'done': [], 'claimed': [], 'pending': []}
+    for shard in load_plan(shard_dir)['shards']:
+        name = _shard_name(shard['index'])
+        if os.path.exists(os.path.join(shard_dir, f'{name}.json')):
+            status['done'].append(shard['index'])
+        elif os.path.exists(os.path.join(shard_dir, f'{name}.claim')):
+            status['claimed'].append(shard['index'])
+        else:
+            status['pending'].append(shard['index'])
+    return status
+
+
+def wait_for_shards(shard_dir, timeout=None, stale_after=None, n_jobs=1):
+    """
+    Block until every shard has finished
+
+    Args:
+        shard_dir: Directory with the plan
+        timeout: Raise TimeoutError after this many seconds (None waits as
+            long as the workers keep their claims alive)
+        stale_after: Take over and build here any claim that hasn't been
+            touched for this many seconds (its worker crashed); None leaves
+            stale claims to other workers
+        n_jobs: Threads per shard fit for taken-over shards
+    """
+    _check_stale_after(stale_after)
+    plan = load_plan(shard_dir)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        status = shard_status(shard_dir)
+        if not status['claimed'] and not status['pending']:
+            return
+
+        if stale_after is not None:
+            for index in status['claimed']:
+                if _claim(shard_dir, index, stale_after):
+                    _build_claimed(shard_dir, plan, plan['shards'][index], n_jobs)
+
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Shards not finished after {timeout}s: {status}")
+        time.sleep(POLL_SECONDS)
+
+
+def merge_shards(shard_dir):
+    """
+    Concatenate the shards' estimators_ into one RandomForestRegressor
+
+    Args:
+        shard_dir: Directory where every shard of the plan has finished
+
+    Returns:
+        (model, oob_prediction): the merged forest (n_estimators is the
+        total, random_state the plan's seed; feature_importances_ and predict
+        work as for a single fit) and the OOB prediction per training row
+        (NaN for rows that were in every bootstrap sample)
+    """
+    import joblib
+
+    plan = load_plan(shard_dir)
+    status = shard_status(shard_dir)
+    if status['claimed'] or status['pending']:
+        raise ValueError(f"Not all shards have finished: {status}")
+
+    model = None
+    oob_sum = oob_count = None
+    for shard in plan['shards']:
+        name = _shard_name(shard['index'])
+        partial = joblib.load(os.path.join(shard_dir, f'{name}.pkl'))
+        oob = np.load(os.path.join(shard_dir, f'{name}-oob.npz'))
+
+        if model is None:
+            model = partial
+            model.estimators_ = list(partial.estimators_)
+            oob_sum, oob_count = oob['oob_sum'].copy(), oob['oob_count'].copy()
+            continue
+
+        for param in SHARED_PARAMS:
+            if getattr(partial, param, None) != getattr(model, param, None):
+                raise ValueError(f"Shard {shard['index']} was fitted with a different {param}")
+        if partial.n_features_in_ != model.n_features_in_:
+            raise ValueError(f"Shard {shard['index']} was fitted on {partial.n_features_in_} features")
+
+        model.estimators_.extend(partial.estimators_)
+        oob_sum += oob['oob_sum']
+        oob_count += oob['oob_count']
+
+    model.n_estimators = len(model.estimators_)
+    model.random_state = plan['seed']
+    model.n_jobs = -1
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        oob_prediction = np.where(oob_count > 0, oob_sum / np.maximum(oob_count, 1), np.nan)
+    return model, oob_prediction
+
+
+def train_sharded(train_path, shard_dir, hyperparams, n_shards, workers, seed=123, n_jobs=None,
+                  timeout=None, stale_after=None):
+    """
+    Plan, build with local worker processes, wait and merge
+
+    workers=0 only writes the plan and waits for workers started elsewhere
+    (ml/train_model.py --worker <shard_dir> on each node).
+
+    Args:
+        n_jobs: Threads per shard fit (default: the CPUs split across workers)
+        timeout, stale_after: As for wait_for_shards; with stale_after the
+            shards of crashed workers are rebuilt here
+
+    Returns:
+        (model, oob_prediction) from merge_shards
+    """
+    create_plan(shard_dir, train_path, hyperparams, n_shards, seed)
+
+    n_jobs = n_jobs or max(1, (os.cpu_count() or 1) // max(workers or 1, 1))
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(run_worker, shard_dir, n_jobs, stale_after) for _ in range(workers)]:
+                future.result()
+
+    wait_for_shards(shard_dir, timeout, stale_after, n_jobs)
+    return merge_shards(shard_dir)
+
+
+def load_training_matrix(train_path):
+    """
+    (X, y, feature_names, encoder) from a split file, encoded like train_model
+
+    Read through the matrix cache, so every worker on a node memory-maps one
+    encoded copy instead of parsing the file per shard.
+    """
+    matrix = load_matrix(train_path)
+    if matrix.y is None:
+        raise ValueError(f"Target column '{TARGET_COLUMN}' not found in training data")
+    return matrix.frame(), matrix.y, matrix.feature_names, matrix.encoder
+
+
+def load_plan_matrix(plan):
+    """
+    load_training_matrix for the plan's data file, checked against the plan's digest
+
+    Shards fit on it and the coordinator takes y, the feature names and the
+    encoder of the merged model from it, so both see the same encoding.
+    """
+    matrix = load_matrix(plan['train_path'])
+    if matrix.metadata.get('digest') != plan['data_digest']:
+        raise ValueError(f"{plan['train_path']} differs from the data the plan was made for")
+    if matrix.y is None:
+        raise ValueError(f"Target column '{TARGET_COLUMN}' not found in training data")
+    return matrix.frame(), matrix.y, matrix.feature_names, matrix.encoder
+
+
+def _shard_name(index):
+    return f'shard-{index:05d}'
+
+
+def _build_claimed(shard_dir, plan, shard, n_jobs):
+    """Build a shard this process has claimed, keeping the claim alive meanwhile"""
+    with _heartbeat(os.path.join(shard_dir, f"{_shard_name(shard['index'])}.claim")):
+        build_shard(shard_dir, plan, shard, n_jobs)
+
+
+@contextmanager
+def _heartbeat(path):
+    """Touch path every HEARTBEAT_SECONDS while the block runs"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=beat, name='shard-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _check_stale_after(stale_after):
+    if stale_after is not None and stale_after < 3 * HEARTBEAT_SECONDS:
+        raise ValueError(f"stale_after must be at least {3 * HEARTBEAT_SECONDS:.0f}s "
+                         f"(claims are refreshed every {HEARTBEAT_SECONDS:.0f}s)")
+
+
+def _claim(shard_dir, index, stale_after):
+    """Atomically claim a shard (O_EXCL create); True if this process owns it now"""
+    name = _shard_name(index)
+    if os.path.exists(os.path.join(shard_dir, f'{name}.json')):
+        return False
+
+    claim_path = os.path.join(shard_dir, f'{name}.claim')
+    owner = f"{socket.gethostname()} {os.getpid()} {datetime.now().isoformat()}"
+    try:
+        fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if stale_after is None or time.time() - os.path.getmtime(claim_path) < stale_after:
+            return False
+        # Crashed worker: take over by replacing its claim
+        print(f"[SHARDED-TRAINING] Taking over stale claim on shard {index}")
+        _atomic_write(claim_path, lambda path: _write_text(path, owner))
+        return True
+
+    with os.fdopen(fd, 'w') as f:
+        f.write(owner)
+    return True
+
+
+def _atomic_write(path, write, suffix=''):
+    """Write through a temp file + rename so readers never see a partial artifact"""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp{suffix}'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path, payload):
+    _atomic_write(path, lambda tmp: _write_text(tmp, json.dumps(payload, indent=2)))
+
+
+def _write_text(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
@@ -0,0 +1,202 @@
+"""
+Streaming Metrics
+Regression metrics accumulated chunk by chunk, so evaluation runs in
+constant memory no matter how large the holdout file is
+"""
+
+import numpy as np
+
+
+# Columns evaluation results are broken down by (skipped when not in the data)
+EVAL_GROUP_COLUMNS = ('indicator_importance', 'sample_size_tier')
+
+# Group label for rows without a value in a group column
+MISSING_GROUP = 'missing'
+
+
+class RegressionAccumulator:
+    """
+    Running sums for RMSE, MAE and R2
+
+    Keeps the row count, the sums of squared and absolute errors, and the
+    mean and sum of squared deviations (M2) of y_true. Chunks are merged with
+    Chan et al.'s parallel form of Welford's update, so R2 = 1 - SSE / M2
+    needs no second pass and matches sklearn on the full vectors up to
+    floating point rounding (exactly for a single chunk).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.sse = 0.0
+        self.sae = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, y_true, y_pred):
+        """
+        Add a chunk of targets and predictions
+
+        Args:
+            y_true: Array-like of true values
+            y_pred: Array-like of predictions (same length)
+        """
+        y_true = np.asarray(y_true, dtype=np.float64)
+        errors = y_true - np.asarray(y_pred, dtype=np.float64)
+        if len(y_true) == 0:
+            return
+
+        mean = y_true.mean()
+        self.add(len(y_true), float(np.sum(errors ** 2)), float(np.sum(np.abs(errors))),
+                 float(mean), float(np.sum((y_true - mean) ** 2)))
+
+    def add(self, n, sse, sae, mean, m2):
+        """
+        Merge the sums of n rows into the running totals
+
+        Args:
+            n: Number of rows
+            sse: Sum of squared errors
+            sae: Sum of absolute errors
+            mean: Mean of y_true over the rows
+            m2: Sum of squared deviations of y_true from that mean
+        """
+        if n == 0:
+            return
+
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.sse += sse
+        self.sae += sae
+
+    def result(self):
+        """
+        Metrics over everything added so far
+
+        Returns:
+            Dict with rmse, mae and r2 (None without rows; r2 is None below
+            two rows and follows sklearn for a constant target: 1.0 for a
+            perfect fit, else 0.0)
+        """
+        if self.n == 0:
+            return {'rmse': None, 'mae': None, 'r2': None}
+
+        if self.n < 2:
+            r2 = None
+        elif self.m2 > 0:
+            r2 = 1.0 - self.sse / self.m2
+        else:
+            r2 = 1.0 if self.sse == 0 else 0.0
+
+        return {
+            'rmse': float(np.sqrt(self.sse / self.n)),
+            'mae': self.sae / self.n,
+            'r2': r2
+        }
+
+
+class GroupedRegressionAccumulator:
+    """
+    Overall metrics plus one RegressionAccumulator per value of each group column
+
+    Every chunk updates all groups in one vectorized pass (np.bincount per
+    column), so the breakdowns cost no extra read of the data.
+    """
+
+    def __init__(self, group_columns=EVAL_GROUP_COLUMNS):
+        """
+        Initialize accumulators
+
+        Args:
+            group_columns: Columns to break the metrics down by
+        """
+        self.overall = RegressionAccumulator()
+        self.group_columns = list(group_columns)
+        self.groups = {col: {} for col in self.group_columns}
+
+    def update(self, df, y_true, y_pred):
+        """
+        Add a chunk
+
+        Args:
+            df: The chunk's DataFrame (for the group columns)
+            y_true: True values of the chunk
+            y_pred: Predictions for the chunk
+        """
+        y_true = np.asarray(y_true, dtype=np.float64)
+        errors = y_true - np.asarray(y_pred, dtype=np.float64)
+        self.overall.update(y_true, y_pred)
+
+        for col in self.group_columns:
+            if col not in df.columns:
+                continue
+
+            labels, index = _group_index(df[col])
+            n = np.bincount(index, minlength=len(labels))
+            means = np.bincount(index, weights=y_true, minlength=len(labels)) / np.maximum(n, 1)
+            m2 = np.bincount(index, weights=(y_true - means[index]) ** 2, minlength=len(labels))
+            sse = np.bincount(index, weights=errors ** 2, minlength=len(labels))
+            sae = np.bincount(index, weights=np.abs(errors), minlength=len(labels))
+
+            for j in np.flatnonzero(n):
+                accumulator = self.groups[col].setdefault(labels[j], RegressionAccumulator())
+                accumulator.add(int(n[j]), float(sse[j]), float(sae[j]), float(means[j]), float(m2[j]))
+
+    def result(self):
+        """
+        Returns:
+            (metrics, groups): overall rmse / mae / r2, and
+            {column: {value: {n_samples, rmse, mae, r2}}} for the group
+            columns found in the data
+        """
+        groups = {}
+        for col, accumulators in self.groups.items():
+            if accumulators:
+                groups[col] = {
+                    label: dict(n_samples=accumulators[label].n, **accumulators[label].result())
+                    for label in sorted(accumulators)
+                }
+        return self.overall.result(), groups
+
+
+def regression_metrics(y_true, y_pred):
+    """RMSE / MAE / R2 of whole vectors, computed like the streamed evaluation"""
+    accumulator = RegressionAccumulator()
+    accumulator.update(y_true, y_pred)
+    return accumulator.result()
+
+
+def oob_metrics(y_true, oob_prediction):
+    """
+    Metrics of out-of-bag predictions (each row scored only by trees that didn't see it)
+
+    Rows that were in every bootstrap sample have no OOB prediction (NaN)
+    and are left out; n_oob_samples says how many rows were scored. Used by
+    the API, the training script and sharded training alike.
+
+    Args:
+        y_true: Training targets
+        oob_prediction: OOB prediction per row (a forest's oob_prediction_ or
+            a merged sharded forest's)
+
+    Returns:
+        Dict with rmse, mae, r2 and n_oob_samples
+    """
+    oob_prediction = np.asarray(oob_prediction, dtype=np.float64).ravel()
+    scored = np.isfinite(oob_prediction)
+    metrics = regression_metrics(np.asarray(y_true)[scored], oob_prediction[scored])
+    metrics['n_oob_samples'] = int(scored.sum())
+    return metrics
+
+
+def _group_index(values):
+    """Group labels (as strings) of a column and each row's position in them"""
+    import pandas as pd
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+
+    # Missing values (code -1) become one extra group at the end
+    labels = [str(value) for value in uniques] + [MISSING_GROUP]
+    codes = np.where(codes < 0, len(uniques), codes)
+    return labels, codes
@@ -0,0 +1,303 @@
+"""
+Synthetic Data
+Generates arbitrarily large DHS-shaped train / val / test sets for
+benchmarks and load tests, learned from Data/04_Split/train_data.csv
+(and optionally the Value column of the Data/01_Raw DHS files)
+"""
+
+import glob
+import os
+
+import numpy as np
+
+from table_io import EXTENSIONS, write_table_chunks
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data')
+TRAIN_PATH = os.path.join(DATA_DIR, '04_Split', 'train_data.csv')
+RAW_DIR = os.path.join(DATA_DIR, '01_Raw')
+
+TARGET_COLUMN = 'value_log_scaled'
+RAW_TARGET_COLUMN = 'value_log'
+
+# 0/1 columns sharing one of these prefixes are sampled together as one-hot patterns
+ONE_HOT_PREFIXES = ('by_var_', 'type_', 'char_')
+
+# Float columns with at most this many distinct values are sampled as categories
+MAX_DISCRETE_VALUES = 10
+
+# Resolution of the learned quantile functions
+QUANTILE_POINTS = 1001
+
+# Rows simulated once per fit to calibrate the target's quantile mapping
+CALIBRATION_ROWS = 200000
+
+DEFAULT_CHUNK_SIZE = 100000
+
+# Default split sizes as fractions of the total row count
+SPLIT_FRACTIONS = {'train': 0.7, 'val': 0.15, 'test': 0.15}
+
+
+class _CategoricalSampler:
+    """Rows of a value table drawn with their observed frequencies (one column or a one-hot group)"""
+
+    def __init__(self, columns, table, counts):
+        self.columns = list(columns)
+        self.table = table
+        self.cumulative = np.cumsum(counts) / np.sum(counts)
+
+    def sample(self, rng, n_rows):
+        index = np.searchsorted(self.cumulative, rng.random(n_rows), side='right')
+        index = np.minimum(index, len(self.table) - 1)
+        rows = self.table[index]
+        return {col: rows[:, j] for j, col in enumerate(self.columns)}
+
+
+class _QuantileSampler:
+    """Continuous column drawn through its interpolated empirical quantile function"""
+
+    def __init__(self, column, values):
+        self.columns = [column]
+        self.probs = np.linspace(0.0, 1.0, QUANTILE_POINTS)
+        self.quantiles = np.nanquantile(values, self.probs)
+        self.missing_rate = float(np.mean(np.isnan(values)))
+
+    def sample(self, rng, n_rows):
+        values = np.interp(rng.random(n_rows), self.probs, self.quantiles)
+        if self.missing_rate:
+            values[rng.random(n_rows) < self.missing_rate] = np.nan
+        return {self.columns[0]: values}
+
+
+class SyntheticDataGenerator:
+    """
+    Vectorized sampler of rows shaped like the split files
+
+    Features are drawn from their learned marginals: category frequencies
+    for text, integer and low-cardinality columns, joint pattern frequencies
+    for each one-hot group (so exactly the observed patterns come out) and
+    interpolated quantile functions for continuous columns.
+
+    The target keeps the features' signal: a least-squares fit of value_log
+    on the features plus a resampled residual gives a score, which is mapped
+    monotonically onto the learned value_log distribution (train_data or the
+    raw DHS values). value_log_scaled is the affine transform of value_log
+    fitted on the template, so models trained on synthetic data behave like
+    the real one without any synthetic row copying a real one.
+    """
+
+    def __init__(self, template, raw_values=None, seed=0):
+        """
+        Learn the distributions
+
+        Args:
+            template: DataFrame with the split files' columns (e.g. train_data.csv)
+            raw_values: Optional array of raw DHS Values; their log1p replaces
+                the template's value_log distribution
+            seed: Seed for the calibration sample
+        """
+        self.columns = list(template.columns)
+        self.samplers = self._build_samplers(template)
+
+        features = self._feature_columns(template)
+        self.levels = {col: sorted(template[col].dropna().unique().tolist())
+                       for col in features if template[col].dtype.kind == 'O'}
+        y = template[RAW_TARGET_COLUMN].to_numpy(dtype=np.float64)
+        X = self._design(features)
+        self.coefficients = np.linalg.lstsq(X, y, rcond=None)[0]
+
+        probs = np.linspace(0.0, 1.0, QUANTILE_POINTS)
+        self.residual_quantiles = np.quantile(y - X @ self.coefficients, probs)
+
+        if raw_values is not None:
+            raw_values = np.asarray(raw_values, dtype=np.float64)
+            target = np.log1p(raw_values[raw_values >= 0])
+        else:
+            target = y
+        self.target_quantiles = np.quantile(target, probs)
+
+        # value_log_scaled = slope * value_log + intercept
+        self.scale_slope, self.scale_intercept = np.linalg.lstsq(
+            np.column_stack([y, np.ones_like(y)]), template[TARGET_COLUMN].to_numpy(dtype=np.float64), rcond=None)[0]
+
+        # Score quantiles of the generator itself, for the mapping onto target_quantiles
+        rng = np.random.default_rng(seed)
+        scores = self._scores(self._sample_features(rng, CALIBRATION_ROWS), rng, CALIBRATION_ROWS)
+        self.score_quantiles = np.maximum.accumulate(np.quantile(scores, probs))
+
+    @classmethod
+    def from_files(cls, train_path=TRAIN_PATH, raw_dir=None, seed=0):
+        """
+        Learn from the split file and, optionally, the raw DHS files
+
+        Args:
+            train_path: Template CSV / Parquet file
+            raw_dir: Directory of raw DHS CSVs (e.g. RAW_DIR), or None
+            seed: Seed for the calibration sample
+
+        Returns:
+            SyntheticDataGenerator
+        """
+        from table_io import read_data_file
+        template = read_data_file(train_path)
+        raw_values = load_raw_values(raw_dir) if raw_dir else None
+        return cls(template, raw_values, seed)
+
+    # --------------------------------------------------------
+    # Generation
+    # --------------------------------------------------------
+
+    def sample(self, n_rows, seed=0, stream=0):
+        """
+        Generate one DataFrame
+
+        Args:
+            n_rows: Number of rows
+            seed: Random seed (same seed and stream give the same rows)
+            stream: Independent stream id for the same seed (e.g. one per split)
+
+        Returns:
+            DataFrame with the template's columns
+        """
+        return self._sample_frame(np.random.default_rng([seed, stream, 0]), n_rows)
+
+    def iter_chunks(self, n_rows, chunk_size=DEFAULT_CHUNK_SIZE, seed=0, stream=0):
+        """
+        Generate n_rows in DataFrames of at most chunk_size rows
+
+        Every chunk has its own generator seeded with (seed, stream, chunk
+        index), so the output is reproducible for a given chunk size and
+        memory stays bounded by one chunk. The first chunk equals
+        sample(chunk_size, seed, stream).
+
+        Yields:
+            DataFrames with the template's columns
+        """
+        for index, start in enumerate(range(0, n_rows, chunk_size)):
+            rng = np.random.default_rng([seed, stream, index])
+            yield self._sample_frame(rng, min(chunk_size, n_rows - start))
+
+    def write(self, path, n_rows, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE, seed=0, stream=0):
+        """
+        Generate straight into a CSV, Parquet or Arrow IPC file
+
+        Args:
+            path: Output path
+            n_rows: Number of rows
+            fmt: 'csv', 'parquet' or 'arrow' (default: from the extension)
+            chunk_size, seed, stream: As for iter_chunks
+
+        Returns:
+            Number of rows written
+        """
+        fmt = fmt or EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv')
+        return write_table_chunks(self.iter_chunks(n_rows, chunk_size, seed, stream), path, fmt)
+
+    def write_splits(self, out_dir, n_rows, fractions=None, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, seed=0):
+        """
+        Write train / val / test files named like Data/04_Split
+
+        Args:
+            out_dir: Output directory (created if missing)
+            n_rows: Total rows over all splits
+            fractions: {split: fraction} (default SPLIT_FRACTIONS)
+            fmt: 'csv', 'parquet' or 'arrow'
+            chunk_size, seed: As for iter_chunks (each split is its own stream)
+
+        Returns:
+            {split: (path, rows written)}
+        """
+        fractions = fractions or SPLIT_FRACTIONS
+        extension = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}[fmt]
+        os.makedirs(out_dir, exist_ok=True)
+
+        written = {}
+        for stream, (split, fraction) in enumerate(fractions.items()):
+            path = os.path.join(out_dir, f'{split}_data{extension}')
+            rows = self.write(path, int(round(n_rows * fraction)), fmt, chunk_size, seed, stream)
+            written[split] = (path, rows)
+        return written
+
+    # --------------------------------------------------------
+    # Internals
+    # --------------------------------------------------------
+
+    def _build_samplers(self, template):
+        """One sampler per column, or per one-hot group"""
+        samplers = []
+        grouped = set()
+        for prefix in ONE_HOT_PREFIXES:
+            group = [col for col in self.columns
+                     if col.startswith(prefix) and template[col].isin([0, 1]).all()]
+            if len(group) > 1:
+                patterns, counts = np.unique(template[group].to_numpy(), axis=0, return_counts=True)
+                samplers.append(_CategoricalSampler(group, patterns, counts))
+                grouped.update(group)
+
+        for col in self.columns:
+            if col in grouped or col in (TARGET_COLUMN, RAW_TARGET_COLUMN):
+                continue
+
+            values = template[col]
+            if values.dtype.kind == 'f' and values.nunique() > MAX_DISCRETE_VALUES:
+                samplers.append(_QuantileSampler(col, values.to_numpy(dtype=np.float64)))
+            else:
+                counts = values.value_counts(dropna=False, sort=False)
+                table = np.empty((len(counts), 1), dtype=values.dtype)
+                table[:, 0] = counts.index.to_numpy()
+                samplers.append(_CategoricalSampler([col], table, counts.to_numpy()))
+        return samplers
+
+    def _feature_columns(self, template):
+        return {col: template[col].to_numpy() for sampler in self.samplers for col in sampler.columns}
+
+    def _sample_features(self, rng, n_rows):
+        features = {}
+        for sampler in self.samplers:
+            features.update(sampler.sample(rng, n_rows))
+        return features
+
+    def _design(self, features):
+        """Feature matrix for the target model: numeric columns, text levels as dummies, intercept"""
+        parts = [np.ones(len(next(iter(features.values()))))]
+        for col, values in features.items():
+            if col in self.levels:
+                parts.extend((values == level).astype(np.float64) for level in self.levels[col])
+            else:
+                parts.append(np.nan_to_num(values.astype(np.float64)))
+        return np.column_stack(parts)
+
+    def _scores(self, features, rng, n_rows):
+        residuals = np.interp(rng.random(n_rows), np.linspace(0.0, 1.0, QUANTILE_POINTS), self.residual_quantiles)
+        return self._design(features) @ self.coefficients + residuals
+
+    def _sample_frame(self, rng, n_rows):
+        import pandas as pd
+        features = self._sample_features(rng, n_rows)
+
+        value_log = np.interp(self._scores(features, rng, n_rows), self.score_quantiles, self.target_quantiles)
+        features[RAW_TARGET_COLUMN] = value_log
+        features[TARGET_COLUMN] = self.scale_slope * value_log + self.scale_intercept
+
+        return pd.DataFrame({col: features[col] for col in self.columns})
+
+
+def load_raw_values(raw_dir=RAW_DIR):
+    """
+    Value column of every raw DHS CSV in a directory
+
+    The files carry an HXL tag row (#country+code, ...) under the header,
+    which is skipped; non-numeric values are dropped.
+
+    Returns:
+        1-D float array
+    """
+    import pandas as pd
+    values = []
+    for path in sorted(glob.glob(os.path.join(raw_dir, '*.csv'))):
+        df = pd.read_csv(path, skiprows=[1], usecols=['Value'])
+        values.append(pd.to_numeric(df['Value'], errors='coerce').dropna().to_numpy(dtype=np.float64))
+
+    if not values:
+        raise ValueError(f"No DHS CSV files found in {raw_dir}")
+    return np.concatenate(values)
@@ -0,0 +1,342 @@
+"""
+Table I/O
+Reads uploads and local data files as CSV, Parquet or Arrow IPC, and
+serializes prediction results in the format the client asked for
+"""
+
+import io
+import os
+from importlib.util import find_spec
+
+# Parquet / Arrow support is optional - CSV works without pyarrow. pandas and
+# pyarrow are slow to import, so they are only loaded when a table is read or written
+HAS_PYARROW = find_spec('pyarrow') is not None
+pa = pa_ipc = pq = None
+
+
+# Response content type per output format
+MIMETYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Download file name per output format
+FILENAMES = {
+    'csv': 'predictions.csv',
+    'parquet': 'predictions.parquet',
+    'arrow': 'predictions.arrows'
+}
+
+# Upload content types (multipart part or Accept header) and what they mean
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/parquet': 'parquet',
+    'application/vnd.apache.arrow.stream': 'arrow',
+    'application/vnd.apache.arrow.file': 'arrow',
+    'application/x-arrow': 'arrow'
+}
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.arrows': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow'
+}
+
+# Leading bytes of each binary format (Arrow streams start with a continuation marker)
+PARQUET_MAGIC = b'PAR1'
+ARROW_FILE_MAGIC = b'ARROW1'
+ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+
+
+def detect_format(file):
+    """
+    Work out the format of an uploaded file
+
+    Checks the part's content type, then the file extension, then the
+    leading magic bytes; anything unrecognized is treated as CSV.
+
+    Args:
+        file: werkzeug FileStorage from request.files
+
+    Returns:
+        'csv', 'parquet' or 'arrow'
+    """
+    fmt = CONTENT_TYPES.get((file.mimetype or '').lower())
+    if fmt:
+        return fmt
+
+    fmt = EXTENSIONS.get(os.path.splitext(file.filename or '')[1].lower())
+    if fmt:
+        return fmt
+
+    return _sniff_format(file.stream)
+
+
+def read_upload(file):
+    """
+    Read an uploaded CSV / Parquet / Arrow IPC file into a DataFrame
+
+    Args:
+        file: werkzeug FileStorage from request.files
+
+    Returns:
+        DataFrame
+    """
+    return read_table(file.stream, detect_format(file))
+
+
+def read_table(source, fmt):
+    """
+    Read a whole table
+
+    Arrow and Parquet columns are handed to pandas without consolidating
+    them into 2-D blocks, so numeric columns are not copied again.
+
+    Args:
+        source: Path or binary file object
+        fmt: 'csv', 'parquet' or 'arrow'
+
+    Returns:
+        DataFrame
+    """
+    if fmt == 'csv':
+        import pandas as pd
+        return pd.read_csv(source)
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        table = pq.read_table(source)
+    else:
+        table = _open_ipc(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def iter_table_chunks(source, fmt, chunk_size):
+    """
+    Yield a table chunk_size rows at a time
+
+    Args:
+        source: Path or seekable binary file object
+        fmt: 'csv', 'parquet' or 'arrow'
+        chunk_size: Rows per chunk
+
+    Yields:
+        DataFrames of at most chunk_size rows
+    """
+    if fmt == 'csv':
+        import pandas as pd
+        with pd.read_csv(source, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                yield chunk
+        return
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_size)
+    else:
+        batches = _iter_ipc_batches(_open_ipc(source))
+
+    for batch in batches:
+        # IPC batches can be any size; slice them down to chunk_size
+        for start in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(start, chunk_size).to_pandas(split_blocks=True)
+
+
+def write_table(df, fmt):
+    """
+    Serialize a whole DataFrame
+
+    Args:
+        df: DataFrame to write
+        fmt: 'csv', 'parquet' or 'arrow' (IPC stream)
+
+    Returns:
+        bytes
+    """
+    if fmt == 'csv':
+        return df.to_csv(index=False).encode()
+
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    serializer = ArrowStreamSerializer()
+    return serializer.write(df) + serializer.close()
+
+
+def write_table_chunks(chunks, path, fmt):
+    """
+    Write DataFrame chunks to one local file without holding them all in memory
+
+    Args:
+        chunks: Iterable of DataFrames with the same columns
+        path: Output path
+        fmt: 'csv', 'parquet' or 'arrow' (IPC file)
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    if fmt == 'csv':
+        with open(path, 'w', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=(i == 0))
+                rows += len(chunk)
+        return rows
+
+    _require_pyarrow(fmt)
+    writer = schema = None
+    try:
+        for chunk in chunks:
+            # Later chunks are cast to the first chunk's schema so the file stays valid
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(path, schema) if fmt == 'parquet' else pa_ipc.new_file(path, schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+class ArrowStreamSerializer:
+    """
+    Write DataFrame chunks as one Arrow IPC stream, piece by piece
+
+    write() returns the bytes for one chunk (the schema is sent with the
+    first one) and close() the end-of-stream marker, so a chunked HTTP
+    response can forward each piece as soon as it is scored.
+    """
+
+    def __init__(self):
+        _require_pyarrow('arrow')
+        self._buffer = io.BytesIO()
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        """Encode one chunk, returns the bytes to send"""
+        # Later chunks are cast to the first chunk's schema so the stream stays valid
+        batch = pa.RecordBatch.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = batch.schema
+            self._writer = pa_ipc.new_stream(self._buffer, self._schema)
+        self._writer.write_batch(batch)
+        return self._take()
+
+    def close(self):
+        """Finish the stream, returns the trailing bytes"""
+        if self._writer is not None:
+            self._writer.close()
+        return self._take()
+
+    def _take(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def resolve_data_path(csv_path):
+    """
+    Prefer a Parquet twin of a local CSV (train_data.parquet next to train_data.csv)
+
+    The twin is only used when pyarrow is installed and it is at least as new
+    as the CSV, so an edited CSV is never shadowed by stale Parquet.
+
+    Args:
+        csv_path: Path to the CSV
+
+    Returns:
+        Path to read (the twin or csv_path)
+    """
+    twin_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if not HAS_PYARROW or not os.path.exists(twin_path):
+        return csv_path
+
+    if os.path.exists(csv_path) and os.path.getmtime(twin_path) < os.path.getmtime(csv_path):
+        print(f"[TABLE-IO WARNING] Ignoring stale {os.path.basename(twin_path)} (older than the CSV)")
+        return csv_path
+
+    return twin_path
+
+
+def read_data_file(path):
+    """Read a local CSV or Parquet file, using the Parquet twin of a CSV when present"""
+    path = resolve_data_path(path) if path.endswith('.csv') else path
+    return read_table(path, EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv'))
+
+
+def iter_data_file_chunks(path, chunk_size):
+    """Read a local CSV or Parquet file chunk_size rows at a time, using the Parquet twin of a CSV when present"""
+    path = resolve_data_path(path) if path.endswith('.csv') else path
+    return iter_table_chunks(path, EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv'), chunk_size)
+
+
+def data_file_exists(csv_path):
+    """True if a local CSV or its Parquet twin exists"""
+    return os.path.exists(csv_path) or os.path.exists(resolve_data_path(csv_path))
+
+
+def _sniff_format(stream):
+    """Guess the format from the first bytes of a seekable stream"""
+    try:
+        position = stream.tell()
+        head = stream.read(len(ARROW_FILE_MAGIC))
+        stream.seek(position)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return 'csv'
+
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_MAGIC):
+        return 'arrow'
+    return 'csv'
+
+
+def _open_ipc(source):
+    """Open Arrow IPC data in either the file or the stream layout"""
+    if isinstance(source, str):
+        source = pa.memory_map(source, 'r')
+
+    position = source.tell()
+    head = source.read(len(ARROW_FILE_MAGIC))
+    source.seek(position)
+
+    if head == ARROW_FILE_MAGIC:
+        return pa_ipc.open_file(source)
+    return pa_ipc.open_stream(source)
+
+
+def _iter_ipc_batches(reader):
+    """Record batches from an IPC file or stream reader"""
+    if isinstance(reader, pa_ipc.RecordBatchFileReader):
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        for batch in reader:
+            yield batch
+
+
+def _require_pyarrow(fmt):
+    """Import pyarrow on first use (every Parquet / Arrow path calls this first)"""
+    global pa, pa_ipc, pq
+
+    if not HAS_PYARROW:
+        raise ValueError(f"{fmt.capitalize()} support requires pyarrow (pip install pyarrow)")
+
+    if pq is None:
+        import pyarrow as pa
+        import pyarrow.ipc as pa_ipc
+        import pyarrow.parquet as pq
@@ -0,0 +1,68 @@
+"""
+Compiled forest parity with sklearn
+
+Usage:
+    python -m pytest tests/test_forest_engine.py
+"""
+
+import os
+import sys
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest_engine import CompiledForest
+
+
+def _fit_forest():
+    """Tiny forest on a few hundred random rows, with rows to score that it didn't see"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 6))
+    X[:, 0] = rng.integers(0, 5, size=300)  # an encoded categorical column
+    y = X[:, 0] * 0.5 + np.sin(X[:, 1]) + rng.normal(0, 0.1, size=300)
+
+    model = RandomForestRegressor(n_estimators=12, min_samples_leaf=3, random_state=0).fit(X, y)
+    X_new = rng.normal(size=(200, 6))
+    X_new[:, 0] = rng.integers(0, 5, size=200)
+    return model, X_new
+
+
+def test_predict_matches_sklearn():
+    model, X = _fit_forest()
+    engine = CompiledForest.from_sklearn(model)
+
+    assert engine.n_trees == 12
+    np.testing.assert_allclose(engine.predict(X), model.predict(X), rtol=0, atol=1e-9)
+
+
+def test_tree_predictions_match_each_estimator():
+    model, X = _fit_forest()
+    engine = CompiledForest.from_sklearn(model)
+
+    per_tree = np.stack([estimator.predict(X.astype(np.float32)) for estimator in model.estimators_])
+    np.testing.assert_allclose(engine.tree_predictions(X), per_tree, rtol=0, atol=1e-9)
+
+
+def test_float32_engine_reaches_the_same_leaves():
+    model, X = _fit_forest()
+    engine = CompiledForest.from_sklearn(model).to_float32()
+
+    assert engine.threshold.dtype == np.float32 and engine.value.dtype == np.float32
+    # Same leaves, so only float32 rounding of the leaf values remains
+    np.testing.assert_allclose(engine.predict(X), model.predict(X), rtol=1e-6, atol=1e-6)
+
+
+def test_saved_engine_memory_maps_with_same_predictions(tmp_path):
+    model, X = _fit_forest()
+    engine = CompiledForest.from_sklearn(model)
+    engine.save(tmp_path)
+
+    mapped = CompiledForest.load(tmp_path, mmap_mode='r')
+
+    assert mapped.mapped
+    assert mapped.n_trees == engine.n_trees and mapped.max_depth == engine.max_depth
+    np.testing.assert_array_equal(mapped.predict(X), engine.predict(X))
+    np.testing.assert_allclose(mapped.predict(X), model.predict(X), rtol=0, atol=1e-9)
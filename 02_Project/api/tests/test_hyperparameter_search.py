@@ -0,0 +1,68 @@
+"""
+Hyperparameter search ranking
+
+Usage:
+    python -m pytest tests/test_hyperparameter_search.py
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hyperparameter_search
+
+
+class _Progress:
+    """JobProgress stand-in that is never cancelled"""
+
+    def update(self, **fields):
+        pass
+
+    def cancelled(self):
+        return False
+
+    def check_cancelled(self):
+        pass
+
+
+def _fake_trial(data_paths, hyperparams, n_trees, random_state, model_path=None, keep_model=False):
+    """Validation RMSE fixed per candidate (its min_samples_leaf), whatever the tree count"""
+    return {'rmse': hyperparams['min_samples_leaf'] / 100, 'trees_fitted': n_trees}
+
+
+def test_small_forest_that_finishes_early_ranks_by_rmse(monkeypatch):
+    """A completed candidate capped below the last rung isn't ranked behind worse ones"""
+    monkeypatch.setattr(hyperparameter_search, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(hyperparameter_search, 'run_trial', _fake_trial)
+
+    # Candidate 0 (50 trees) is the best and stops growing at rung 1; the
+    # rest (200 trees) reach the last rung
+    candidates = [{'n_estimators': 50, 'min_samples_leaf': 10}]
+    candidates += [{'n_estimators': 200, 'min_samples_leaf': 20 + i} for i in range(23)]
+
+    trials, rungs = hyperparameter_search._search_rungs(
+        _Progress(), None, candidates, [25, 75, 200], eta=3, workers=2, random_state=0, model_dir=None
+    )
+
+    assert rungs == [25, 75, 200]
+    completed = [t for t in trials if t['status'] == 'completed']
+    assert [t['trial'] for t in completed] == [0, 1]
+    assert trials[0]['trial'] == 0 and trials[0]['rank'] == 1
+    assert trials[0]['n_trees'] == 50
+
+
+def test_stopped_trials_follow_latest_rung_first():
+    trials = [
+        {'trial': 0, 'status': 'stopped', 'stopped_at_rung': 0, 'metrics': {'rmse': 0.1}},
+        {'trial': 1, 'status': 'stopped', 'stopped_at_rung': 1, 'metrics': {'rmse': 0.3}},
+        {'trial': 2, 'status': 'completed', 'rung': 1, 'metrics': {'rmse': 0.2}},
+        {'trial': 3, 'status': 'completed', 'rung': 2, 'metrics': {'rmse': 0.4}},
+    ]
+
+    ranked = hyperparameter_search._rank_trials(trials)
+
+    assert [t['trial'] for t in ranked] == [2, 3, 1, 0]
+    assert [t['rank'] for t in ranked] == [1, 2, 3, 4]
@@ -0,0 +1,122 @@
+"""
+Background Warm-Up
+Runs start-up work (heavy imports, model loading) on a background thread so
+the server can answer liveness checks while it is still getting ready
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+
+class WarmUp:
+    """
+    Ordered start-up steps run once per process on a daemon thread
+
+    States: pending -> warming -> ready | failed
+
+    Each step is a (name, fn) pair; its duration is recorded so slow steps
+    show up in /api/health/ready. A step that raises marks the warm-up as
+    failed and the remaining steps are skipped.
+
+    start() is idempotent and safe to call from every request: a process
+    forked after the thread was started (e.g. gunicorn --preload) has no
+    thread, so the warm-up runs again in the child.
+    """
+
+    def __init__(self, steps):
+        """
+        Initialize warm-up
+
+        Args:
+            steps: List of (name, callable) run in order with no arguments
+        """
+        self.steps = list(steps)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = None
+        self._done = threading.Event()
+        self._state = 'pending'
+        self._current_step = None
+        self._step_seconds = {}
+        self._error = None
+        self._started_at = None
+        self._started = None
+        self._seconds = None
+
+    def start(self):
+        """Start the warm-up thread unless this process already has one"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._reset()
+            self._pid = os.getpid()
+            self._state = 'warming'
+            self._started_at = datetime.now().isoformat()
+            self._started = time.perf_counter()
+
+            threading.Thread(target=self._run, name='warm-up', daemon=True).start()
+
+    def _run(self):
+        try:
+            for name, fn in self.steps:
+                self._current_step = name
+                step_started = time.perf_counter()
+                fn()
+                self._step_seconds[name] = round(time.perf_counter() - step_started, 3)
+
+            self._state = 'ready'
+        except Exception as e:
+            self._error = f"{self._current_step}: {e}"
+            self._state = 'failed'
+            print(f"[WARM-UP ERROR] Step '{self._current_step}' failed: {e}")
+            traceback.print_exc()
+        finally:
+            self._current_step = None
+            self._seconds = round(time.perf_counter() - self._started, 3)
+            self._done.set()
+
+        print(f"[WARM-UP] {self._state} after {self._seconds:.2f}s {self._step_seconds}")
+
+    def wait(self, timeout=None):
+        """
+        Block until the warm-up has finished
+
+        Args:
+            timeout: Seconds to wait at most (None waits forever)
+
+        Returns:
+            True if it finished (ready or failed)
+        """
+        return self._done.wait(timeout)
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def ready(self):
+        return self._state == 'ready'
+
+    def status(self):
+        """JSON-serializable warm-up state for the health endpoints"""
+        seconds = self._seconds
+        if seconds is None and self._started is not None:
+            seconds = round(time.perf_counter() - self._started, 3)
+
+        return {
+            'state': self._state,
+            'current_step': self._current_step,
+            'step_seconds': dict(self._step_seconds),
+            'seconds': seconds,
+            'started_at': self._started_at,
+            'error': self._error
+        }
@@ -4,6 +4,8 @@ import type {
   ModelInfo,
   FeatureImportanceResponse,
   TrainingResponse,
+  TrainingJobResponse,
+  JobStatus,
   EvaluationResponse,
   PredictionResponse,
   SamplePredictionResponse,
@@ -38,14 +40,51 @@ export async function getFeatureImportance(topN: number = 10): Promise<FeatureIm
   return handleResponse<FeatureImportanceResponse>(response);
 }
 
+export async function getJobStatus(jobId: string): Promise<JobStatus> {
+  const response = await fetch(`${API_BASE}/api/ml/jobs/${jobId}`);
+  return handleResponse<JobStatus>(response);
+}
+
 // POST endpoints
-export async function trainModel(): Promise<TrainingResponse> {
-  // No file needed - trains using local data
+export async function cancelJob(jobId: string): Promise<{ success: boolean; message: string; job_id: string }> {
+  const response = await fetch(`${API_BASE}/api/ml/jobs/${jobId}/cancel`, {
+    method: 'POST'
+  });
+
+  return handleResponse(response);
+}
+
+export async function trainModel(
+  onProgress?: (status: JobStatus) => void,
+  pollIntervalMs: number = 1000
+): Promise<TrainingResponse> {
+  // No file needed - trains using local data in a background job
   const response = await fetch(`${API_BASE}/api/ml/train`, {
     method: 'POST'
   });
+  const job = await handleResponse<TrainingJobResponse>(response);
+
+  // Poll until the job finishes and the new model is in service
+  while (true) {
+    const status = await getJobStatus(job.job_id);
+    onProgress?.(status);
+
+    if (status.status === 'completed' && status.result) {
+      return {
+        success: true,
+        message: 'Model trained successfully',
+        metrics: status.result.metrics,
+        n_features: status.result.n_features,
+        n_samples: status.result.n_samples,
+        timestamp: status.finished_at ?? new Date().toISOString()
+      };
+    }
+    if (status.status === 'failed' || status.status === 'cancelled') {
+      throw new Error(status.error || `Training ${status.status}`);
+    }
 
-  return handleResponse<TrainingResponse>(response);
+    await new Promise(resolve => setTimeout(resolve, pollIntervalMs));
+  }
 }
 
 export async function evaluateModel(file: File, datasetName: string = 'Test'): Promise<EvaluationResponse> {
@@ -43,6 +43,37 @@ export interface TrainingResponse {
   timestamp: string;
 }
 
+export interface TrainingJobResponse {
+  success: boolean;
+  message: string;
+  job_id: string;
+  status_url: string;
+  timestamp: string;
+}
+
+export interface JobStatus {
+  job_id: string;
+  kind: string;
+  status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+  submitted_at: string;
+  started_at?: string;
+  finished_at?: string;
+  elapsed_seconds?: number;
+  eta_seconds?: number;
+  progress: {
+    phase?: string;
+    trees_built?: number;
+    n_estimators?: number;
+    fraction?: number;
+  };
+  result?: {
+    metrics: ModelMetrics;
+    n_features: number;
+    n_samples: number;
+  };
+  error?: string;
+}
+
 export interface EvaluationResponse {
   success: boolean;
   dataset: string;